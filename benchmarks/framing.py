@@ -0,0 +1,116 @@
+"""Micro-benchmark comparing the original SimpleTCP frame reader/writer with the framing layer.
+
+Each payload is sent from one end of a socket pair and read on the other, measuring the throughput of a full frame round
+trip (pickling, signing, writing, reading, verifying, and unpickling). The original reader used reader.read(n), which
+can return short reads for large payloads, so the legacy path here uses readexactly to produce correct results, it is
+otherwise the original implementation. The cost of signing alone is reported separately, as is the throughput of sending
+the payload as an out-of-band buffer.
+
+Usage:
+
+    python benchmarks/framing.py
+"""
+import asyncio
+import hashlib
+import pickle
+import socket
+import time
+
+from schism.ext.bridges import framing
+from schism.ext.bridges.framing import Frame, FrameKind
+
+
+SECRET_KEY = b"benchmark-secret"
+PAYLOAD_SIZES = {"1 KB": 1024, "1 MB": 1024 ** 2, "100 MB": 100 * 1024 ** 2}
+
+
+def legacy_signature(data: bytes) -> bytes:
+    return hashlib.sha256(data + SECRET_KEY).hexdigest().encode()
+
+
+async def legacy_send(data, writer):
+    payload = pickle.dumps(data)
+    writer.write((0).to_bytes(2, byteorder="big"))
+    writer.write(len(payload).to_bytes(4, byteorder="big"))
+    writer.write(legacy_signature(payload))
+    writer.write(payload)
+    await writer.drain()
+
+
+async def legacy_read(reader):
+    int.from_bytes(await reader.readexactly(2), byteorder="big")
+    length = int.from_bytes(await reader.readexactly(4), byteorder="big")
+    signature = await reader.readexactly(64)
+    payload = await reader.readexactly(length)
+    if signature != legacy_signature(payload):
+        raise ValueError("Received an invalid signature")
+
+    return pickle.loads(payload)
+
+
+CODEC = framing.FrameCodec(SECRET_KEY)
+OUT_OF_BAND_CODEC = framing.FrameCodec(SECRET_KEY, out_of_band_threshold=64 * 1024)
+
+
+async def framing_send(data, writer):
+    await CODEC.send_frame(Frame(1, FrameKind.REQUEST, 1, data), writer)
+
+
+async def framing_read(reader):
+    return (await CODEC.read_frame(reader)).payload
+
+
+async def out_of_band_send(data, writer):
+    await OUT_OF_BAND_CODEC.send_frame(Frame(1, FrameKind.REQUEST, 1, data), writer)
+
+
+async def round_trips(send, read, payload: bytes, iterations: int) -> float:
+    left, right = socket.socketpair()
+    _, writer = await asyncio.open_connection(sock=left)
+    reader, other_writer = await asyncio.open_connection(sock=right)
+    try:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            _, received = await asyncio.gather(send(payload, writer), read(reader))
+            assert len(received) == len(payload)
+
+        return time.perf_counter() - start
+
+    finally:
+        writer.close()
+        other_writer.close()
+
+
+def time_signing(sign, payload: bytes, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        sign(payload)
+
+    return time.perf_counter() - start
+
+
+async def main():
+    print(
+        f"{'Payload':>8} | {'Legacy MB/s':>12} | {'Framing MB/s':>12} | {'Speedup':>7} | {'Signing speedup':>15} | "
+        f"{'Out-of-band MB/s':>16}"
+    )
+    for label, size in PAYLOAD_SIZES.items():
+        payload = bytes(size)
+        iterations = max(3, min(5_000, 200 * 1024 ** 2 // size))
+        megabytes = size * iterations / 1024 ** 2
+
+        legacy = await round_trips(legacy_send, legacy_read, payload, iterations)
+        current = await round_trips(framing_send, framing_read, payload, iterations)
+        out_of_band = await round_trips(out_of_band_send, framing_read, payload, iterations)
+        legacy_signing = time_signing(legacy_signature, payload, iterations)
+        current_signing = time_signing(
+            lambda data: framing.sign_v1((b"header", memoryview(data)), SECRET_KEY), payload, iterations
+        )
+        print(
+            f"{label:>8} | {megabytes / legacy:>12.1f} | {megabytes / current:>12.1f} | {legacy / current:>6.2f}x | "
+            f"{legacy_signing / current_signing:>14.2f}x | {megabytes / out_of_band:>16.1f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
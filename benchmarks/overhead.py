@@ -0,0 +1,251 @@
+"""Benchmark suite measuring the per-call overhead that Schism adds to a service method call.
+
+Each scenario makes sequential calls to measure latency percentiles, then makes rounds of concurrent calls to measure
+throughput. The scenarios cover:
+
+- monolithic: calling the service directly, as it's injected when running with the MonolithicController
+- service_facade: dispatching a call payload through the BridgeServiceFacade in process, for a method that returns and
+  for a method that raises (building the ExceptionPayload with the ResponseBuilder)
+- simple_tcp: round trips from a BridgeClientFacade through SimpleTCP with different payload sizes
+- middleware: SimpleTCP round trips with pass-through middleware stacks of different depths on the client and server
+- errors: SimpleTCP round trips for a method that raises, the exception is raised again on the client
+
+SimpleTCP servers run in their own process. Results are written as JSON so that runs from different commits can be
+compared, --compare prints the change of each scenario from an earlier run.
+
+Usage:
+
+    python benchmarks/overhead.py --output results.json
+    python benchmarks/overhead.py --output new.json --compare results.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from bevy import Repository, get_repository
+
+from schism.bridges import BridgeClientFacade, BridgeServiceFacade, MethodCallPayload
+from schism.configs import ApplicationConfig
+from schism.controllers import MonolithicController
+from schism.ext.bridges.simple_tcp import SimpleTCP, SimpleTCPServer
+from schism.middleware import Middleware, MiddlewareStack
+from schism.services import Service
+
+
+PORT = 18_699
+PAYLOAD_SIZES = {"64 B": 64, "4 KB": 4 * 1024, "64 KB": 64 * 1024, "1 MB": 1024 ** 2}
+MIDDLEWARE_DEPTHS = (0, 1, 4, 16)
+CONCURRENCY = 64
+
+
+class BenchmarkService(Service):
+    async def echo(self, value):
+        return value
+
+    async def fail(self, message):
+        raise ValueError(message)
+
+
+class PassThroughMiddleware(Middleware):
+    def run(self, payload):
+        return self.next(payload)
+
+
+def setup():
+    """Configures the benchmark service so that it's created directly when it is injected."""
+    repository = Repository.factory()
+    repository.set(
+        ApplicationConfig,
+        ApplicationConfig(
+            services=[
+                {
+                    "name": "benchmark",
+                    "service": "__main__:BenchmarkService",
+                    "bridge": "schism.ext.bridges.simple_tcp:SimpleTCP",
+                },
+            ],
+        ),
+    )
+    Repository.set_repository(repository)
+    MonolithicController.activate()
+
+
+def middleware_stack(depth: int) -> MiddlewareStack:
+    return MiddlewareStack(*[PassThroughMiddleware] * depth)
+
+
+def serve(port: int, depth: int):
+    setup()
+    config = SimpleTCP.config_factory({"serve_on": f"127.0.0.1:{port}"})
+    asyncio.run(SimpleTCPServer(config, BridgeServiceFacade(BenchmarkService, middleware_stack(depth))).launch())
+
+
+def summarize(latencies: list[float], calls_per_second: float) -> dict[str, float]:
+    quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "calls": len(latencies),
+        "mean_us": statistics.fmean(latencies) * 1e6,
+        "p50_us": quantiles[49] * 1e6,
+        "p90_us": quantiles[89] * 1e6,
+        "p99_us": quantiles[98] * 1e6,
+        "max_us": max(latencies) * 1e6,
+        "calls_per_second": calls_per_second,
+    }
+
+
+async def measure(call, calls: int, rounds: int) -> dict[str, float]:
+    """Measures the latency of sequential calls and the throughput of rounds of concurrent calls. The call should be an
+    async callable that makes a single call and doesn't take any arguments."""
+    for _ in range(min(calls, 200)):
+        await call()
+
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await asyncio.gather(*(call() for _ in range(CONCURRENCY)))
+
+    return summarize(latencies, rounds * CONCURRENCY / (time.perf_counter() - start))
+
+
+async def raises(call, *args):
+    try:
+        await call(*args)
+    except ValueError:
+        pass
+    else:
+        raise RuntimeError("Expected the call to raise a ValueError")
+
+
+async def remote_scenarios(port: int, depth: int, scenarios: dict[str, tuple]) -> dict[str, dict[str, float]]:
+    """Starts a SimpleTCP server with the middleware depth and measures each scenario through a client facade."""
+    server = multiprocessing.Process(target=serve, args=(port, depth), daemon=True)
+    server.start()
+    facade = BridgeClientFacade.for_service(BenchmarkService)(
+        bridge_type=SimpleTCP,
+        service_type=BenchmarkService,
+        config=SimpleTCP.config_factory({"serve_on": f"127.0.0.1:{port}"}),
+        middleware_stack=middleware_stack(depth),
+    )
+    try:
+        await facade.wait_for_server(timeout=10)
+        return {
+            name: await measure(lambda: call(facade), calls, rounds)
+            for name, (call, calls, rounds) in scenarios.items()
+        }
+
+    finally:
+        await facade.client.close()
+        server.terminate()
+        server.join()
+
+
+async def run(scale: float) -> dict[str, dict[str, float]]:
+    def count(calls: int) -> int:
+        return max(int(calls * scale), 1)
+
+    service = get_repository().get(BenchmarkService)
+    service_facade = BridgeServiceFacade(BenchmarkService, MiddlewareStack())
+    echo_payload = MethodCallPayload(service=BenchmarkService, method="echo", args=(1,), kwargs={})
+    fail_payload = MethodCallPayload(service=BenchmarkService, method="fail", args=("error",), kwargs={})
+    results = {
+        "monolithic/echo": await measure(lambda: service.echo(1), count(100_000), count(1_000)),
+        "monolithic/fail": await measure(lambda: raises(service.fail, "error"), count(100_000), count(1_000)),
+        "service_facade/echo": await measure(
+            lambda: service_facade.call_async_method(echo_payload), count(100_000), count(1_000)
+        ),
+        "service_facade/fail": await measure(
+            lambda: service_facade.call_async_method(fail_payload), count(20_000), count(200)
+        ),
+    }
+
+    payloads = {size: os.urandom(length) for size, length in PAYLOAD_SIZES.items()}
+    remote = {
+        f"simple_tcp/{size}": (lambda facade, payload=payload: facade.echo(payload), count(2_000), count(40))
+        for size, payload in payloads.items()
+    }
+    remote["errors/simple_tcp"] = (lambda facade: raises(facade.fail, "error"), count(2_000), count(40))
+    results |= await remote_scenarios(PORT, 0, remote)
+    for depth in MIDDLEWARE_DEPTHS:
+        results |= await remote_scenarios(
+            PORT + 1 + depth,
+            depth,
+            {f"middleware/depth {depth}": (lambda facade: facade.echo(1), count(2_000), count(40))},
+        )
+
+    return results
+
+
+def current_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]]):
+    print(
+        f"{'Scenario':>24} | {'p50 (us)':>10} | {'p90 (us)':>10} | {'p99 (us)':>10} | {'max (us)':>10} | "
+        f"{'Calls/s':>10} | {'p50 change':>10}"
+    )
+    for name, result in results.items():
+        change = ""
+        if name in baseline:
+            change = f"{(result['p50_us'] / baseline[name]['p50_us'] - 1) * 100:+.1f}%"
+
+        print(
+            f"{name:>24} | {result['p50_us']:>10.1f} | {result['p90_us']:>10.1f} | {result['p99_us']:>10.1f} | "
+            f"{result['max_us']:>10.1f} | {result['calls_per_second']:>10.0f} | {change:>10}"
+        )
+
+
+def main(argv: list[str]):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="File to write the JSON results to, defaults to stdout")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier for the number of calls made")
+    args = parser.parse_args(argv)
+
+    setup()
+    results = asyncio.run(run(args.scale))
+    report = {
+        "commit": current_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "concurrency": CONCURRENCY,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            print_results(results, json.load(file)["results"])
+
+    elif args.output:
+        print_results(results, {})
+
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
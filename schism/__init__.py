@@ -1,3 +1,4 @@
-from schism.services import Service
+from schism.services import Service, batch
 from schism.configs import ServiceConfig
 from schism.controllers import get_controller, has_controller, start_app
+from schism.deadlines import deadline
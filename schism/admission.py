@@ -0,0 +1,255 @@
+"""Admission control stops a service from taking on more requests than it can handle. When a burst of requests arrives
+the requests over the limit are rejected straight away with an OverloadedError instead of every request slowing down.
+The error is raised on the client like any other exception raised by the service, so clients can back off or try
+another instance.
+
+The limits are set in the service's config. "max_in_flight" is the most requests the service handles at once, each
+call in a batch and each open stream counts as a request. "methods" caps the requests to individual methods, which
+keeps expensive methods from using up the capacity of the whole service:
+
+    services:
+      - name: example
+        service: example:Example
+        bridge: ...
+        limits:
+          max_in_flight: 256
+          methods:
+            render_report: 4
+
+Limits are applied to requests made through the service's bridge server, services running in the current process are
+called directly.
+
+Clients can also limit the requests they have in flight to a remote service, so a slow service doesn't pile up pending
+calls and connections in the code calling it. The limit adapts to the service (additive increase, multiplicative
+decrease): it grows by one for each limit's worth of calls that complete without trouble and it's cut when calls fail
+to reach the service, are rejected as overloaded, or take longer than "latency_tolerance" times the fastest recent
+response to the same method. A response also has to be at least "min_latency_delta" seconds slower than the fastest
+recent response to count as slow, so the jitter of very fast calls doesn't cut the limit. Calls over the limit wait in
+a queue, calls that don't fit in the queue or that wait longer than the "queue_timeout" in seconds raise an
+OverloadedError without being sent. This is configured on the service's bridge in the schism.config file:
+
+    services:
+      - name: example
+        service: example:Example
+        bridge:
+          type: schism.ext.bridges.simple_tcp:SimpleTCP
+          serve_on: 0.0.0.0:1234
+          adaptive_limit:
+            initial_limit: 20
+            max_limit: 200
+            max_queue: 100
+            queue_timeout: 1.0
+
+The limiter is available on the service's client facade as "limiter", its "limit", "in_flight", "queue_depth", and
+"rejected" attributes can be reported as metrics. Calls made on a batch are sent as one request and aren't limited."""
+import asyncio
+import contextlib
+import time
+from collections import Counter, deque
+from typing import AsyncIterator, Awaitable, Callable, TYPE_CHECKING
+
+
+if TYPE_CHECKING:
+    from schism.bridges import MethodCallPayload, ResultPayload
+    from schism.configs import AdaptiveLimitConfig, LimitsConfig
+
+
+BASELINE_DECAY = 0.01  # How quickly the baseline latency rises toward slower responses, it falls immediately
+
+
+class OverloadedError(Exception):
+    """Raised when a service has as many requests in flight as its limits allow and rejects another request."""
+
+
+class Admission:
+    """Counts the requests a service is handling and decides whether another request can be admitted."""
+    def __init__(self, *, max_in_flight: int | None = None, method_limits: dict[str, int] | None = None):
+        self.max_in_flight = max_in_flight
+        self.method_limits = method_limits or {}
+        self.in_flight = 0
+        self.method_in_flight: Counter[str] = Counter()
+
+    @property
+    def is_limited(self) -> bool:
+        return self.max_in_flight is not None or bool(self.method_limits)
+
+    def acquire(self, method: str) -> OverloadedError | None:
+        """Admits a request to the method, returning an overloaded error instead when it's over a limit. Every request
+        that is admitted must be released."""
+        if self.max_in_flight is not None and self.in_flight >= self.max_in_flight:
+            return OverloadedError(
+                f"The service is handling {self.in_flight} requests, its limit is {self.max_in_flight}"
+            )
+
+        if (limit := self.method_limits.get(method)) is not None and self.method_in_flight[method] >= limit:
+            return OverloadedError(
+                f"{method} is handling {self.method_in_flight[method]} requests, its limit is {limit}"
+            )
+
+        self.in_flight += 1
+        self.method_in_flight[method] += 1
+        return None
+
+    def release(self, method: str):
+        self.in_flight -= 1
+        self.method_in_flight[method] -= 1
+
+    @classmethod
+    def from_config(cls, config: "LimitsConfig") -> "Admission":
+        return cls(max_in_flight=config.max_in_flight, method_limits=config.methods)
+
+
+class AdaptiveLimiter:
+    """Limits the requests a client has in flight to a service, adapting the limit to the latency and the failures of
+    the requests. Requests over the limit wait in a first in first out queue for a request to finish."""
+    def __init__(
+        self,
+        *,
+        initial_limit: int = 20,
+        min_limit: int = 1,
+        max_limit: int = 200,
+        backoff: float = 0.9,
+        latency_tolerance: float = 2.0,
+        min_latency_delta: float = 0.005,
+        max_queue: int = 100,
+        queue_timeout: float | None = None,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.min_latency_delta = min_latency_delta
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.rejected = 0
+
+        self._limit = float(min(max(initial_limit, min_limit), max_limit))
+        self._baselines: dict[str, float] = {}
+        self._last_decrease = 0.0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def limit(self) -> int:
+        """The number of requests that can currently be in flight."""
+        return int(self._limit)
+
+    @property
+    def queue_depth(self) -> int:
+        """The number of requests waiting for a request in flight to finish."""
+        return len(self._waiters)
+
+    async def call(
+        self,
+        send: "Callable[[MethodCallPayload], Awaitable[ResultPayload]]",
+        payload: "MethodCallPayload",
+    ) -> "ResultPayload":
+        """Sends the payload once the limit allows it, the response's latency and whether the request failed adjust
+        the limit."""
+        await self.acquire()
+        started, dropped = time.perf_counter(), False
+        try:
+            result = await send(payload)
+            dropped = isinstance(result.get("error"), OverloadedError)
+            return result
+
+        except Exception:
+            dropped = True
+            raise
+
+        finally:
+            self.release(started, payload["method"], dropped, latency=time.perf_counter() - started)
+
+    async def stream(
+        self,
+        open_stream: "Callable[[MethodCallPayload], AsyncIterator[ResultPayload]]",
+        payload: "MethodCallPayload",
+    ) -> "AsyncIterator[ResultPayload]":
+        """Streams the result payloads once the limit allows it. The stream is in flight until it ends, streams don't
+        have a meaningful latency so only failures adjust the limit."""
+        await self.acquire()
+        started, dropped = time.perf_counter(), False
+        try:
+            async with contextlib.aclosing(open_stream(payload)) as stream:
+                async for result in stream:
+                    dropped = isinstance(result.get("error"), OverloadedError)
+                    yield result
+
+        except Exception:
+            dropped = True
+            raise
+
+        finally:
+            self.release(started, payload["method"], dropped)
+
+    async def acquire(self):
+        """Waits until another request can be in flight, raising an OverloadedError when the queue is full or when the
+        request waits longer than the queue timeout."""
+        if self.in_flight < self._limit and not self._waiters:
+            self.in_flight += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise OverloadedError(f"The client has {self.in_flight} requests in flight and {self.queue_depth} queued")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                self.in_flight -= 1  # The slot was handed over as the wait timed out or was cancelled, pass it on
+                self._wake()
+
+            if isinstance(e, TimeoutError):
+                self.rejected += 1
+                raise OverloadedError(
+                    f"The request waited {self.queue_timeout} seconds for one of the client's {self.in_flight} "
+                    f"requests in flight to finish"
+                ) from None
+
+            raise
+
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self, started: float, method: str, dropped: bool, *, latency: float | None = None):
+        """Ends a request that started at the given time, adjusting the limit using its outcome."""
+        self.in_flight -= 1
+        if dropped or self._is_congested(method, latency):
+            if started >= self._last_decrease:  # Requests sent before the last decrease don't reflect the new limit
+                self._limit = max(self.min_limit, self._limit * self.backoff)
+                self._last_decrease = time.perf_counter()
+
+        elif self.in_flight * 2 >= self._limit:  # Only grow when the limit is actually being used
+            self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+
+        self._wake()
+
+    def _is_congested(self, method: str, latency: float | None) -> bool:
+        if latency is None:
+            return False
+
+        baseline = self._baselines.get(method, latency)
+        self._baselines[method] = min(latency, baseline + (latency - baseline) * BASELINE_DECAY)
+        return latency > max(baseline * self.latency_tolerance, baseline + self.min_latency_delta)
+
+    def _wake(self):
+        while self._waiters and self.in_flight < self._limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self.in_flight += 1
+
+    @classmethod
+    def from_config(cls, config: "AdaptiveLimitConfig") -> "AdaptiveLimiter":
+        return cls(**config.model_dump())
+
+    def __repr__(self):
+        return (
+            f"<{type(self).__name__} limit={self.limit} in_flight={self.in_flight} queue_depth={self.queue_depth} "
+            f"rejected={self.rejected}>"
+        )
@@ -0,0 +1,238 @@
+"""Batches collect many method calls to a single service and send them to the service's bridge server in one request, so
+code that makes many small calls in a row pays for one round trip instead of one per call:
+
+    async with schism.batch(service) as batch:
+        user = batch.get_user(user_id)
+        settings = batch.get_settings(user_id)
+
+    print(user.result(), settings.result())
+
+Each call made on the batch returns a task. When the batch context exits every call is sent in a single request and the
+context waits for all the calls to complete. Each task then resolves to its call's return value or raises its call's
+exception, exactly as calling the method directly would. The server runs the calls in the order they were made.
+
+Client middleware runs separately for each call, the calls that make it through the middleware to the bridge client are
+the ones that are sent in the batch. Server middleware likewise runs for each call.
+
+When the service is running in the current process the calls are made directly as soon as they're added to the batch,
+so the batch API works the same way in a monolithic application.
+
+Services can also opt in to having concurrent calls coalesced automatically. Calls made through the service's client
+facade are held for a short window and every call made during that window is sent together in one batch, the window is
+cut short when the maximum number of calls is reached. Coalesced calls are independent of each other so the server runs
+them concurrently. This is configured on the service's bridge in the schism.config file, the window is in seconds:
+
+    services:
+      - name: example
+        service: example:Example
+        bridge:
+          type: schism.ext.bridges.simple_tcp:SimpleTCP
+          serve_on: 0.0.0.0:1234
+          coalesce:
+            window: 0.0002
+            max_calls: 64
+
+A window of 0 coalesces the calls that are made in the same iteration of the event loop."""
+import asyncio
+import contextvars
+import inspect
+from functools import partial
+from typing import Any, Callable, Type, TYPE_CHECKING
+
+import schism.bridges as bridges
+
+
+if TYPE_CHECKING:
+    from schism.services import Service
+
+
+_active_batch: "contextvars.ContextVar[RemoteBatch]" = contextvars.ContextVar("schism_active_batch")
+
+
+def get_active_batch() -> "RemoteBatch | None":
+    """Returns the batch that the current call is being added to, if any."""
+    return _active_batch.get(None)
+
+
+class Batch:
+    """Base batch that runs each call on the service as a task as soon as it is added. Exiting the batch context waits
+    for every call to complete. If the context exits because of an exception the calls are cancelled."""
+    def __init__(self, service: "Service"):
+        self._service = service
+        self._tasks: list[asyncio.Task] = []
+        self._closed = False
+
+    def __getattr__(self, item) -> Callable[..., asyncio.Task]:
+        return partial(self._add_call, item)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._closed = True
+        if exc_type is not None:
+            for task in self._tasks:
+                task.cancel()
+
+        else:
+            await self._send()
+
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _add_call(self, method: str, *args, **kwargs) -> asyncio.Task:
+        if self._closed:
+            raise RuntimeError("Cannot add calls to a batch that has already been sent")
+
+        task = self._create_task(method, args, kwargs)
+        self._tasks.append(task)
+        return task
+
+    def _create_task(self, method: str, args: tuple, kwargs: dict) -> asyncio.Task:
+        return asyncio.create_task(self._call(getattr(self._service, method), args, kwargs))
+
+    async def _call(self, method: Callable, args: tuple, kwargs: dict) -> Any:
+        result = method(*args, **kwargs)
+        return await result if inspect.isawaitable(result) else result
+
+    async def _send(self):
+        pass
+
+
+class RemoteBatch(Batch):
+    """Batch for a service that is accessed through a bridge client facade. Each call runs through the facade as normal,
+    when it reaches the bridge client it is queued on the batch instead of being sent. When the batch is sent it waits
+    for every call to either be queued or to finish without reaching the bridge client (middleware can respond without
+    calling the server), then all queued calls are sent to the server together."""
+    def __init__(self, facade: "bridges.BridgeClientFacade"):
+        super().__init__(facade)
+        self._queue: "list[tuple[int, bridges.MethodCallPayload, asyncio.Future]]" = []
+        self._queued: set[asyncio.Task] = set()
+        self._progress = asyncio.Event()
+        self._sent = False
+
+    @property
+    def facade(self) -> "bridges.BridgeClientFacade":
+        return self._service
+
+    async def enqueue(self, payload: "bridges.MethodCallPayload") -> "bridges.ResultPayload":
+        """Queues a call payload that has made it through the client middleware and waits for its result payload."""
+        if self._sent:
+            raise RuntimeError("Cannot add calls to a batch that has already been sent")
+
+        task = asyncio.current_task()
+        response = asyncio.get_running_loop().create_future()
+        self._queue.append((self._tasks.index(task), payload, response))
+        self._queued.add(task)
+        self._progress.set()
+        return await response
+
+    def _create_task(self, method: str, args: tuple, kwargs: dict) -> asyncio.Task:
+        context = contextvars.copy_context()
+        context.run(_active_batch.set, self)
+        task = asyncio.create_task(getattr(self.facade, method)(*args, **kwargs), context=context)
+        task.add_done_callback(lambda _: self._progress.set())
+        return task
+
+    async def _send(self):
+        while any(not task.done() and task not in self._queued for task in self._tasks):
+            self._progress.clear()
+            await self._progress.wait()
+
+        self._sent = True
+        if not self._queue:
+            return
+
+        queue = sorted(self._queue, key=lambda call: call[0])
+        try:
+            response = await self.facade.client.call_batch(
+                bridges.BatchCallPayload(
+                    service=self.facade.service_type,
+                    calls=[payload for _, payload, _ in queue],
+                )
+            )
+
+        except Exception as e:
+            for *_, future in queue:
+                if not future.done():
+                    future.set_exception(e)
+
+        else:
+            for (*_, future), result in zip(queue, response["results"], strict=True):
+                if not future.done():
+                    future.set_result(result)
+
+        finally:
+            for *_, future in queue:
+                future.cancel()
+
+
+class Coalescer:
+    """Holds calls sent through a bridge client for a short window and sends them to the server in a single batch. The
+    batch is sent when the window elapses or once it holds the maximum number of calls. A window with a single call
+    sends the call on its own."""
+    def __init__(self, client: "bridges.BridgeClient", service: "Type[Service]", *, window: float, max_calls: int):
+        self.client = client
+        self.service = service
+        self.window = window
+        self.max_calls = max_calls
+
+        self._pending: "list[tuple[bridges.MethodCallPayload, float | None, asyncio.Future]]" = []
+        self._timer: asyncio.Handle | None = None
+        self._sending: set[asyncio.Task] = set()
+
+    async def call(self, payload: "bridges.MethodCallPayload") -> "bridges.ResultPayload":
+        loop = asyncio.get_running_loop()
+        response = loop.create_future()
+        deadline = loop.time() + payload["timeout"] if "timeout" in payload else None
+        self._pending.append((payload, deadline, response))
+        if len(self._pending) >= self.max_calls:
+            self._flush()
+
+        elif self._timer is None:
+            self._timer = loop.call_soon(self._flush) if self.window <= 0 else loop.call_later(self.window, self._flush)
+
+        return await response
+
+    def _flush(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+        calls = [  # The calls' timeouts are set to the time they have left as they're sent
+            (bridges.with_remaining_time(payload, deadline), response)
+            for payload, deadline, response in self._pending
+            if not response.done()
+        ]
+        self._pending.clear()
+        if calls:
+            task = asyncio.create_task(self._send(calls))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, calls: "list[tuple[bridges.MethodCallPayload, asyncio.Future]]"):
+        try:
+            if len(calls) == 1:
+                results = [await self.client.call_async_method(calls[0][0])]
+            else:
+                response = await self.client.call_batch(
+                    bridges.BatchCallPayload(
+                        service=self.service,
+                        calls=[payload for payload, _ in calls],
+                        concurrent=True,
+                    )
+                )
+                results = response["results"]
+
+        except Exception as e:
+            for _, future in calls:
+                if not future.done():
+                    future.set_exception(e)
+
+        else:
+            for (_, future), result in zip(calls, results, strict=True):
+                if not future.done():
+                    future.set_result(result)
+
+        finally:
+            for _, future in calls:
+                future.cancel()
@@ -0,0 +1,201 @@
+"""The bench command load tests a running service by calling one of its methods from many tasks at once:
+
+    schism bench service-a get_value --concurrency 32 --duration 10
+
+The service is resolved from the schism.config file and its client facade is injected exactly as it is for an
+application, so calls go through the configured bridge and client middleware. Arguments are passed with --args and
+keyword arguments with --kwargs, each value is parsed as JSON and falls back to being passed as a string:
+
+    schism bench service-a greet --args '"Bob"' 3 --kwargs punctuation=!
+
+By default the bench runs closed loop, each task makes its next call as soon as its last call completes. Setting
+--rate runs open loop instead, calls are started at a fixed number of calls per second no matter how many are still in
+flight, and each call's latency is measured from the time it was scheduled to start. This shows how latency grows when
+the service falls behind the offered load.
+
+When the run completes the throughput, the p50/p90/p99/max latency, and the error rate are printed."""
+import argparse
+import asyncio
+import json
+import math
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Type
+
+from bevy import dependency, get_repository, inject
+
+import schism.runtime as runtime
+import schism.services as services
+from schism.configs import ApplicationConfig
+from schism.controllers import DistributedController
+
+
+type BenchCall = Callable[[], Awaitable[Any]]
+
+
+class LoadReport:
+    """Collects the latency of each successful call and the errors raised by calls made during a bench run."""
+    def __init__(self):
+        self.latencies: list[float] = []
+        self.errors: Counter[str] = Counter()
+        self.started = time.perf_counter()
+        self.finished = self.started
+
+    @property
+    def calls(self) -> int:
+        return len(self.latencies) + self.error_count
+
+    @property
+    def error_count(self) -> int:
+        return self.errors.total()
+
+    @property
+    def error_rate(self) -> float:
+        return self.error_count / self.calls if self.calls else 0.0
+
+    @property
+    def throughput(self) -> float:
+        elapsed = self.finished - self.started
+        return self.calls / elapsed if elapsed > 0 else 0.0
+
+    def percentile(self, percent: float) -> float:
+        """Gets the latency that the percent of successful calls completed within using the nearest rank."""
+        if not self.latencies:
+            return 0.0
+
+        latencies = sorted(self.latencies)
+        return latencies[max(math.ceil(percent / 100 * len(latencies)) - 1, 0)]
+
+    async def record(self, call: BenchCall, scheduled: float | None = None):
+        """Makes the call and records its latency, measured from the scheduled start time if there is one. Exceptions
+        are counted by type instead of being raised."""
+        start = time.perf_counter() if scheduled is None else scheduled
+        try:
+            await call()
+        except Exception as e:
+            self.errors[type(e).__qualname__] += 1
+        else:
+            self.latencies.append(time.perf_counter() - start)
+
+        self.finished = time.perf_counter()
+
+    def format(self) -> str:
+        lines = [
+            f"Calls:      {self.calls} ({self.throughput:.1f}/s)",
+            f"Errors:     {self.error_count} ({self.error_rate:.2%})",
+            "Latency:    " + "  ".join(
+                f"{name} {latency * 1000:.3f}ms"
+                for name, latency in (
+                    ("p50", self.percentile(50)),
+                    ("p90", self.percentile(90)),
+                    ("p99", self.percentile(99)),
+                    ("max", max(self.latencies, default=0.0)),
+                )
+            ),
+        ]
+        lines.extend(f"            {count} x {error}" for error, count in self.errors.most_common())
+        return "\n".join(lines)
+
+
+async def run_closed_loop(call: BenchCall, *, concurrency: int, duration: float) -> LoadReport:
+    """Runs the call from concurrent tasks that each make their next call as soon as their last call completes. Calls
+    stop being started once the duration has elapsed."""
+    report = LoadReport()
+    deadline = report.started + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            await report.record(call)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return report
+
+
+async def run_open_loop(call: BenchCall, *, rate: float, duration: float) -> LoadReport:
+    """Starts calls at a fixed rate for the duration no matter how many calls are in flight, then waits for every call
+    to complete. Latency is measured from the time each call was scheduled to start."""
+    report = LoadReport()
+    interval = 1 / rate
+    tasks = set()
+    for index in range(math.ceil(rate * duration)):
+        scheduled = report.started + index * interval
+        if (delay := scheduled - time.perf_counter()) > 0:
+            await asyncio.sleep(delay)
+
+        task = asyncio.create_task(report.record(call, scheduled))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    await asyncio.gather(*tasks)
+    return report
+
+
+def parse_value(value: str) -> Any:
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError:
+        return value
+
+
+def parse_keyword_argument(value: str) -> tuple[str, Any]:
+    name, separator, argument = value.partition("=")
+    if not separator or not name.isidentifier():
+        raise argparse.ArgumentTypeError(f"Keyword arguments must be formatted as name=value: {value!r} (invalid)")
+
+    return name, parse_value(argument)
+
+
+def parse_bench_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="schism bench", description="Load test a method of a running service.")
+    parser.add_argument("service", help="Name of the service in the schism.config file")
+    parser.add_argument("method", help="Name of the service method to call")
+    parser.add_argument("--args", nargs="*", default=[], type=parse_value, help="Positional arguments, parsed as JSON")
+    parser.add_argument(
+        "--kwargs", nargs="*", default=[], type=parse_keyword_argument, help="Keyword arguments as name=value"
+    )
+    parser.add_argument("--concurrency", type=int, default=10, help="Tasks making calls in closed loop mode")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to start calls for")
+    parser.add_argument("--rate", type=float, help="Calls started per second, runs open loop when set")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Seconds to wait for the service to be ready")
+    return parser.parse_args(argv)
+
+
+def create_call(service: Any, method: str, args: list[Any], kwargs: dict[str, Any]) -> BenchCall:
+    """Creates a callable that calls the method on the service, consuming every item when it's a streaming method."""
+    function = getattr(service, method)
+
+    async def call():
+        result = function(*args, **kwargs)
+        if hasattr(result, "__aiter__"):
+            async for _ in result:
+                pass
+        else:
+            await result
+
+    return call
+
+
+def find_service_type(controller: DistributedController, name: str) -> "Type[services.Service]":
+    for service_config in controller.service_configs.values():
+        if name in (service_config.name, service_config.service):
+            return service_config.get_service_type()
+
+    raise RuntimeError(f"Unknown service: {name}\n\nAll services must be configured in the schism.config file.")
+
+
+async def bench(options: argparse.Namespace) -> LoadReport:
+    controller = DistributedController.activate()
+    service_type = find_service_type(controller, options.service)
+    await services.wait_for(service_type, timeout=options.timeout)
+
+    call = create_call(get_repository().get(service_type), options.method, options.args, dict(options.kwargs))
+    if options.rate:
+        return await run_open_loop(call, rate=options.rate, duration=options.duration)
+
+    return await run_closed_loop(call, concurrency=options.concurrency, duration=options.duration)
+
+
+@inject
+def start_bench(argv: list[str], config: ApplicationConfig = dependency()):
+    options = parse_bench_args(argv)
+    print(runtime.run(bench(options), config.runtime).format())
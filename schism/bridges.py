@@ -16,24 +16,41 @@ needed to make it accessible
 schism.config file, this return in passed through to the create_client and create_server methods
 
 The client class only has to implement a single method call_async_method which should pass the method call payload to
-the bridge server. It should then return the result payload that the server responds with.
+the bridge server. It should then return the result payload that the server responds with. Clients can also implement
+call_batch to send a batch of method calls to the server in a single request, by default each call in the batch is sent
+on its own. Service methods that are async generators are called using stream_async_method, clients can implement it to
+stream the items to the client as they're generated, by default the server collects every item into a list that is
+returned as a single result. Method calls with streamed arguments (async iterables and files) are sent using
+upload_async_method, clients can implement it to stream the arguments to the server, by default each streamed argument
+is read completely and sent with the method call.
 
 The server class's implementation is much less strict. It only needs to pass the method call payload it receives to the
-call_async_method method of the server instance and then pass that method's return payload back to the client.
+call_async_method method of the server instance and then pass that method's return payload back to the client. Servers
+that receive batch payloads pass them to the call_batch method of the server instance, servers that support streaming
+pass stream requests to the stream_async_method of the server instance and send each result payload it yields.
 
 The client and server classes are instantiated with the bridge config, the server class is also instantiated with a
 service facade that method call payloads can be passed to for handling."""
 import traceback
 from abc import ABC, abstractmethod
-from functools import partial
-from typing import Awaitable, Type, TYPE_CHECKING, Any, TypedDict
+from enum import Enum
+from functools import cache, cached_property, partial
+import asyncio
+import contextlib
+import inspect
+import io
+from typing import AsyncIterator, Awaitable, Callable, NamedTuple, NotRequired, Type, TYPE_CHECKING, Any, TypedDict
 
 from bevy import get_repository
 
+import schism.batches as batches
+import schism.deadlines as deadlines
+from schism.admission import Admission, AdaptiveLimiter
 import schism.middleware as middleware
 
 
 if TYPE_CHECKING:
+    from schism.configs import AdaptiveLimitConfig, CoalesceConfig, TimeoutsConfig
     from schism.services import Service
 
 
@@ -42,6 +59,7 @@ class MethodCallPayload(TypedDict):
     method: str
     args: tuple
     kwargs: dict
+    timeout: NotRequired[float]  # Seconds the client waits for the call, see the schism.deadlines module
 
 
 class ReturnPayload(TypedDict):
@@ -55,6 +73,81 @@ class ExceptionPayload(TypedDict):
 
 type ResultPayload = ReturnPayload | ExceptionPayload
 
+# The size of the chunks that files are read in when they are passed as streamed arguments
+STREAMED_ARGUMENT_CHUNK_SIZE = 64 * 1024
+
+
+class BatchCallPayload(TypedDict):
+    service: "Type[Service]"
+    calls: list[MethodCallPayload]
+    concurrent: NotRequired[bool]  # The calls are independent and can be run concurrently rather than in order
+
+
+class BatchResultPayload(TypedDict):
+    results: list[ResultPayload]
+
+
+@cache
+def service_methods(service_type: "Type[Service]") -> tuple[str, ...]:
+    """The names of the public methods of a service type, in a stable order so that bridges can refer to a method by
+    its position."""
+    return tuple(name for name, _ in inspect.getmembers(service_type, inspect.isroutine) if not name.startswith("_"))
+
+
+def is_streamed_argument(value: Any) -> bool:
+    """Async iterables and files passed as arguments to a remote service are streamed to the server, the service method
+    receives them as async iterators. Files are streamed in chunks."""
+    return hasattr(type(value), "__aiter__") or isinstance(value, io.IOBase)
+
+
+async def iterate_streamed_argument(value: Any, chunk_size: int = STREAMED_ARGUMENT_CHUNK_SIZE) -> AsyncIterator[Any]:
+    """Iterates the items of an async iterable or the chunks of a file. Files other than in-memory files are read in a
+    thread so that reading them doesn't block the event loop."""
+    match value:
+        case io.BytesIO() | io.StringIO():
+            while chunk := value.read(chunk_size):
+                yield chunk
+
+        case io.IOBase():
+            while chunk := await asyncio.to_thread(value.read, chunk_size):
+                yield chunk
+
+        case _:
+            async for item in value:
+                yield item
+
+
+class BufferedArgumentStream:
+    """Stands in for a streamed argument that was read completely before the method call was sent, so that the service
+    method receives an async iterator regardless of whether the bridge can stream arguments."""
+    def __init__(self, items: list):
+        self.items = items
+        self._position = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._position >= len(self.items):
+            raise StopAsyncIteration
+
+        self._position += 1
+        return self.items[self._position - 1]
+
+
+async def buffer_streamed_arguments(payload: MethodCallPayload) -> MethodCallPayload:
+    """Reads every streamed argument in the payload into a buffered argument stream."""
+    async def buffer(value):
+        if is_streamed_argument(value):
+            return BufferedArgumentStream([item async for item in iterate_streamed_argument(value)])
+
+        return value
+
+    return payload | MethodCallPayload(
+        args=tuple([await buffer(arg) for arg in payload["args"]]),
+        kwargs={name: await buffer(value) for name, value in payload["kwargs"].items()},
+    )
+
 
 class ResponseBuilder[Payload: ResultPayload]:
     """A helper context that captures all exceptions that are raised on the server while attempting to respond to a
@@ -70,12 +163,16 @@ class ResponseBuilder[Payload: ResultPayload]:
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if exc_type is not None:
-            self._payload = ExceptionPayload(
-                error=exc_val,
-                traceback=traceback.format_exception(exc_type, exc_val, exc_tb),
-            )
+        if exc_type is None:
+            return True
+
+        if issubclass(exc_type, asyncio.CancelledError) and asyncio.current_task().cancelling():
+            return False  # The request was cancelled so nothing is waiting for a response
 
+        self._payload = ExceptionPayload(
+            error=exc_val,
+            traceback=traceback.format_exception(exc_type, exc_val, exc_tb),
+        )
         return True
 
     def set(self, payload: Payload):
@@ -104,6 +201,36 @@ class BridgeClient(ABC):
         with."""
         ...
 
+    async def call_batch(self, payload: BatchCallPayload) -> BatchResultPayload:
+        """Should pass the batch payload up to the running bridge server and return the batch result payload it responds
+        with. Bridges that cannot send a batch in a single request can rely on this default, which sends each call on
+        its own."""
+        if payload.get("concurrent"):
+            return BatchResultPayload(
+                results=list(await asyncio.gather(*map(self.call_async_method, payload["calls"])))
+            )
+
+        return BatchResultPayload(results=[await self.call_async_method(call) for call in payload["calls"]])
+
+    async def stream_async_method(self, payload: MethodCallPayload) -> AsyncIterator[ResultPayload]:
+        """Should stream the items generated by an async generator method on the server, yielding a result payload for
+        each item and ending with an exception payload if the generator raises. Bridges that cannot stream can rely on
+        this default, the server responds to the method call with a list of every item the generator yields."""
+        match await self.call_async_method(payload):
+            case {"result": list() as items}:
+                for item in items:
+                    yield ReturnPayload(result=item)
+
+            case result:
+                yield result
+
+    async def upload_async_method(self, payload: MethodCallPayload) -> ResultPayload:
+        """Should pass a method call payload that has streamed arguments (see is_streamed_argument) up to the running
+        bridge server, streaming the arguments so that the service method receives each as an async iterator. Bridges
+        that cannot stream arguments can rely on this default, every streamed argument is read completely and sent with
+        the method call."""
+        return await self.call_async_method(await buffer_streamed_arguments(payload))
+
     @abstractmethod
     async def wait_for_server(self, *, timeout: float = 5.0):
         """Should wait for the server to be ready to accept requests."""
@@ -120,6 +247,15 @@ class BridgeServer:
     def call_async_method(self, payload: MethodCallPayload) -> Awaitable[ResultPayload]:
         return self.service_facade.call_async_method(payload)
 
+    def call_batch(self, payload: BatchCallPayload) -> Awaitable[BatchResultPayload]:
+        return self.service_facade.call_batch(payload)
+
+    def stream_async_method(self, payload: MethodCallPayload) -> AsyncIterator[ResultPayload]:
+        return self.service_facade.stream_async_method(payload)
+
+    async def drain(self, timeout: float):
+        """Called when the service is shutting down. Servers should stop accepting connections and give the requests
+        they are handling up to the timeout to complete before closing their connections."""
 
 
 class BaseBridge(ABC):
@@ -147,39 +283,141 @@ class BaseBridge(ABC):
 class BridgeClientFacade:
     """The client facade is injected in place of a service and passes off method calls to the bridge client. The facade
     handles propagation of exceptions from the bridge server to the client code. The facade also handles running
-    middleware on the client side."""
+    middleware on the client side, the middleware pipelines are built once when the middleware stack is set. When the
+    service has an adaptive limit the requests the facade sends are limited, see the schism.admission module. Calls
+    carry the time left until their deadline, see the schism.deadlines module."""
     def __init__(
         self,
         bridge_type: Type[BaseBridge],
         service_type: "Type[Service]",
         config: Any,
-        middleware_stack: "middleware.MiddlewareStack"
+        middleware_stack: "middleware.MiddlewareStack",
+        coalesce: "CoalesceConfig | None" = None,
+        adaptive_limit: "AdaptiveLimitConfig | None" = None,
+        timeouts: "TimeoutsConfig | None" = None,
     ):
         self.client = bridge_type.create_client(config)
         self.service_type = service_type
         self.middleware = middleware_stack
+        self.coalescer = coalesce and batches.Coalescer(
+            self.client, service_type, window=coalesce.window, max_calls=coalesce.max_calls
+        )
+        self.limiter = adaptive_limit and AdaptiveLimiter.from_config(adaptive_limit)
+        self.timeouts = timeouts
 
     def __getattr__(self, item):
+        if inspect.isasyncgenfunction(getattr(self.service_type, item, None)):
+            return partial(self._stream, item)
+
         return partial(self._call, item)
 
+    @property
+    def middleware(self) -> "middleware.MiddlewareStack":
+        return self._middleware
+
+    @middleware.setter
+    def middleware(self, middleware_stack: "middleware.MiddlewareStack"):
+        self._middleware = middleware_stack
+        self._send_pipeline = middleware_stack.compile(middleware.MiddlewareContext.CLIENT, self._send)
+        self._upload_pipeline = middleware_stack.compile(middleware.MiddlewareContext.CLIENT, self._upload)
+        self._stream_pipeline = middleware_stack.compile(middleware.MiddlewareContext.CLIENT, self._open_stream)
+
     async def wait_for_server(self, *, timeout: float = 5.0):
         """Waits for the server to be ready to accept requests."""
         await self.client.wait_for_server(timeout=timeout)
 
+    @classmethod
+    @cache
+    def for_service(cls, service_type: "Type[Service]") -> "Type[BridgeClientFacade]":
+        """Generates a client facade type for a service type. Each public method of the service becomes a method on the
+        facade that builds its call payload directly, and accessing any other attribute raises an AttributeError
+        without contacting the server. The generated type is cached for each service type."""
+        namespace = {
+            "__getattr__": _reject_unknown_method,
+            "__module__": service_type.__module__,
+            "__qualname__": f"{service_type.__qualname__}Client",
+        }
+        for name in service_methods(service_type):
+            if not hasattr(BridgeClientFacade, name):
+                namespace[name] = _create_stub_method(service_type, name, getattr(service_type, name))
+
+        return type(f"{service_type.__name__}Client", (cls,), namespace)
+
     async def _call(self, method: str, *args, **kwargs):
-        payload = MethodCallPayload(
-            service=self.service_type,
-            method=method,
-            args=args,
-            kwargs=kwargs,
-        )
-        result = await self.middleware.run(
-            middleware.MiddlewareContext.CLIENT,
-            payload,
-            self.client.call_async_method
+        return await self._call_method(
+            MethodCallPayload(service=self.service_type, method=method, args=args, kwargs=kwargs)
         )
+
+    async def _call_method(self, payload: MethodCallPayload):
+        """Sends the call, when the call has a deadline the client stops waiting for the result once it passes."""
+        if (timeout := self._get_timeout(payload)) is None:
+            return await self._send_call(payload)
+
+        async with deadlines.deadline(timeout):
+            return await self._send_call(payload | MethodCallPayload(timeout=timeout))
+
+    async def _send_call(self, payload: MethodCallPayload):
+        args, kwargs = payload["args"], payload["kwargs"]
+        if any(map(is_streamed_argument, args)) or any(map(is_streamed_argument, kwargs.values())):
+            result = await self._upload_pipeline(payload)
+        else:
+            result = await self._send_pipeline(payload)
+
         return await self._process_result(result)
 
+    def _stream(self, method: str, *args, **kwargs) -> AsyncIterator[Any]:
+        return self._stream_method(
+            MethodCallPayload(service=self.service_type, method=method, args=args, kwargs=kwargs)
+        )
+
+    async def _stream_method(self, payload: MethodCallPayload) -> AsyncIterator[Any]:
+        """Streams the items generated by an async generator method. The client middleware runs once when the stream is
+        opened, the result it gets is an async iterator of result payloads. The server ends the stream when the call's
+        deadline passes."""
+        if (timeout := self._get_timeout(payload)) is not None:
+            payload = payload | MethodCallPayload(timeout=timeout)
+
+        result = await self._stream_pipeline(payload)
+        async with contextlib.aclosing(await self._process_result(result)) as stream:
+            async for item in stream:
+                yield await self._process_result(item)
+
+    async def _open_stream(self, payload: MethodCallPayload) -> ReturnPayload:
+        deadline = asyncio.get_running_loop().time() + payload["timeout"] if "timeout" in payload else None
+        open_stream = _send_with_remaining_time(self.client.stream_async_method, deadline)
+        if self.limiter:
+            return ReturnPayload(result=self.limiter.stream(open_stream, payload))
+
+        return ReturnPayload(result=open_stream(payload))
+
+    def _get_timeout(self, payload: MethodCallPayload) -> float | None:
+        timeout = deadlines.get_timeout(self.timeouts and self.timeouts.get_timeout(payload["method"]))
+        if timeout is not None and timeout <= 0:
+            raise TimeoutError(f"The deadline for {self.service_type.__name__}.{payload['method']} has passed")
+
+        return timeout
+
+    def _send(self, payload: MethodCallPayload) -> Awaitable[ResultPayload]:
+        """Sends the payload to the server, calls made on a batch are queued on the batch to be sent together and calls
+        are coalesced with other concurrent calls when the service has coalescing configured."""
+        match batches.get_active_batch():
+            case batches.RemoteBatch(facade=facade) as batch if facade is self:
+                return batch.enqueue(payload)
+
+            case _ if self.coalescer:
+                return self._limit(self.coalescer.call, payload)
+
+            case _:
+                return self._limit(self.client.call_async_method, payload)
+
+    def _upload(self, payload: MethodCallPayload) -> Awaitable[ResultPayload]:
+        return self._limit(self.client.upload_async_method, payload)
+
+    def _limit(
+        self, send: Callable[[MethodCallPayload], Awaitable[ResultPayload]], payload: MethodCallPayload
+    ) -> Awaitable[ResultPayload]:
+        send = _send_with_remaining_time(send, deadlines.get_deadline())
+        return self.limiter.call(send, payload) if self.limiter else send(payload)
 
     async def _process_result(self, result: ResultPayload):
         match result:
@@ -202,29 +440,222 @@ class BridgeClientFacade:
 class BridgeServiceFacade:
     """The service facade gets the method call payload from the bridge server and handles calling the method on the
     service, capturing the return value and any exceptions to pass back to the bridge server as a result payload which
-    is then sent to the client."""
+    is then sent to the client. The server middleware pipelines are built once when the middleware stack is set.
+    Requests over the service's admission limits are rejected with an OverloadedError before the middleware runs, see
+    the schism.admission module."""
     def __init__(
         self,
         service_type: "Type[Service]",
         middleware_stack: "middleware.MiddlewareStack",
+        admission: Admission | None = None,
     ):
         self.service_type = service_type
         self.middleware = middleware_stack
+        self.admission = admission or Admission()
+
+    @property
+    def middleware(self) -> "middleware.MiddlewareStack":
+        return self._middleware
 
-    async def call_async_method(self, _payload: MethodCallPayload) -> ResultPayload:
+    @middleware.setter
+    def middleware(self, middleware_stack: "middleware.MiddlewareStack"):
+        self._middleware = middleware_stack
+        self._call_pipeline = middleware_stack.compile(middleware.MiddlewareContext.SERVER, self._call_method)
+        self._stream_pipeline = middleware_stack.compile(middleware.MiddlewareContext.SERVER, self._open_stream)
+
+    async def call_async_method(self, payload: MethodCallPayload) -> ResultPayload:
         """Call the method on the service and return the result payload."""
+        if error := self.admission.acquire(payload["method"]):
+            return _rejection(error)
 
-        def call(payload):
-            if payload["service"] != self.service_type:
-                raise ValueError(f"Service types do not match: {self.service_type} != {payload['service']}")
+        try:
+            with ResponseBuilder() as result:
+                if "timeout" in payload:
+                    async with deadlines.deadline(payload["timeout"]):
+                        result.set(await self._call_pipeline(payload))
 
-            service = get_repository().get(self.service_type)
-            method = getattr(service, payload["method"])
-            return method(*payload["args"], **payload["kwargs"])
+                else:
+                    result.set(await self._call_pipeline(payload))
 
-        with ResponseBuilder() as result:
-            result.set(
-                await self.middleware.run(middleware.MiddlewareContext.SERVER, _payload, call)
-            )
+        finally:
+            self.admission.release(payload["method"])
 
         return result.payload
+
+    async def stream_async_method(self, payload: MethodCallPayload) -> AsyncIterator[ResultPayload]:
+        """Calls an async generator method on the service, yielding a result payload for each item it generates. If
+        the method raises an exception an exception payload is yielded and the stream ends. The server middleware runs
+        once when the stream is opened. The stream counts against the admission limits until it ends and it's ended
+        with a TimeoutError if the call's deadline passes."""
+        if error := self.admission.acquire(payload["method"]):
+            yield _rejection(error)
+            return
+
+        deadline = asyncio.get_running_loop().time() + payload["timeout"] if "timeout" in payload else None
+        try:
+            with ResponseBuilder() as result:
+                async with _deadline_at(deadline):
+                    result.set(await self._stream_pipeline(payload))
+
+            match result.payload:
+                case {"result": stream}:
+                    async with contextlib.aclosing(stream):
+                        while True:
+                            try:
+                                async with _deadline_at(deadline):
+                                    item = await anext(stream)
+                            except StopAsyncIteration:
+                                return
+                            except Exception as e:
+                                yield ExceptionPayload(error=e, traceback=traceback.format_exception(e))
+                                return
+
+                            yield ReturnPayload(result=item)
+
+                case error:
+                    yield error
+
+        finally:
+            self.admission.release(payload["method"])
+
+    async def call_batch(self, payload: BatchCallPayload) -> BatchResultPayload:
+        """Calls each method in the batch in order, or concurrently if the batch allows it. Each call runs through the
+        middleware and gets its own result payload."""
+        if payload.get("concurrent"):
+            return BatchResultPayload(
+                results=list(await asyncio.gather(*map(self.call_async_method, payload["calls"])))
+            )
+
+        return BatchResultPayload(results=[await self.call_async_method(call) for call in payload["calls"]])
+
+    @cached_property
+    def dispatch_table(self) -> "dict[str, ServiceMethod]":
+        """Maps the name of each public method of the service to the method bound to the service instance. It's built
+        the first time a method is called unless build_dispatch_table was called first."""
+        return self.build_dispatch_table()
+
+    def build_dispatch_table(self) -> "dict[str, ServiceMethod]":
+        """Resolves the service instance from the repository and builds the dispatch table. Servers call this before
+        they accept requests so the first request doesn't have to."""
+        service = get_repository().get(self.service_type)
+        self.dispatch_table = {name: ServiceMethod.bind(service, name) for name in service_methods(self.service_type)}
+        return self.dispatch_table
+
+    def _get_method(self, payload: MethodCallPayload) -> "ServiceMethod":
+        if payload["service"] is not self.service_type:
+            raise ValueError(f"Service types do not match: {self.service_type} != {payload['service']}")
+
+        try:
+            return self.dispatch_table[payload["method"]]
+        except KeyError:
+            raise AttributeError(
+                f"{self.service_type.__name__} has no public method {payload['method']!r}"
+            ) from None
+
+    async def _call_method(self, payload: MethodCallPayload) -> Any:
+        method = self._get_method(payload)
+        result = method.call(*payload["args"], **payload["kwargs"])
+        match method.kind:
+            case ServiceMethodKind.COROUTINE:
+                return await result
+
+            case ServiceMethodKind.ASYNC_GENERATOR:
+                return await _collect(result)  # Clients that cannot stream get every item the generator yields at once
+
+            case ServiceMethodKind.GENERATOR:
+                return list(result)
+
+            case _ if inspect.isawaitable(result):  # Sync wrappers and decorated methods can return a coroutine
+                return await result
+
+            case _:
+                return result
+
+    async def _open_stream(self, payload: MethodCallPayload) -> AsyncIterator[Any]:
+        method = self._get_method(payload)
+        if method.kind is not ServiceMethodKind.ASYNC_GENERATOR:
+            raise TypeError(f"{self.service_type.__name__}.{payload['method']} is not an async generator method")
+
+        return method.call(*payload["args"], **payload["kwargs"])
+
+
+def with_remaining_time(payload: MethodCallPayload, deadline: float | None) -> MethodCallPayload:
+    """Sets the timeout of a call that has one to the time left until the deadline, an event loop time."""
+    if deadline is None or "timeout" not in payload:
+        return payload
+
+    return payload | MethodCallPayload(timeout=max(0.0, deadline - asyncio.get_running_loop().time()))
+
+
+def _send_with_remaining_time[R](
+    send: Callable[[MethodCallPayload], R], deadline: float | None
+) -> Callable[[MethodCallPayload], R]:
+    """Calls can wait in the adaptive limiter and the coalescer before they're sent, so the timeout the server gets is
+    set when the call is handed to the bridge client rather than when the call was made."""
+    if deadline is None:
+        return send
+
+    return lambda payload: send(with_remaining_time(payload, deadline))
+
+
+def _deadline_at(deadline: float | None) -> contextlib.AbstractAsyncContextManager[None]:
+    return contextlib.nullcontext() if deadline is None else deadlines.deadline_at(deadline)
+
+
+def _rejection(error: Exception) -> ExceptionPayload:
+    # Rejections skip formatting a stack trace so that shedding load stays cheap when the service is overloaded
+    return ExceptionPayload(error=error, traceback=traceback.format_exception_only(error))
+
+
+class ServiceMethodKind(Enum):
+    COROUTINE = "coroutine"
+    ASYNC_GENERATOR = "async_generator"
+    GENERATOR = "generator"
+    FUNCTION = "function"
+
+
+class ServiceMethod(NamedTuple):
+    """A method bound to a service instance, with the kind of callable it is so that it can be dispatched without
+    inspecting it on every call."""
+    name: str
+    call: Callable
+    kind: ServiceMethodKind
+
+    @classmethod
+    def bind(cls, service: "Service", name: str) -> "ServiceMethod":
+        method = getattr(service, name)
+        if inspect.isasyncgenfunction(method):
+            kind = ServiceMethodKind.ASYNC_GENERATOR
+        elif inspect.iscoroutinefunction(method):
+            kind = ServiceMethodKind.COROUTINE
+        elif inspect.isgeneratorfunction(method):
+            kind = ServiceMethodKind.GENERATOR
+        else:
+            kind = ServiceMethodKind.FUNCTION
+
+        return cls(name, method, kind)
+
+
+def _create_stub_method(service_type: "Type[Service]", name: str, function: Callable) -> Callable:
+    if inspect.isasyncgenfunction(function):
+        def stub(self, *args, **kwargs):
+            return self._stream_method(MethodCallPayload(service=service_type, method=name, args=args, kwargs=kwargs))
+
+    else:
+        async def stub(self, *args, **kwargs):
+            return await self._call_method(
+                MethodCallPayload(service=service_type, method=name, args=args, kwargs=kwargs)
+            )
+
+    stub.__name__ = name
+    stub.__qualname__ = f"{service_type.__qualname__}Client.{name}"
+    stub.__doc__ = function.__doc__
+    return stub
+
+
+def _reject_unknown_method(self: BridgeClientFacade, item: str):
+    raise AttributeError(f"{self.service_type.__name__} has no method {item!r}")
+
+
+async def _collect(stream: AsyncIterator[Any]) -> list[Any]:
+    return [item async for item in stream]
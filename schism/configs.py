@@ -38,16 +38,73 @@ class LaunchConfig(SchismConfigModel, lax=True):
     settings: dict[str, Any] | None = None
 
 
+class CoalesceConfig(SchismConfigModel, lax=True):
+    """Config model for coalescing concurrent calls to a remote service into batches, see the schism.batches module.
+    "window" is the number of seconds calls are held for, "max_calls" is the most calls that are sent in one batch."""
+    window: float = 0.0002
+    max_calls: int = 64
+
+
+class AdaptiveLimitConfig(SchismConfigModel, lax=True):
+    """Config model for limiting the requests a client has in flight to a remote service, see the schism.admission
+    module. The limit starts at "initial_limit" and adapts between "min_limit" and "max_limit", it's multiplied by
+    "backoff" when it's cut. "max_queue" is the most requests that wait for the limit and "queue_timeout" is the most
+    seconds they wait, requests wait until there's room when it isn't set."""
+    initial_limit: int = 20
+    min_limit: int = 1
+    max_limit: int = 200
+    backoff: float = 0.9
+    latency_tolerance: float = 2.0
+    min_latency_delta: float = 0.005
+    max_queue: int = 100
+    queue_timeout: float | None = None
+
+
+class TimeoutsConfig(SchismConfigModel, lax=True):
+    """Config model for the timeouts of calls to a remote service, see the schism.deadlines module. "default" is the
+    timeout in seconds for every method and "methods" maps method names to their timeouts."""
+    default: float | None = None
+    methods: dict[str, float] = {}
+
+    def get_timeout(self, method: str) -> float | None:
+        return self.methods.get(method, self.default)
+
+
+class ExecutorsConfig(SchismConfigModel, lax=True):
+    """Config model for the pools that a service's offloaded methods run in, see the schism.executors module. When a
+    size isn't set Python's default pool size is used."""
+    thread_pool_size: int | None = None
+    process_pool_size: int | None = None
+
+
+class LimitsConfig(SchismConfigModel, lax=True):
+    """Config model for the admission limits of a service, see the schism.admission module. "max_in_flight" is the most
+    requests the service handles at once, "methods" maps method names to the most requests each handles at once. A
+    service has no limits by default."""
+    max_in_flight: int | None = None
+    methods: dict[str, int] = {}
+
+
 class ServiceConfig(SchismConfigModel, lax=True):
     """Config model for a service.
     - "name" is used for referencing the service in commands
     - "service" is the module import path and class name, separated by a colon, for the service class
     - "bridge" is either the module import path and class name, separated by a colon, for the bridge class, or a
     dictionary with a "type" key that is the bridge class string. All other keys in the dictionary are passed to the
-    bridge types "config_factory" class method to generate teh config that is passed to the bridge client and server."""
+    bridge types "config_factory" class method to generate teh config that is passed to the bridge client and server.
+    The "middleware", "coalesce", "adaptive_limit", and "timeouts" keys configure the client facade and server facade
+    that wrap the bridge.
+    - "workers" is the number of processes the service is run in, see the schism.supervisor module
+    - "executors" sets the sizes of the pools that offloaded methods run in, see the schism.executors module
+    - "drain_timeout" is the number of seconds in-flight requests are given to complete when the service shuts down
+    - "limits" caps the requests the service handles at once, see the schism.admission module"""
     name: str
     service: str
     bridge: StringOrSettings
+    workers: int = 1
+    executors: ExecutorsConfig = ExecutorsConfig()
+    drain_timeout: float = 10.0
+    limits: LimitsConfig = LimitsConfig()
 
     def get_bridge_type(self) -> "Type[bridges.BaseBridge]":
         """Finds the module for the bridge type and gets the bridge type from the module."""
@@ -70,6 +127,42 @@ class ServiceConfig(SchismConfigModel, lax=True):
             case _:
                 return MiddlewareStack()
 
+    def get_bridge_coalescing(self) -> CoalesceConfig | None:
+        """Gets the settings for coalescing concurrent calls to the service, if it is enabled."""
+        match self.bridge:
+            case {"coalesce": dict() as settings}:
+                return CoalesceConfig(**settings)
+
+            case {"coalesce": True}:
+                return CoalesceConfig()
+
+            case _:
+                return None
+
+    def get_bridge_adaptive_limit(self) -> AdaptiveLimitConfig | None:
+        """Gets the settings for adaptively limiting the client's requests to the service, if it is enabled."""
+        match self.bridge:
+            case {"adaptive_limit": dict() as settings}:
+                return AdaptiveLimitConfig(**settings)
+
+            case {"adaptive_limit": True}:
+                return AdaptiveLimitConfig()
+
+            case _:
+                return None
+
+    def get_bridge_timeouts(self) -> TimeoutsConfig | None:
+        """Gets the timeouts for calls to the service, if any are set."""
+        match self.bridge:
+            case {"timeouts": dict() as settings}:
+                return TimeoutsConfig(**settings)
+
+            case {"timeouts": int() | float() as default}:
+                return TimeoutsConfig(default=default)
+
+            case _:
+                return None
+
     def _generate_middleware(self, middleware: list[StringOrSettings]):
         for middleware_setting in middleware:
             match middleware_setting:
@@ -102,8 +195,17 @@ class ServiceConfig(SchismConfigModel, lax=True):
         return getattr(module, attr)
 
 
+class RuntimeConfig(SchismConfigModel, lax=True):
+    """Config model for the event loop that services and applications run on, see the schism.runtime module."""
+    loop: str = "auto"
+    default_executor_size: int | None = None
+    debug: bool | None = None
+    slow_callback_duration: float | None = None
+
+
 class ApplicationConfig(SchismConfigModel, filename="schism.config"):
     """Config model for an application stored in the schism.config file. By default, this file can be a JSON, TOML, or
     YAML file. Schism only checks the working directory for this file."""
     services: list[ServiceConfig]
     launch: LaunchConfig | None = None
+    runtime: RuntimeConfig = RuntimeConfig()
@@ -27,9 +27,19 @@ bootstrapping all service types so they start in the correct order following the
 
 The DistributedController handles bootstrapping standalone services and running the application callback as its own
 process that is autowired to access distributed services. This is typically done by running services and applications
-using the "schism run" CLI."""
+using the "schism run" CLI. Services configured with several workers are run by the WorkerSupervisor in the
+schism.supervisor module, each worker process has its own DistributedController.
+
+Launch tasks run concurrently until they've all completed or the process receives SIGINT or SIGTERM. When stopped the
+bridge servers in the process stop accepting connections and are given the service's "drain_timeout" to complete the
+requests they're handling, the launch tasks are then cancelled and the shutdown hooks are run:
+
+    get_controller().add_shutdown_hook(database.close)"""
 
 import asyncio
+import inspect
+import os
+import signal
 from abc import ABC, abstractmethod
 from typing import Any, Generator, Type, Callable, Awaitable
 
@@ -39,12 +49,18 @@ from tramp.optionals import Optional
 
 import schism.services as services
 import schism.configs as configs
-from schism.bridges import BridgeServiceFacade
+import schism.executors as executors
+import schism.runtime as runtime
+from schism.admission import Admission
+from schism.bridges import BridgeServer, BridgeServiceFacade
 from schism.middleware import MiddlewareContext
 
 
 type ServicesConfigMapping = dict[Type[services.Service], configs.ServiceConfig]
 
+WORKER_ID_ENVIRONMENT_VARIABLE = "SCHISM_WORKER_ID"
+SHUTDOWN_SIGNALS = (signal.SIGINT, signal.SIGTERM)
+
 _global_controller = None
 
 
@@ -63,6 +79,9 @@ class SchismController(ABC):
         self._remote_services: Optional[ServicesConfigMapping] = Optional.Nothing()
         self._entry_points: dict[str, Any] = {}
         self._launch_tasks: list[Awaitable[None]] = []
+        self._executors: "dict[str, executors.Executors]" = {}
+        self._shutdown_hooks: list[Callable[[], Awaitable[None] | None]] = []
+        self._stopping: asyncio.Event | None = None
 
     @property
     @abstractmethod
@@ -78,6 +97,11 @@ class SchismController(ABC):
     def bootstrap(self):
         """Bootstraps the running process to make services available."""
 
+    @property
+    def drain_timeout(self) -> float:
+        """Seconds the servers in the process are given to complete their in-flight requests when shutting down."""
+        return max((service_config.drain_timeout for service_config in self.active_services.values()), default=0.0)
+
     @property
     def entry_points(self) -> dict[str, Any]:
         return self._entry_points
@@ -97,6 +121,11 @@ class SchismController(ABC):
     def add_launch_task(self, task: Awaitable[None]):
         self._launch_tasks.append(task)
 
+    def add_shutdown_hook(self, hook: Callable[[], Awaitable[None] | None]):
+        """Adds a function, sync or async, that is called once the launch tasks have stopped. Hooks are called in the
+        reverse of the order they were added."""
+        self._shutdown_hooks.append(hook)
+
     def create_entry_point(self, name: str, entry_point: Any):
         _validate_entry_point_name(name)
         self._entry_points[name] = entry_point
@@ -115,6 +144,21 @@ class SchismController(ABC):
 
         return Optional.Nothing()
 
+    def get_executors(self, service: "Type[services.Service]") -> "executors.Executors":
+        """Gets the executors that run the offloaded methods of a service, they're created from the service's config
+        the first time they're needed. Services that aren't configured share a default set of executors."""
+        match self.find_service_matching(service):
+            case Optional.Some(service_config):
+                name, settings = service_config.service, service_config.executors
+
+            case Optional.Nothing():
+                name, settings = "", configs.ExecutorsConfig()
+
+        if name not in self._executors:
+            self._executors[name] = executors.Executors.from_config(settings)
+
+        return self._executors[name]
+
     def get_service_config(self, service: "Type[services.Service]") -> "configs.ServiceConfig":
         match self.find_service_matching(service):
             case Optional.Some(service_config):
@@ -130,7 +174,25 @@ class SchismController(ABC):
         if not self._launch_tasks:
             return
 
-        asyncio.run(self._run_tasks())
+        try:
+            runtime.run(self._run_tasks(), self._load_runtime_config())
+        finally:
+            self.shutdown_executors()
+
+    def stop(self):
+        """Gracefully shuts down the running launch tasks. This is called when the process receives SIGINT or SIGTERM.
+        The servers in the process are drained, then the launch tasks are cancelled and the shutdown hooks run."""
+        if self._stopping:
+            self._stopping.set()
+
+    async def drain(self):
+        """Gives the servers in the process time to complete the requests they're handling before the launch tasks are
+        cancelled."""
+
+    def shutdown_executors(self):
+        """Shuts down the pools of every service's executors."""
+        for service_executors in self._executors.values():
+            service_executors.shutdown()
 
     @inject
     def _load_services_configs(
@@ -139,10 +201,45 @@ class SchismController(ABC):
         for service_config in config.services:
             yield service_config.service, service_config
 
+    @inject
+    def _load_runtime_config(self, config: "configs.ApplicationConfig" = dependency()) -> "configs.RuntimeConfig":
+        return config.runtime
+
     async def _run_tasks(self):
-        async with asyncio.TaskGroup() as group:
-            for task in self._launch_tasks:
-                await group.create_task(task)
+        """Runs the launch tasks concurrently until they've all completed or the controller is stopped."""
+        loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        for signal_number in SHUTDOWN_SIGNALS:
+            loop.add_signal_handler(signal_number, self.stop)
+
+        try:
+            async with asyncio.TaskGroup() as group:
+                tasks = [group.create_task(task) for task in self._launch_tasks]
+                stopping = asyncio.create_task(self._stopping.wait())
+                try:
+                    await asyncio.wait(
+                        [stopping, asyncio.gather(*tasks, return_exceptions=True)],
+                        return_when=asyncio.FIRST_COMPLETED,
+                    )
+                finally:
+                    stopping.cancel()
+
+                if self._stopping.is_set():
+                    await self.drain()
+                    for task in tasks:
+                        task.cancel()
+
+        finally:
+            for signal_number in SHUTDOWN_SIGNALS:
+                loop.remove_signal_handler(signal_number)
+
+            await self._run_shutdown_hooks()
+
+    async def _run_shutdown_hooks(self):
+        for hook in reversed(self._shutdown_hooks):
+            result = hook()
+            if inspect.isawaitable(result):
+                await result
 
     @classmethod
     def activate[Controller: SchismController](cls: Type[Controller], service: str = "") -> Controller:
@@ -223,6 +320,21 @@ class DistributedController(SchismController):
                 )
                 return self.remote_services
 
+    @property
+    def worker_count(self) -> int:
+        """The number of worker processes the active service is configured to run in."""
+        return max((service_config.workers for service_config in self.active_services.values()), default=1)
+
+    @property
+    def worker_id(self) -> int | None:
+        """The index of this worker when the active service is run in several worker processes."""
+        match os.environ.get(WORKER_ID_ENVIRONMENT_VARIABLE):
+            case None:
+                return None
+
+            case worker_id:
+                return int(worker_id)
+
     def bootstrap(self):
         """Entry point processes need to bootstrap services that are active."""
         if not next(self.filter_services(lambda s: s.name == self._active_service_name), False):
@@ -235,16 +347,41 @@ class DistributedController(SchismController):
             bevy.get_repository().get(service_config.get_service_type())  # Create the service instance
             self._launch_server(service_config)
 
+    async def drain(self):
+        """Drains the bridge servers of the active services concurrently."""
+        await asyncio.gather(
+            *(
+                server.drain(self.drain_timeout)
+                for server in self._servers.values()
+                if isinstance(server, BridgeServer)
+            )
+        )
+
     def _launch_server(self, service_config: configs.ServiceConfig):
         bridge = service_config.get_bridge_type()
         service_facade = BridgeServiceFacade(
             service_config.get_service_type(),
             service_config.get_bridge_middleware(),
+            Admission.from_config(service_config.limits),
         )
-        self._servers[service_config.service] = bridge.create_server(
-            bridge.config_factory(service_config.bridge),
-            service_facade,
-        )
+        service_facade.build_dispatch_table()
+        bridge_config = bridge.config_factory(service_config.bridge)
+        if self.worker_id is not None:
+            bridge_config = self._share_address(service_config, bridge_config)
+
+        self._servers[service_config.service] = bridge.create_server(bridge_config, service_facade)
+
+    def _share_address(self, service_config: configs.ServiceConfig, bridge_config: Any) -> Any:
+        """Enables reuse_port on the bridge config so that all the workers can serve on the same address."""
+        match bridge_config:
+            case configs.SchismConfigModel() if "reuse_port" in type(bridge_config).model_fields:
+                return bridge_config.model_copy(update={"reuse_port": True})
+
+            case _:
+                raise ValueError(
+                    f"The {service_config.name} service is configured to run in {service_config.workers} workers but "
+                    f"its bridge doesn't support sharing its address between processes (reuse_port)"
+                )
 
 
 def get_controller() -> SchismController:
@@ -0,0 +1,72 @@
+"""Deadlines stop services from doing work that the caller has stopped waiting for. A deadline is set for a block of
+code, every remote call made in the block sends the time it has left to the service and the service cancels the call
+when that time runs out:
+
+    async with schism.deadline(2):
+        report = await reports.render(report_id)
+
+When the deadline passes the block is cancelled and raises a TimeoutError, the same as asyncio.timeout. Deadlines are
+propagated, calls a service makes to other services while handling a call that has a deadline have the same deadline.
+Nested deadlines can shorten the deadline but never extend it. The time left is measured as the call is sent, so time
+spent waiting in the adaptive limiter or the coalescer isn't given to the service.
+
+Timeouts can also be set for a service's calls on its bridge in the schism.config file, "default" applies to every
+method and "methods" sets the timeout in seconds for individual methods. Calls use the earlier of the timeout and the
+current deadline:
+
+    services:
+      - name: example
+        service: example:Example
+        bridge:
+          type: schism.ext.bridges.simple_tcp:SimpleTCP
+          serve_on: 0.0.0.0:1234
+          timeouts:
+            default: 5
+            methods:
+              render: 30
+
+When a client stops waiting for a call, because of its deadline or because its task was cancelled, bridges that
+support it tell the server to cancel the call. Methods that are run in a thread or process pool (see the
+schism.executors module) can't be interrupted, their results are thrown away."""
+import asyncio
+import contextlib
+import contextvars
+from typing import AsyncIterator
+
+
+_deadline: contextvars.ContextVar[float] = contextvars.ContextVar("schism_deadline")
+
+
+def get_deadline() -> float | None:
+    """Returns the event loop time of the current deadline, if there is one."""
+    return _deadline.get(None)
+
+
+def get_timeout(timeout: float | None = None) -> float | None:
+    """Returns the seconds left until the current deadline or until the timeout elapses, whichever comes first. None is
+    returned when there's neither a deadline nor a timeout."""
+    remaining = None if (deadline := get_deadline()) is None else deadline - asyncio.get_running_loop().time()
+    if timeout is None or (remaining is not None and remaining < timeout):
+        return remaining
+
+    return timeout
+
+
+def deadline(seconds: float) -> contextlib.AbstractAsyncContextManager[None]:
+    """Sets a deadline for the block, see the module docstring."""
+    return deadline_at(asyncio.get_running_loop().time() + seconds)
+
+
+@contextlib.asynccontextmanager
+async def deadline_at(when: float) -> AsyncIterator[None]:
+    """Sets a deadline at the event loop time for the block, unless the current deadline is earlier."""
+    if (current := get_deadline()) is not None and current < when:
+        when = current
+
+    token = _deadline.set(when)
+    try:
+        async with asyncio.timeout_at(when):
+            yield
+
+    finally:
+        _deadline.reset(token)
@@ -0,0 +1,131 @@
+"""Service methods run on the event loop, so a synchronous or CPU heavy method blocks every other request the process is
+handling while it runs. Decorating a synchronous method with run_in sets where it's executed:
+
+    from schism.executors import run_in
+
+    class Images(Service):
+        @run_in("thread")
+        def load(self, path):
+            ...
+
+        @run_in("process")
+        def resize(self, image, width, height):
+            ...
+
+The decorated method becomes a coroutine method, calling it runs the method using the policy and awaiting the call
+returns the result. This is the same whether the service is running in the current process or is being called through
+a bridge, so the code using the service is identical when it's run as a monolith or as distributed services.
+
+- "inline" runs the method on the event loop
+- "thread" runs the method in a thread pool, this suits methods that block on IO or that release the GIL
+- "process" runs the method in a process pool, this suits CPU bound methods. The service instance and the arguments
+  are pickled and sent to the worker process, so the method runs on a copy of the service and any changes it makes to
+  the service are not kept. Worker processes are spawned, so the service must be importable
+
+Each service has its own pools, which are created the first time they're used. Their sizes can be set in the service's
+config, when they aren't set Python's default sizes are used:
+
+    services:
+      - name: images
+        service: example:Images
+        bridge: ...
+        executors:
+          thread_pool_size: 8
+          process_pool_size: 4
+"""
+import asyncio
+import inspect
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from enum import Enum
+from functools import partial, wraps
+from typing import Any, Awaitable, Callable, Type, TYPE_CHECKING
+
+import schism.controllers as controllers
+
+
+if TYPE_CHECKING:
+    from schism.configs import ExecutorsConfig
+    from schism.services import Service
+
+
+class ExecutionPolicy(Enum):
+    INLINE = "inline"
+    THREAD = "thread"
+    PROCESS = "process"
+
+
+class Executors:
+    """Holds the thread and process pools used to run a service's offloaded methods."""
+    def __init__(self, *, thread_pool_size: int | None = None, process_pool_size: int | None = None):
+        self.thread_pool_size = thread_pool_size
+        self.process_pool_size = process_pool_size
+
+        self._pools: dict[ExecutionPolicy, Executor] = {}
+
+    def get_pool(self, policy: ExecutionPolicy) -> Executor:
+        if policy not in self._pools:
+            match policy:
+                case ExecutionPolicy.THREAD:
+                    self._pools[policy] = ThreadPoolExecutor(self.thread_pool_size, thread_name_prefix="schism")
+
+                case ExecutionPolicy.PROCESS:
+                    # Forking a process that has an event loop and thread pools running isn't safe
+                    context = multiprocessing.get_context("spawn")
+                    self._pools[policy] = ProcessPoolExecutor(self.process_pool_size, mp_context=context)
+
+                case _:
+                    raise ValueError(f"{policy} does not use a pool")
+
+        return self._pools[policy]
+
+    async def run(self, policy: ExecutionPolicy, function: Callable, *args, **kwargs) -> Any:
+        if policy is ExecutionPolicy.INLINE:
+            return function(*args, **kwargs)
+
+        pool = self.get_pool(policy)
+        return await asyncio.get_running_loop().run_in_executor(pool, partial(function, *args, **kwargs))
+
+    def shutdown(self):
+        """Shuts down the pools once the methods running in them have completed."""
+        for pool in self._pools.values():
+            pool.shutdown()
+
+        self._pools.clear()
+
+    @classmethod
+    def from_config(cls, config: "ExecutorsConfig") -> "Executors":
+        return cls(thread_pool_size=config.thread_pool_size, process_pool_size=config.process_pool_size)
+
+
+def run_in(policy: ExecutionPolicy | str) -> Callable[[Callable], Callable[..., Awaitable]]:
+    """Decorator that sets the execution policy of a synchronous service method. The method becomes a coroutine
+    method that runs the method using the policy and returns its result."""
+    policy = ExecutionPolicy(policy)
+
+    def decorator(function: Callable) -> Callable[..., Awaitable]:
+        if inspect.iscoroutinefunction(function) or inspect.isasyncgenfunction(function):
+            raise TypeError(f"Only synchronous methods can be given an execution policy: {function.__qualname__}")
+
+        @wraps(function)
+        async def run(self: "Service", *args, **kwargs):
+            target = function
+            if policy is ExecutionPolicy.PROCESS:
+                # Functions that have been decorated can't be pickled, so the worker looks the method up by name
+                target = partial(_call_undecorated, type(self), function.__name__)
+
+            return await get_executors(type(self)).run(policy, target, self, *args, **kwargs)
+
+        run.execution_policy = policy
+        return run
+
+    return decorator
+
+
+def get_executors(service_type: "Type[Service]") -> Executors:
+    """Gets the executors of a service from the active controller."""
+    return controllers.get_controller().get_executors(service_type)
+
+
+def _call_undecorated(service_type: "Type[Service]", name: str, service: "Service", *args, **kwargs) -> Any:
+    return inspect.unwrap(getattr(service_type, name))(service, *args, **kwargs)
@@ -0,0 +1,526 @@
+"""The framing layer used by the Simple TCP Bridge to move signed payloads across a stream. It handles reading and writing
+the protocol's frames, see the simple_tcp module for a description of the frame structures.
+
+Frames are read with exact length reads so that a payload is never truncated by a short read. Large payloads are read
+in chunks into a buffer that is allocated up front, so the stream's internal buffer never has to grow to hold the whole
+payload. Signatures are computed incrementally over memoryviews so the payload is never copied to append the secret key,
+and the header and content of a frame are handed to the transport with a single gathered write (small frames are joined
+into one buffer first, which is cheaper than a gathered write for a few kilobytes).
+
+Version 1 frames are signed with an HMAC-SHA256 of the header and the content, sent as the raw 32 byte digest. Version 0
+frames keep the original signature, the hex encoded SHA256 hash of the content followed by the secret key, so that
+version 0 peers continue to work.
+
+Version 1 frames can carry large binary buffers out-of-band. When a codec is given an out-of-band threshold, payloads
+are pickled using protocol 5 and any bytes, bytearray, or PickleBuffer (the buffer protocol used by array-like types)
+at least as large as the threshold is left out of the pickle. The frame's content is then the pickle followed by a
+table of buffer lengths and the buffers themselves:
+
+Usage          | Size (Bytes)   | Data Type
+---------------|----------------|--------------------
+Pickle         | Content Length | pickle
+Buffer Count   |              4 | int (big endian)
+Buffer Lengths |   8 per buffer | int (big endian)
+Buffers        |      Arbitrary | bytes
+---------------|----------------|--------------------
+
+Buffers are written straight from the memory of the objects being sent and each is read into its own buffer on the
+receiving side, bytearrays and PickleBuffers are then used as is while bytes are copied into a new bytes object.
+
+Version 1 frames can also be compressed using one of the standard library's compression modules (zlib, lzma, or bz2,
+when Python was built with them). Codecs only compress frames at least as large as their compression threshold and only
+keep the compressed frame when it is smaller. The content and each out-of-band buffer are compressed separately so the
+frame layout is unchanged, the lengths in the header and the buffer table are the compressed lengths. Compressing or
+decompressing a frame at least as large as the offload threshold is done in the event loop's default executor so that
+large frames don't block other connections.
+
+The lengths in a frame's header and buffer table can't be trusted until the signature has been checked, which needs
+the whole frame. Codecs refuse frames larger than their max frame size or with more out-of-band buffers than their max
+buffer count before anything is allocated for them, raising a ValueError as they do for an invalid signature.
+"""
+import asyncio
+import hashlib
+import hmac
+import io
+import pickle
+import struct
+import zlib
+from asyncio import StreamReader, StreamWriter
+from enum import IntEnum, IntFlag
+from typing import Any, Callable, NamedTuple, Sequence
+
+from schism.serializers import PickleSerializer, SerializationError, Serializer
+
+
+SIMPLE_TCP_VERSION_SUPPORTED = 0
+SIMPLE_TCP_VERSION_MULTIPLEXED = 1
+SIMPLE_TCP_VERSIONS_SUPPORTED = (SIMPLE_TCP_VERSION_SUPPORTED, SIMPLE_TCP_VERSION_MULTIPLEXED)
+
+# Payloads larger than this are read in chunks into a preallocated buffer rather than through the stream's buffer
+PREALLOCATE_THRESHOLD = 256 * 1024
+# Frames smaller than this are never compressed
+COMPRESSION_THRESHOLD = 64 * 1024
+# Frames at least this large are compressed and decompressed in the default executor rather than on the event loop
+COMPRESSION_OFFLOAD_THRESHOLD = 1024 * 1024
+# The largest frame, content and out-of-band buffers together, that is read before its signature has been checked
+MAX_FRAME_SIZE = 256 * 1024 ** 2
+# The most out-of-band buffers a frame can have
+MAX_FRAME_BUFFERS = 1024
+
+_VERSION = struct.Struct("!H")
+_V0_HEADER = struct.Struct("!HI")
+_V1_HEADER = struct.Struct("!HBBII")
+_V1_FIELDS = struct.Struct("!BBII")
+_BUFFER_COUNT = struct.Struct("!I")
+_JOIN_THRESHOLD = 16 * 1024
+_ONE_SHOT_SIGNATURE_THRESHOLD = 4096
+_V0_SIGNATURE_SIZE = 64
+_V1_SIGNATURE_SIZE = hashlib.sha256().digest_size
+
+type Buffer = bytes | bytearray | memoryview
+
+
+class FrameKind(IntEnum):
+    HELLO = 0
+    REQUEST = 1
+    RESPONSE = 2
+    STREAM = 3  # Opens a stream when sent by a client, carries a chunk of streamed items when sent by a server
+    STREAM_END = 4  # Ends a stream, the payload is None or an exception payload
+    CREDIT = 5  # Allows the peer to send more items on a stream or upload
+    CANCEL = 6  # Stops the server from handling a request or stream
+    UPLOAD = 7  # A method call request that has streamed arguments which follow in upload chunk frames
+    UPLOAD_CHUNK = 8  # Carries a chunk of the items of a streamed argument
+    UPLOAD_END = 9  # Ends a streamed argument
+    GOAWAY = 10  # Sent by a server that is shutting down, the client stops sending requests on the connection
+
+
+class FrameFlag(IntFlag):
+    OUT_OF_BAND = 0x01
+    SERIALIZED = 0x02  # The content was serialized by the connection's negotiated serializer rather than pickle
+    COMPRESSED = 0x04  # The content and out-of-band buffers were compressed by the connection's negotiated compression
+
+
+_FRAME_KINDS = tuple(FrameKind)
+_OUT_OF_BAND = FrameFlag.OUT_OF_BAND.value
+_SERIALIZED = FrameFlag.SERIALIZED.value
+_COMPRESSED = FrameFlag.COMPRESSED.value
+
+
+class Compression(NamedTuple):
+    name: str
+    compress: Callable[[Buffer], bytes]
+    decompress: Callable[[Buffer], bytes]
+
+
+COMPRESSION_CODECS: dict[str, Compression] = {"zlib": Compression("zlib", zlib.compress, zlib.decompress)}
+
+try:
+    import lzma
+except ImportError:  # Python can be built without lzma
+    pass
+else:
+    COMPRESSION_CODECS["lzma"] = Compression("lzma", lzma.compress, lzma.decompress)
+
+try:
+    import bz2
+except ImportError:  # Python can be built without bz2
+    pass
+else:
+    COMPRESSION_CODECS["bz2"] = Compression("bz2", bz2.compress, bz2.decompress)
+
+
+def get_compression(name: str) -> Compression:
+    try:
+        return COMPRESSION_CODECS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown compression codec {name!r}, expected one of {', '.join(map(repr, COMPRESSION_CODECS))}."
+        ) from None
+
+
+class CompressionStats:
+    """Counts the frames and bytes compressed and decompressed by the codecs that share the stats."""
+    def __init__(self):
+        self.frames_compressed = 0
+        self.bytes_before_compression = 0
+        self.bytes_after_compression = 0
+        self.frames_decompressed = 0
+        self.bytes_before_decompression = 0
+        self.bytes_after_decompression = 0
+
+    @property
+    def bytes_saved(self) -> int:
+        """The number of bytes that were kept off the network by compressing frames, sent and received."""
+        return (
+            self.bytes_before_compression
+            - self.bytes_after_compression
+            + self.bytes_after_decompression
+            - self.bytes_before_decompression
+        )
+
+    def __repr__(self):
+        return (
+            f"<{type(self).__name__} compressed={self.frames_compressed} decompressed={self.frames_decompressed} "
+            f"bytes_saved={self.bytes_saved}>"
+        )
+
+
+class FramePayloadError(Exception):
+    """Raised when a version 1 frame was read but its payload couldn't be loaded, an exception type the reader can't
+    import for example. The whole frame has been read so the stream can go on being read."""
+    def __init__(self, kind: "FrameKind", request_id: int, error: Exception):
+        super().__init__(f"Unable to load the payload of a {kind.name.lower()} frame: {error!r}")
+        self.kind = kind
+        self.request_id = request_id
+
+
+class Frame(NamedTuple):
+    version: int
+    kind: FrameKind
+    request_id: int
+    payload: Any
+    flags: int = 0
+
+
+async def read_exactly(reader: StreamReader, size: int) -> bytes | bytearray:
+    """Reads exactly size bytes from the stream. Raises an IncompleteReadError if the stream ends first."""
+    if size <= PREALLOCATE_THRESHOLD:
+        return await reader.readexactly(size)
+
+    return await read_into_buffer(reader, size)
+
+
+async def read_into_buffer(reader: StreamReader, size: int) -> bytearray:
+    """Reads exactly size bytes from the stream into a newly allocated buffer. Raises an IncompleteReadError if the
+    stream ends first."""
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        chunk = await reader.read(size - received)
+        if not chunk:
+            raise asyncio.IncompleteReadError(bytes(view[:received]), size)
+
+        view[received:received + len(chunk)] = chunk
+        received += len(chunk)
+
+    return buffer
+
+
+def sign_v0(content: Buffer, secret_key: bytes) -> bytes:
+    signature = hashlib.sha256(content)
+    signature.update(secret_key)
+    return signature.hexdigest().encode()
+
+
+def sign_v1(parts: Sequence[Buffer], secret_key: bytes) -> bytes:
+    """Computes the HMAC of the frame's parts in order, starting with the header."""
+    if len(parts) == 2 and len(parts[1]) <= _ONE_SHOT_SIGNATURE_THRESHOLD:
+        return hmac.digest(secret_key, parts[0] + parts[1], "sha256")
+
+    signature = hmac.new(secret_key, digestmod="sha256")
+    for part in parts:
+        signature.update(part)
+
+    return signature.digest()
+
+
+def _write(writer: StreamWriter, parts: list[Buffer]):
+    """Small frames are joined and written in one call, that is cheaper than the transport's gathered write. Larger
+    frames are handed to the transport as is so that their content is never copied."""
+    if sum(map(len, parts)) <= _JOIN_THRESHOLD:
+        writer.write(b"".join(parts))
+    else:
+        writer.writelines(parts)
+
+
+class _OutOfBandPickler(pickle.Pickler):
+    """Pickles using protocol 5, collecting buffers at least as large as the threshold instead of pickling them.
+    PickleBuffers are collected through the buffer callback. Bytes and bytearrays are pickled in-band by the pickler so
+    they're collected as persistent IDs, the ID is the type name and the position of the buffer so that repeated
+    references to the same object are sent once."""
+    def __init__(self, file: io.BytesIO, threshold: int):
+        super().__init__(file, protocol=5, buffer_callback=self._collect_buffer)
+        self.threshold = threshold
+        self.buffers: list[memoryview] = []
+        self._collected: dict[int, int] = {}
+
+    def persistent_id(self, obj: Any) -> tuple[str, int] | None:
+        if type(obj) not in (bytes, bytearray) or len(obj) < self.threshold:
+            return None
+
+        if (position := self._collected.get(id(obj))) is None:
+            position = self._collected[id(obj)] = len(self.buffers)
+            self.buffers.append(memoryview(obj))
+
+        return type(obj).__name__, position
+
+    def _collect_buffer(self, buffer: pickle.PickleBuffer) -> bool:
+        try:
+            view = buffer.raw()
+        except BufferError:  # Non-contiguous buffers can't be sent as is
+            return True
+
+        if view.nbytes < self.threshold:
+            return True
+
+        self.buffers.append(view)
+        return False
+
+
+class _OutOfBandUnpickler(pickle.Unpickler):
+    """Unpickles a protocol 5 pickle with its out-of-band buffers. The unpickler consumes PickleBuffers from the same
+    iterator that persistent loads use so the buffers are matched to the objects in the order they were collected."""
+    def __init__(self, file: io.BytesIO, buffers: list[bytearray]):
+        self._buffers = iter(buffers)
+        self._loaded: dict[int, bytes | bytearray] = {}
+        super().__init__(file, buffers=self._buffers)
+
+    def persistent_load(self, pid: tuple[str, int]) -> bytes | bytearray:
+        match pid:
+            case (_, int() as position) if position in self._loaded:
+                return self._loaded[position]
+
+            case ("bytearray", int() as position):
+                buffer = next(self._buffers)
+                self._loaded[position] = buffer if type(buffer) is bytearray else bytearray(buffer)
+                return self._loaded[position]
+
+            case ("bytes", int() as position):
+                self._loaded[position] = bytes(next(self._buffers))
+                return self._loaded[position]
+
+            case _:
+                raise pickle.UnpicklingError(f"Unsupported persistent ID: {pid!r}")
+
+
+class FrameCodec:
+    """Reads and writes frames signed with the secret key. Setting an out-of-band threshold causes version 1 frames to
+    be written with large buffers sent out-of-band, frames written that way can be read by any codec.
+
+    A codec can be given a serializer that is used in place of pickle for version 1 frames, both ends of a connection
+    must use the same serializer so it needs to be negotiated when the connection is opened. Payloads the serializer
+    doesn't support are pickled, the frame's serialized flag tells the reader which was used. Compression works the same
+    way, the compressed flag tells the reader that the frame was compressed using the negotiated compression codec."""
+    def __init__(
+        self,
+        secret_key: bytes,
+        *,
+        out_of_band_threshold: int | None = None,
+        serializer: Serializer | None = None,
+        compression: str | None = None,
+        compression_threshold: int = COMPRESSION_THRESHOLD,
+        offload_threshold: int = COMPRESSION_OFFLOAD_THRESHOLD,
+        stats: CompressionStats | None = None,
+        max_frame_size: int = MAX_FRAME_SIZE,
+        max_frame_buffers: int = MAX_FRAME_BUFFERS,
+    ):
+        self.secret_key = secret_key
+        self.out_of_band_threshold = out_of_band_threshold
+        self.serializer = None if isinstance(serializer, PickleSerializer) else serializer
+        self.compression = get_compression(compression) if compression else None
+        self.compression_threshold = compression_threshold
+        self.offload_threshold = offload_threshold
+        self.stats = CompressionStats() if stats is None else stats
+        self.max_frame_size = max_frame_size
+        self.max_frame_buffers = max_frame_buffers
+
+    def using(self, serializer: Serializer | None, compression: str | None = None) -> "FrameCodec":
+        """Creates a codec with the same settings and stats that uses the given serializer and compression codec."""
+        return FrameCodec(
+            self.secret_key,
+            out_of_band_threshold=self.out_of_band_threshold,
+            serializer=serializer,
+            compression=compression,
+            compression_threshold=self.compression_threshold,
+            offload_threshold=self.offload_threshold,
+            stats=self.stats,
+            max_frame_size=self.max_frame_size,
+            max_frame_buffers=self.max_frame_buffers,
+        )
+
+    async def read_frame(self, reader: StreamReader) -> Frame:
+        """Reads a frame of any supported protocol version. Version 0 frames have no kind or request ID so they are
+        read as request frames with a request ID of 0. The signature is validated before the payload pickle is
+        loaded."""
+        version_bytes = await reader.readexactly(_VERSION.size)
+        (version,) = _VERSION.unpack(version_bytes)
+        match version:
+            case 0:
+                length = int.from_bytes(await reader.readexactly(4), byteorder="big")
+                self._check_frame_size(length)
+                signature = await reader.readexactly(_V0_SIGNATURE_SIZE)
+                content = await read_exactly(reader, length)
+                if not hmac.compare_digest(signature, sign_v0(content, self.secret_key)):
+                    raise ValueError("Received an invalid signature")
+
+                return Frame(version, FrameKind.REQUEST, 0, pickle.loads(content))
+
+            case 1:
+                header = await reader.readexactly(_V1_FIELDS.size + _V1_SIGNATURE_SIZE)
+                kind, flags, request_id, length = _V1_FIELDS.unpack_from(header)
+                signature = header[_V1_FIELDS.size:]
+                self._check_frame_size(length)
+                content = await read_exactly(reader, length)
+                parts = [version_bytes + header[:_V1_FIELDS.size], content]
+                buffers = []
+                if flags & _OUT_OF_BAND:
+                    count = await reader.readexactly(_BUFFER_COUNT.size)
+                    if (buffer_count := _BUFFER_COUNT.unpack(count)[0]) > self.max_frame_buffers:
+                        raise ValueError(
+                            f"Received a frame with {buffer_count} out-of-band buffers, the limit is "
+                            f"{self.max_frame_buffers}"
+                        )
+
+                    lengths = await reader.readexactly(8 * buffer_count)
+                    buffer_lengths = [buffer_length for (buffer_length,) in struct.iter_unpack("!Q", lengths)]
+                    self._check_frame_size(length + sum(buffer_lengths))
+                    for buffer_length in buffer_lengths:
+                        buffers.append(await read_into_buffer(reader, buffer_length))
+
+                    parts.extend((count, lengths, *buffers))
+
+                if not hmac.compare_digest(signature, sign_v1(parts, self.secret_key)):
+                    raise ValueError("Received an invalid signature")
+
+                if flags & _COMPRESSED:
+                    content, buffers = await self._decompress(content, buffers)
+
+                if flags & _SERIALIZED and self.serializer is None:
+                    raise RuntimeError("Received a serialized frame on a connection that has no serializer")
+
+                try:
+                    if flags & _SERIALIZED:
+                        payload = self.serializer.loads(content)
+                    elif flags & _OUT_OF_BAND:
+                        payload = _OutOfBandUnpickler(io.BytesIO(content), buffers).load()
+                    else:
+                        payload = pickle.loads(content)
+
+                except Exception as e:
+                    raise FramePayloadError(_FRAME_KINDS[kind], request_id, e) from e
+
+                return Frame(version, _FRAME_KINDS[kind], request_id, payload, flags)
+
+            case _:
+                raise RuntimeError(
+                    f"Only SimpleTCP protocol versions {', '.join(map(str, SIMPLE_TCP_VERSIONS_SUPPORTED))} are "
+                    f"supported, detected version {version}."
+                )
+
+    def write_frame(self, frame: Frame, writer: StreamWriter):
+        """Writes the header, signature, content, and any out-of-band buffers of a frame to the stream as a single
+        gathered write. Frames are compressed on the event loop regardless of their size, use send_frame to have large
+        frames compressed in the executor. The caller is responsible for draining the writer."""
+        if frame.version == SIMPLE_TCP_VERSION_SUPPORTED:
+            content = pickle.dumps(frame.payload)
+            header = _V0_HEADER.pack(frame.version, len(content))
+            _write(writer, [header + sign_v0(content, self.secret_key), content])
+            return
+
+        flags, content, buffers = self._encode(frame)
+        if self._should_compress(content, buffers):
+            flags, content, buffers = self._record_compression(
+                flags, content, buffers, self._compress(content, buffers)
+            )
+
+        self._write_v1(frame, flags, content, buffers, writer)
+
+    async def send_frame(self, frame: Frame, writer: StreamWriter):
+        if frame.version == SIMPLE_TCP_VERSION_SUPPORTED:
+            self.write_frame(frame, writer)
+
+        else:
+            flags, content, buffers = self._encode(frame)
+            if size := self._should_compress(content, buffers):
+                if size >= self.offload_threshold:
+                    compressed = await asyncio.get_running_loop().run_in_executor(
+                        None, self._compress, content, buffers
+                    )
+                else:
+                    compressed = self._compress(content, buffers)
+
+                flags, content, buffers = self._record_compression(flags, content, buffers, compressed)
+
+            self._write_v1(frame, flags, content, buffers, writer)
+
+        await writer.drain()
+
+    def _check_frame_size(self, size: int):
+        if size > self.max_frame_size:
+            raise ValueError(f"Received a {size} byte frame, the limit is {self.max_frame_size} bytes")
+
+    def _encode(self, frame: Frame) -> tuple[int, Buffer, list[memoryview]]:
+        """Serializes the payload of a version 1 frame, returning the frame's flags, content, and out-of-band
+        buffers."""
+        if self.serializer and (content := self._serialize(frame.payload)) is not None:
+            return frame.flags | _SERIALIZED, content, []
+
+        if self.out_of_band_threshold is None:
+            return frame.flags, pickle.dumps(frame.payload, protocol=5), []
+
+        pickler = _OutOfBandPickler(file := io.BytesIO(), self.out_of_band_threshold)
+        pickler.dump(frame.payload)
+        return frame.flags | _OUT_OF_BAND if pickler.buffers else frame.flags, file.getvalue(), pickler.buffers
+
+    def _write_v1(self, frame: Frame, flags: int, content: Buffer, buffers: Sequence[Buffer], writer: StreamWriter):
+        parts = [_V1_HEADER.pack(frame.version, frame.kind, flags, frame.request_id, len(content)), content]
+        if buffers:
+            parts.append(_BUFFER_COUNT.pack(len(buffers)))
+            parts.append(b"".join(len(buffer).to_bytes(8, byteorder="big") for buffer in buffers))
+            parts.extend(buffers)
+
+        signature = sign_v1(parts, self.secret_key)
+        parts[0] += signature
+        _write(writer, parts)
+
+    def _should_compress(self, content: Buffer, buffers: Sequence[Buffer]) -> int:
+        """Returns the size of the frame's content and buffers if the frame should be compressed, otherwise 0."""
+        if self.compression is None:
+            return 0
+
+        size = len(content) + sum(map(len, buffers))
+        return size if size >= self.compression_threshold else 0
+
+    def _compress(self, content: Buffer, buffers: Sequence[Buffer]) -> list[bytes]:
+        """Compresses the content and each buffer separately. This is safe to call from an executor thread."""
+        compress = self.compression.compress
+        return [compress(content), *map(compress, buffers)]
+
+    def _record_compression(
+        self, flags: int, content: Buffer, buffers: list[Buffer], compressed: list[bytes]
+    ) -> tuple[int, Buffer, list[Buffer]]:
+        """Uses the compressed content and buffers if they're smaller than the originals, updating the stats."""
+        before = len(content) + sum(map(len, buffers))
+        after = sum(map(len, compressed))
+        if after >= before:
+            return flags, content, buffers
+
+        self.stats.frames_compressed += 1
+        self.stats.bytes_before_compression += before
+        self.stats.bytes_after_compression += after
+        return flags | _COMPRESSED, compressed[0], compressed[1:]
+
+    async def _decompress(self, content: Buffer, buffers: list[Buffer]) -> tuple[bytes, list[bytes]]:
+        if self.compression is None:
+            raise RuntimeError("Received a compressed frame on a connection that has no compression codec")
+
+        before = len(content) + sum(map(len, buffers))
+        decompress = self.compression.decompress
+        if before >= self.offload_threshold:
+            content, *buffers = await asyncio.get_running_loop().run_in_executor(
+                None, lambda: [decompress(content), *map(decompress, buffers)]
+            )
+        else:
+            content, *buffers = decompress(content), *map(decompress, buffers)
+
+        self.stats.frames_decompressed += 1
+        self.stats.bytes_before_decompression += before
+        self.stats.bytes_after_decompression += len(content) + sum(map(len, buffers))
+        return content, buffers
+
+    def _serialize(self, payload: Any) -> bytes | None:
+        try:
+            return self.serializer.dumps(payload)
+        except SerializationError:
+            return None
@@ -1,6 +1,6 @@
 """The Simple TCP Bridge provides a somewhat secure TCP client and server implementation for calling methods of a
 service. Parameters, return values, and exceptions are passed using pickles and are secured by signing each payload
-using a SHA256 hash salted with a secret key.
+using an HMAC-SHA256 keyed with a secret key (version 0 frames use a SHA256 hash salted with the secret key).
 
 The secret key can be changed by setting the SCHISM_TCP_BRIDGE_SECRET environment variable. This should provide some
 assurance that the pickles being passed are safe.
@@ -27,6 +27,100 @@ It is also possible to configure the client separately:
           serve_on: 0.0.0.0:1234
           client: example.com:4321
 
+Clients keep a pool of persistent connections to the server so that each connection carries many sequential requests
+instead of paying for a TCP handshake on every call. The pool can be tuned with the "pool" setting:
+
+    services:
+      - name: example
+        service: example:Example
+        bridge:
+          type: schism.ext.bridges.simple_tcp:SimpleTCP
+          serve_on: 0.0.0.0:1234
+          pool:
+            min_size: 1        # Connections that are kept open even when they've been idle
+            max_size: 8        # Maximum number of connections open to the server at once
+            idle_timeout: 60   # Seconds an idle connection is kept open when above the minimum size
+            max_requests_per_connection: 64  # Concurrent requests that can share a single connection
+
+Setting "protocol: 0" forces the client to use the version 0 protocol.
+
+When a service shuts down its server stops accepting connections and sends a go away frame on each version 1
+connection. Clients stop sending requests on the connection and close it once their in-flight requests have completed,
+later requests are sent on new connections. Version 0 connections are closed once they're idle.
+
+Services that are often called from the same host can also be served on a Unix domain socket, skipping the loopback TCP
+stack. When "unix_socket" is set the server listens on the socket path as well as the TCP address. Clients connecting to
+a server on the same host (localhost, a loopback address, or this machine's hostname) use the socket, falling back to
+TCP if it can't be connected to. The schism.ext.bridges.unix_socket module has a bridge that only uses a Unix socket:
+
+    services:
+      - name: example
+        service: example:Example
+        bridge:
+          type: schism.ext.bridges.simple_tcp:SimpleTCP
+          serve_on: 0.0.0.0:1234
+          client: localhost:1234
+          unix_socket: /run/example.sock
+
+Setting "reuse_port: true" lets several servers listen on the same TCP address using SO_REUSEPORT, this is enabled
+automatically when a service is run in several workers (see the schism.supervisor module). A Unix socket can't be
+shared so it can't be used with "reuse_port".
+
+"backlog" is the number of connections the operating system queues for the server before it accepts them, connections
+over the backlog are refused (100 by default). The requests a service handles at once are limited using the service's
+"limits" setting, see the schism.admission module. Requests over the limits are rejected straight away and raise an
+OverloadedError on the client.
+
+Calls carry the time left until their deadline (see the schism.deadlines module) and the server cancels a call once its
+time runs out. When a client stops waiting for a request on a version 1 connection, because its deadline passed or its
+task was cancelled, it sends a cancel frame and the server cancels the task handling the request.
+
+Payloads are pickled unless a different serializer is selected using the "serializer" setting, see the
+schism.serializers module for the available serializers. The serializer is negotiated when a version 1 connection is
+opened, payloads the serializer can't handle are pickled:
+
+    services:
+      - name: example
+        service: example:Example
+        bridge:
+          type: schism.ext.bridges.simple_tcp:SimpleTCP
+          serve_on: 0.0.0.0:1234
+          serializer: marshal-fast
+
+Large binary arguments and results (bytes, bytearrays, and array-like objects that support pickle protocol 5) can be
+sent as separate out-of-band buffers rather than being copied into the pickle. Buffers are written directly from the
+memory of the objects being sent and each is received into its own buffer. Set "out_of_band_threshold" to the size in
+bytes at which a buffer is sent out-of-band, this only applies to the version 1 protocol:
+
+    services:
+      - name: example
+        service: example:Example
+        bridge:
+          type: schism.ext.bridges.simple_tcp:SimpleTCP
+          serve_on: 0.0.0.0:1234
+          out_of_band_threshold: 65536
+
+A frame's lengths are read before its signature can be checked, so frames larger than "max_frame_size" in bytes
+(256 MiB by default, counting the content and the out-of-band buffers) or with more than "max_frame_buffers" out-of-band
+buffers (1024 by default) are refused before anything is allocated for them and the connection is closed.
+
+Large frames can be compressed using zlib, lzma, or bz2. The compression codec is requested by the client when a version
+1 connection is opened, the server responds with no compression if it doesn't support the codec. Frames smaller than the
+threshold are sent uncompressed, frames at least as large as the offload threshold are compressed and decompressed in
+the event loop's default executor. Both ends track the bytes saved, see SimpleTCPClient.compression_stats and
+SimpleTCPServer.compression_stats:
+
+    services:
+      - name: example
+        service: example:Example
+        bridge:
+          type: schism.ext.bridges.simple_tcp:SimpleTCP
+          serve_on: 0.0.0.0:1234
+          compression:
+            codec: zlib                 # One of zlib, lzma, or bz2
+            threshold: 65536            # Frames smaller than this many bytes are not compressed
+            offload_threshold: 1048576  # Frames at least this many bytes are compressed off the event loop
+
 
 The Simple TCP Bridge uses a custom protocol on top of TCP. The version 0 protocol uses the following structure:
 
@@ -37,35 +131,161 @@ Content Length |              4 | int (big endian)
 Signature      |             64 | bytes (sha256 hash)
 Content        |      Arbitrary | pickle
 ---------------|----------------|--------------------
+
+A version 0 connection carries a single request at a time, the client has to wait for the response before it can send
+another request. The version 1 protocol adds a frame kind and a request ID to every frame so that any number of
+requests can be in flight on a single connection and the server can respond to them in any order:
+
+Usage          | Size (Bytes)   | Data Type
+---------------|----------------|--------------------
+Version        |              2 | int (big endian)
+Kind           |              1 | int (see FrameKind)
+Flags          |              1 | int (see framing.FrameFlag)
+Request ID     |              4 | int (big endian)
+Content Length |              4 | int (big endian)
+Signature      |             32 | bytes (HMAC-SHA256 of the header and content)
+Content        |      Arbitrary | pickle
+---------------|----------------|--------------------
+
+When the out-of-band flag is set the content is followed by the out-of-band buffers, see the framing module. When the
+serialized flag is set the content was serialized using the serializer negotiated in the hello rather than pickle. When
+the compressed flag is set the content and buffers were compressed using the compression codec negotiated in the hello.
+
+Clients open a version 1 connection by sending a hello frame that requests a serializer and a compression codec. Servers
+that support version 1 respond with a hello frame of their own naming the serializer and compression codec they
+accepted, after which the connection is multiplexed. Servers that only support version 0 reject the unknown version
+and close the connection, the client then falls back to version 0 for every connection it opens to that server. Servers
+continue to accept version 0 frames from clients that never send a hello.
+
+The server's hello also carries the import path of the service it serves and a method table listing the names of the
+service's public methods. Method calls to that service are then sent as (method ID, args, kwargs) tuples, where the
+method ID is the method's position in the table, so the service type and method name aren't sent with every call. A
+call's timeout is sent as a fourth item when it has one.
+
+Batches of calls (see the schism.batches module) are sent as a single request frame on version 1 connections, when the
+server only supports version 0 each call in the batch is sent as its own request.
+
+Service methods that are async generators are streamed on version 1 connections. The client opens the stream with a
+stream frame carrying the method call and grants the server credit to send a number of items. The server sends the
+items in stream frames, each carrying every item that was generated while the previous frame was being sent, and never
+has more items in flight than the client has granted credit for. The client grants more credit as items are consumed,
+so a slow consumer applies backpressure to the generator on the server. A stream end frame carries the exception that
+ended the stream, if any. When the client stops iterating early it sends a cancel frame which closes the generator on
+the server. The number of items that can be in flight is set using "stream_window":
+
+    services:
+      - name: example
+        service: example:Example
+        bridge:
+          type: schism.ext.bridges.simple_tcp:SimpleTCP
+          serve_on: 0.0.0.0:1234
+          stream_window: 256
+
+Async iterables and files passed as arguments to a service are streamed to the server on version 1 connections, the
+service method receives each of them as an async iterator. The method call is sent in an upload frame with placeholders
+for the streamed arguments, the items of each streamed argument follow in upload chunk frames and an upload end frame.
+Files are read in chunks of "upload_chunk_size" bytes. The server grants the client credit for "upload_window" items of
+each streamed argument and grants more as the service consumes them, so the server never buffers more than the window
+of items no matter how large the upload is:
+
+    services:
+      - name: example
+        service: example:Example
+        bridge:
+          type: schism.ext.bridges.simple_tcp:SimpleTCP
+          serve_on: 0.0.0.0:1234
+          upload_window: 16
+          upload_chunk_size: 65536
 """
 import asyncio
+import collections
 import contextlib
-import hashlib
+import itertools
 import os
-import pickle
+import socket
 import time
+import traceback
 from asyncio import StreamReader, StreamWriter
-from functools import lru_cache
-from typing import Literal
+from functools import lru_cache, partial
+from typing import Any, AsyncIterator, Awaitable, Callable, Literal, Self, Sequence
 
-from schism.bridges import BaseBridge, BridgeClient, BridgeServer, BridgeServiceFacade, MethodCallPayload, ResultPayload
+from schism.bridges import (
+    BaseBridge,
+    BatchCallPayload,
+    BatchResultPayload,
+    BridgeClient,
+    BridgeServer,
+    BridgeServiceFacade,
+    ExceptionPayload,
+    MethodCallPayload,
+    ResultPayload,
+    ReturnPayload,
+    STREAMED_ARGUMENT_CHUNK_SIZE,
+    is_streamed_argument,
+    iterate_streamed_argument,
+    service_methods,
+)
 from schism.configs import SchismConfigModel
 from schism.controllers import get_controller
+from schism.ext.bridges.framing import (
+    COMPRESSION_CODECS,
+    COMPRESSION_OFFLOAD_THRESHOLD,
+    COMPRESSION_THRESHOLD,
+    MAX_FRAME_BUFFERS,
+    MAX_FRAME_SIZE,
+    CompressionStats,
+    Frame,
+    FrameCodec,
+    FrameKind,
+    FramePayloadError,
+    SIMPLE_TCP_VERSION_MULTIPLEXED,
+    SIMPLE_TCP_VERSION_SUPPORTED,
+)
+from schism.serializers import (
+    PickleSerializer,
+    SerializationError,
+    get_serializer,
+    is_registered,
+    type_path,
+)
 
 
-SIMPLE_TCP_VERSION_SUPPORTED = 0
+_MAX_REQUEST_ID = 2 ** 32 - 1
+_LOCAL_HOSTS = frozenset({"localhost", "127.0.0.1", "::1", "0.0.0.0", "::"})
 
 
 type PingPayload = Literal["ping"]
 
 
-def _generate_signature(data: bytes) -> bytes:
-    return hashlib.sha256(data + SimpleTCP.SECRET_KEY).hexdigest().encode()
+class SimpleTCPPoolConfig(SchismConfigModel, lax=True):
+    min_size: int = 0
+    max_size: int = 8
+    idle_timeout: float = 60.0
+    max_requests_per_connection: int = 64
+
+
+class SimpleTCPCompressionConfig(SchismConfigModel, lax=True):
+    codec: str = "zlib"
+    threshold: int = COMPRESSION_THRESHOLD
+    offload_threshold: int = COMPRESSION_OFFLOAD_THRESHOLD
 
 
 class SimpleTCPConfig(SchismConfigModel, lax=True):
     serve_on: str
     client: str
+    protocol: int = SIMPLE_TCP_VERSION_MULTIPLEXED
+    serializer: str = PickleSerializer.name
+    out_of_band_threshold: int | None = None
+    compression: SimpleTCPCompressionConfig | None = None
+    stream_window: int = 256
+    upload_window: int = 16
+    upload_chunk_size: int = STREAMED_ARGUMENT_CHUNK_SIZE
+    unix_socket: str | None = None
+    reuse_port: bool = False
+    backlog: int = 100
+    max_frame_size: int = MAX_FRAME_SIZE
+    max_frame_buffers: int = MAX_FRAME_BUFFERS
+    pool: SimpleTCPPoolConfig = SimpleTCPPoolConfig()
 
 
 async def connect(host: str, port: int) -> tuple[StreamReader, StreamWriter]:
@@ -76,48 +296,513 @@ async def connect(host: str, port: int) -> tuple[StreamReader, StreamWriter]:
 
 
 async def read_version(reader: StreamReader) -> int:
-    """Reads 2 bytes and converts them to a big endian int."""
-    version = await reader.read(2)
+    """Reads 2 bytes and converts them to a big endian int. Raises an IncompleteReadError if the connection is closed
+    before the version can be read."""
+    version = await reader.readexactly(2)
     return int.from_bytes(version, byteorder="big")
 
 
-async def read(reader: StreamReader) -> ResultPayload | MethodCallPayload | PingPayload:
-    """When reading from a TCP connection first read 2 bytes to get the version, then 4 bytes to get the content length.
-    Next read the 64 byte signature. Next read the content and validate the signature matches. If it does then it is
-    safe to load the payload pickle.
-    """
-    version = await read_version(reader)
-    if version != SIMPLE_TCP_VERSION_SUPPORTED:
-        raise RuntimeError(
-            f"Only SimpleTCP protocol version {SIMPLE_TCP_VERSION_SUPPORTED} is supported, detected "
-            f"version {version}."
-        )
+async def read_frame(reader: StreamReader) -> Frame:
+    """Reads a frame of any supported protocol version, validating its signature using the bridge's secret key."""
+    return await FrameCodec(SimpleTCP.SECRET_KEY).read_frame(reader)
+
 
-    length_bytes = await reader.read(4)
-    signature = await reader.read(64)
+async def send_frame(frame: Frame, writer: StreamWriter):
+    """Writes a frame signed using the bridge's secret key."""
+    await FrameCodec(SimpleTCP.SECRET_KEY).send_frame(frame, writer)
 
-    length = int.from_bytes(length_bytes, byteorder="big")
-    payload = await reader.read(length)
-    if signature != _generate_signature(payload):
-        raise ValueError(f"Received an invalid signature")
 
-    return pickle.loads(payload)
+async def read(reader: StreamReader) -> ResultPayload | MethodCallPayload | PingPayload:
+    """Reads a version 0 frame and returns its payload."""
+    frame = await read_frame(reader)
+    if frame.version != SIMPLE_TCP_VERSION_SUPPORTED:
+        raise RuntimeError(f"Expected a version {SIMPLE_TCP_VERSION_SUPPORTED} frame, detected version {frame.version}.")
+
+    return frame.payload
 
 
 async def send(data: ResultPayload | MethodCallPayload | PingPayload, writer: StreamWriter):
     """When writing to a TCP connection first write the 2 byte protocol version then the 4 byte content length of the
     pickled data, then the 64 byte signature, and finally write the pickle."""
-    payload = pickle.dumps(data)
-    writer.write(SIMPLE_TCP_VERSION_SUPPORTED.to_bytes(2, byteorder="big"))
-    writer.write(len(payload).to_bytes(4, byteorder="big"))
-    writer.write(_generate_signature(payload))
-    writer.write(payload)
-    await writer.drain()
+    await send_frame(Frame(SIMPLE_TCP_VERSION_SUPPORTED, FrameKind.REQUEST, 0, data), writer)
+
+
+def create_codec(config: SimpleTCPConfig) -> FrameCodec:
+    """Creates the codec a client or server starts each connection with, the serializer and compression codec are
+    negotiated separately for each connection."""
+    compression = config.compression or SimpleTCPCompressionConfig()
+    return FrameCodec(
+        SimpleTCP.SECRET_KEY,
+        out_of_band_threshold=config.out_of_band_threshold,
+        compression_threshold=compression.threshold,
+        offload_threshold=compression.offload_threshold,
+        max_frame_size=config.max_frame_size,
+        max_frame_buffers=config.max_frame_buffers,
+    )
+
+
+class Connection:
+    """A persistent version 0 connection to a bridge server that carries any number of sequential requests."""
+    capacity = 1
+
+    def __init__(self, reader: StreamReader, writer: StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.in_flight = 0
+        self.last_used = time.monotonic()
+
+    @property
+    def is_healthy(self) -> bool:
+        return not (self.writer.is_closing() or self.reader.at_eof())
+
+    async def request(self, payload: MethodCallPayload) -> ResultPayload:
+        """Sends the request and waits for the response. If anything goes wrong the connection is closed, the state of
+        the stream can no longer be trusted."""
+        try:
+            await send(payload, self.writer)
+            return await read(self.reader)
+
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        self.writer.close()
+
+
+class MultiplexedConnection(Connection):
+    """A version 1 connection that carries many concurrent requests. Each request is sent with a unique request ID and
+    waits on a future that is resolved by a background task when the response with the same request ID is read."""
+    def __init__(
+        self,
+        reader: StreamReader,
+        writer: StreamWriter,
+        capacity: int,
+        codec: FrameCodec,
+        service: str | None = None,
+        methods: Sequence[str] = (),
+    ):
+        super().__init__(reader, writer)
+        self.capacity = capacity
+        self.codec = codec
+        self.service = service
+        self.method_ids = {method: method_id for method_id, method in enumerate(methods)}
+        self._service_type: type | None = None
+        self._request_ids = itertools.count(1)
+        self._responses: dict[int, asyncio.Future] = {}
+        self._streams: dict[int, asyncio.Queue] = {}
+        self._uploads: "dict[int, list[_StreamCredit]]" = {}
+        self._going_away = False
+        self._receiver = asyncio.create_task(self._receive())
+
+    @classmethod
+    async def negotiate(
+        cls,
+        reader: StreamReader,
+        writer: StreamWriter,
+        capacity: int,
+        codec: FrameCodec,
+        serializer: str,
+        compression: str | None = None,
+    ) -> Self:
+        """Performs the hello handshake, requesting the serializer and compression codec the connection should use. The
+        server responds with the serializer it accepted, pickle if it doesn't support the one that was requested, the
+        compression codec it accepted, if any, and the method table of the service it serves. Raises an
+        IncompleteReadError or a ConnectionError if the server doesn't support the version 1 protocol."""
+        await codec.send_frame(
+            Frame(
+                SIMPLE_TCP_VERSION_MULTIPLEXED,
+                FrameKind.HELLO,
+                0,
+                {"version": 1, "serializer": serializer, "compression": compression},
+            ),
+            writer,
+        )
+        match await codec.read_frame(reader):
+            case Frame(kind=FrameKind.HELLO, payload={"version": 1, "serializer": str() as accepted, **options}):
+                return cls(
+                    reader,
+                    writer,
+                    capacity,
+                    codec.using(get_serializer(accepted), options.get("compression")),
+                    options.get("service"),
+                    options.get("methods", ()),
+                )
+
+            case Frame(kind=FrameKind.HELLO, payload={"version": 1}):
+                return cls(reader, writer, capacity, codec)
+
+            case frame:
+                raise RuntimeError(f"Unexpected response to the SimpleTCP hello: {frame!r}")
+
+    @property
+    def is_healthy(self) -> bool:
+        return not (self._going_away or self.writer.is_closing() or self._receiver.done())
+
+    async def request(self, payload: MethodCallPayload | BatchCallPayload) -> ResultPayload | BatchResultPayload:
+        """Sends a request and waits for its response, if the request is cancelled first the server is told to cancel
+        it too."""
+        request_id = self._next_request_id()
+        response = self._responses[request_id] = asyncio.get_running_loop().create_future()
+        try:
+            await self.codec.send_frame(
+                Frame(SIMPLE_TCP_VERSION_MULTIPLEXED, FrameKind.REQUEST, request_id, self._intern(payload)), self.writer
+            )
+            return await response
+
+        finally:
+            del self._responses[request_id]
+            if response.cancelled() or not response.done():  # Cancelling the request cancels the response future
+                self._cancel(request_id)
+
+    async def upload(self, payload: MethodCallPayload, chunk_size: int) -> ResultPayload:
+        """Sends a method call that has streamed arguments. Each streamed argument is replaced with a placeholder and
+        its items are sent in upload chunk frames as the server grants credit for them. If reading a streamed argument
+        fails, or if the upload is cancelled, the server is told to cancel the request."""
+        streamed = []
+
+        def replace(value):
+            if is_streamed_argument(value):
+                streamed.append(value)
+                return _UploadPlaceholder(len(streamed) - 1)
+
+            return value
+
+        payload = payload | MethodCallPayload(
+            args=tuple(map(replace, payload["args"])),
+            kwargs={name: replace(value) for name, value in payload["kwargs"].items()},
+        )
+        request_id = self._next_request_id()
+        response = self._responses[request_id] = asyncio.get_running_loop().create_future()
+        credits = self._uploads[request_id] = [_StreamCredit() for _ in streamed]
+        senders = []
+        try:
+            await self.codec.send_frame(
+                Frame(SIMPLE_TCP_VERSION_MULTIPLEXED, FrameKind.UPLOAD, request_id, self._intern(payload)), self.writer
+            )
+            for argument, (value, credit) in enumerate(zip(streamed, credits)):
+                sender = asyncio.create_task(self._upload(request_id, argument, value, credit, chunk_size))
+                sender.add_done_callback(partial(self._upload_done, request_id, response))
+                senders.append(sender)
+
+            return await response
+
+        finally:
+            del self._responses[request_id]
+            del self._uploads[request_id]
+            for sender in senders:
+                sender.cancel()
+
+            if response.cancelled() or not response.done():  # Cancelling the request cancels the response future
+                self._cancel(request_id)
+
+    async def stream(self, payload: MethodCallPayload, window: int) -> AsyncIterator[ResultPayload]:
+        """Opens a stream for an async generator method, yielding a result payload for each item. The server is granted
+        credit for the window of items up front and is granted more each time half of the window has been consumed. If
+        the stream is closed before it ends the server is told to cancel it."""
+        request_id = self._next_request_id()
+        chunks = self._streams[request_id] = asyncio.Queue()
+        ended = False
+        try:
+            await self.codec.send_frame(
+                Frame(SIMPLE_TCP_VERSION_MULTIPLEXED, FrameKind.STREAM, request_id, self._intern(payload)), self.writer
+            )
+            await self._grant(request_id, window)
+            consumed = 0
+            while True:
+                match await chunks.get():
+                    case FrameKind.STREAM, list() as items:
+                        for item in items:
+                            yield ReturnPayload(result=item)
+
+                        consumed += len(items)
+                        if consumed >= window // 2:
+                            await self._grant(request_id, consumed)
+                            consumed = 0
+
+                    case FrameKind.STREAM_END, error:
+                        ended = True
+                        if error is not None:
+                            yield error
+
+                        return
+
+                    case None, ConnectionError() as error:
+                        ended = True
+                        raise error
+
+                    case None, FramePayloadError() as error:
+                        raise error
+
+        finally:
+            del self._streams[request_id]
+            if not ended:
+                self._cancel(request_id)
+
+    def close(self):
+        self._receiver.cancel()
+        super().close()
+
+    def _intern(self, payload: MethodCallPayload | BatchCallPayload) -> Any:
+        """Replaces method calls to the service the server serves with the method's ID from the server's method table,
+        sending the call as a (method ID, args, kwargs) tuple instead of sending the service type and method name. Calls
+        that have a timeout send it as a fourth item."""
+        match payload:
+            case {"service": service, "method": method, "args": args, "kwargs": kwargs} if (
+                method in self.method_ids and self._serves(service)
+            ):
+                if "timeout" in payload:
+                    return self.method_ids[method], args, kwargs, payload["timeout"]
+
+                return self.method_ids[method], args, kwargs
+
+            case {"calls": list() as calls}:
+                return payload | {"calls": list(map(self._intern, calls))}
+
+            case _:
+                return payload
+
+    def _serves(self, service_type: Any) -> bool:
+        if self._service_type is None and isinstance(service_type, type) and type_path(service_type) == self.service:
+            self._service_type = service_type
+
+        return service_type is not None and service_type is self._service_type
+
+    def _next_request_id(self) -> int:
+        while (
+            (request_id := next(self._request_ids) & _MAX_REQUEST_ID) in self._responses
+            or request_id in self._streams
+            or not request_id
+        ):
+            continue
+
+        return request_id
+
+    async def _upload(self, request_id: int, argument: int, value: Any, credit: "_StreamCredit", chunk_size: int):
+        async def send_chunk(items: list):
+            await self.codec.send_frame(
+                Frame(
+                    SIMPLE_TCP_VERSION_MULTIPLEXED,
+                    FrameKind.UPLOAD_CHUNK,
+                    request_id,
+                    {"argument": argument, "items": items},
+                ),
+                self.writer,
+            )
+
+        await _pump(iterate_streamed_argument(value, chunk_size), credit, send_chunk)
+        await self.codec.send_frame(
+            Frame(SIMPLE_TCP_VERSION_MULTIPLEXED, FrameKind.UPLOAD_END, request_id, {"argument": argument}),
+            self.writer,
+        )
+
+    def _upload_done(self, request_id: int, response: asyncio.Future, sender: asyncio.Task):
+        if sender.cancelled() or sender.exception() is None:
+            return
+
+        if not response.done():
+            response.set_exception(sender.exception())
+
+        self._cancel(request_id)
+
+    def _cancel(self, request_id: int):
+        if not self.writer.is_closing():
+            self.codec.write_frame(
+                Frame(SIMPLE_TCP_VERSION_MULTIPLEXED, FrameKind.CANCEL, request_id, None), self.writer
+            )
+
+    async def _grant(self, request_id: int, credit: int):
+        await self.codec.send_frame(
+            Frame(SIMPLE_TCP_VERSION_MULTIPLEXED, FrameKind.CREDIT, request_id, credit), self.writer
+        )
+
+    async def _receive(self):
+        """Resolves the waiting futures as responses arrive and passes streamed items to the streams they belong to.
+        When the connection is lost every request still waiting on a response fails, as does every open stream. A frame
+        whose payload can't be loaded only fails the request or stream it belongs to."""
+        error = ConnectionError("The connection to the server was closed")
+        try:
+            while True:
+                try:
+                    frame = await self.codec.read_frame(self.reader)
+                except FramePayloadError as e:
+                    self._fail_request(e)  # Only the request the frame belongs to fails, the connection stays usable
+                    continue
+
+                if frame.kind is FrameKind.RESPONSE:
+                    response = self._responses.get(frame.request_id)
+                    if response and not response.done():
+                        response.set_result(frame.payload)
+
+                elif frame.kind is FrameKind.CREDIT:
+                    if credits := self._uploads.get(frame.request_id):
+                        credits[frame.payload["argument"]].grant(frame.payload["credit"])
+
+                elif frame.kind is FrameKind.GOAWAY:
+                    # The pool stops using the connection and closes it once the requests using it have completed
+                    self._going_away = True
+                    if not self.in_flight:
+                        self.writer.close()
+
+                elif stream := self._streams.get(frame.request_id):
+                    stream.put_nowait((frame.kind, frame.payload))
+
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+        except Exception as e:
+            error = ConnectionError(f"The connection to the server failed: {e}")
+
+        finally:
+            self.writer.close()
+            for response in self._responses.values():
+                if not response.done():
+                    response.set_exception(error)
+
+            for stream in self._streams.values():
+                stream.put_nowait((None, error))
+
+
+    def _fail_request(self, error: FramePayloadError):
+        if (response := self._responses.get(error.request_id)) and not response.done():
+            response.set_exception(error)
+
+        elif stream := self._streams.get(error.request_id):
+            stream.put_nowait((None, error))
+
+
+class ConnectionPool:
+    """Keeps persistent connections open to a single bridge server endpoint. Requests are sent on the least busy
+    connection that has capacity for another request, new connections are only opened when every connection is at
+    capacity. Connections are checked for health before they are handed out, connections above the minimum pool size
+    are closed once they've been idle for longer than the idle timeout."""
+    def __init__(
+        self,
+        connect: Callable[[], Awaitable[Connection]],
+        *,
+        min_size: int = 0,
+        max_size: int = 8,
+        idle_timeout: float = 60.0,
+    ):
+        if max_size < 1:
+            raise ValueError(f"Connection pools must allow at least one connection, got a max size of {max_size}")
+
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+
+        self._connect = connect
+        self._connections: list[Connection] = []
+        self._capacity: int | None = None
+        self._opening = 0
+        self._waiting = 0
+        self._changed = asyncio.Condition()
+
+    @property
+    def size(self) -> int:
+        return len(self._connections)
+
+    @contextlib.asynccontextmanager
+    async def connection(self) -> AsyncIterator[Connection]:
+        """Checks out a connection for the duration of the context."""
+        connection = await self._checkout()
+        try:
+            yield connection
+
+        finally:
+            await self._checkin(connection)
+
+    async def close(self):
+        async with self._changed:
+            for connection in self._connections:
+                connection.close()
+
+            self._connections.clear()
+            self._changed.notify_all()
+
+    async def _checkout(self) -> Connection:
+        async with self._changed:
+            while True:
+                self._prune()
+                if available := [c for c in self._connections if c.in_flight < c.capacity and c.is_healthy]:
+                    connection = min(available, key=lambda c: c.in_flight)
+                    connection.in_flight += 1
+                    return connection
+
+                if self._opening and (self._capacity is None or self._waiting < self._opening * self._capacity):
+                    # A connection that is already being opened will have room for this request
+                    self._waiting += 1
+                    try:
+                        await self._changed.wait()
+                    finally:
+                        self._waiting -= 1
+
+                elif self.size + self._opening < self.max_size:
+                    self._opening += 1
+                    break
+
+                else:
+                    await self._changed.wait()
+
+        connection = None
+        try:
+            connection = await self._connect()
+            connection.in_flight += 1
+            return connection
+
+        finally:
+            async with self._changed:
+                self._opening -= 1
+                if connection:
+                    self._capacity = connection.capacity
+                    self._connections.append(connection)
+
+                self._changed.notify_all()
+
+    async def _checkin(self, connection: Connection):
+        async with self._changed:
+            connection.in_flight -= 1
+            connection.last_used = time.monotonic()
+            if not connection.is_healthy and not connection.in_flight and connection in self._connections:
+                connection.close()
+                self._connections.remove(connection)
+
+            self._changed.notify_all()
+
+    def _prune(self):
+        """Drops connections that have been closed and closes connections that have been idle for too long while the
+        pool is above its minimum size."""
+        now = time.monotonic()
+        for connection in list(self._connections):
+            if not connection.is_healthy:
+                if not connection.in_flight:
+                    connection.close()
+                    self._connections.remove(connection)
+
+            elif (
+                not connection.in_flight
+                and self.size > self.min_size
+                and now - connection.last_used > self.idle_timeout
+            ):
+                connection.close()
+                self._connections.remove(connection)
 
 
 class SimpleTCPClient(BridgeClient):
     config: SimpleTCPConfig
 
+    def __init__(self, config: SimpleTCPConfig):
+        super().__init__(config)
+        self.protocol_version: int | None = (
+            None if config.protocol >= SIMPLE_TCP_VERSION_MULTIPLEXED else SIMPLE_TCP_VERSION_SUPPORTED
+        )
+        self.pool = ConnectionPool(
+            self._open_connection,
+            min_size=config.pool.min_size,
+            max_size=config.pool.max_size,
+            idle_timeout=config.pool.idle_timeout,
+        )
+
     @property
     @lru_cache
     def host(self) -> str:
@@ -137,22 +822,90 @@ class SimpleTCPClient(BridgeClient):
             ).split(":")[1]
         )
 
+    @property
+    @lru_cache
+    def prefers_unix_socket(self) -> bool:
+        """Clients connect using the Unix socket when one is configured and the server is on the same host."""
+        if not self.config.unix_socket:
+            return False
+
+        return not self.config.client or self.host in _LOCAL_HOSTS or self.host == socket.gethostname()
+
+    @property
+    def address(self) -> str:
+        return f"unix:{self.config.unix_socket}" if self.prefers_unix_socket else f"{self.host}:{self.port}"
+
+    @property
+    @lru_cache
+    def codec(self) -> FrameCodec:
+        return create_codec(self.config)
+
+    @property
+    def compression_stats(self) -> CompressionStats:
+        """The frames and bytes compressed and decompressed across every connection."""
+        return self.codec.stats
+
     async def call_async_method(self, payload: MethodCallPayload):
         try:
-            reader, writer = await connect(self.host, self.port)
+            async with self.pool.connection() as connection:
+                return await connection.request(payload)
+
         except RuntimeError as e:
-            raise RuntimeError(f"Unable to call async method {payload['method']} of service on {self.host}:{
-            self.port}") from e
+            raise RuntimeError(f"Unable to call async method {payload['method']} of service on {self.address}") from e
 
-        with contextlib.closing(writer):
-            await send(payload, writer)
-            return await read(reader)
+    async def call_batch(self, payload: BatchCallPayload) -> BatchResultPayload:
+        """Sends the whole batch as a single request on a version 1 connection. Version 0 servers don't understand
+        batches so each call is sent on its own."""
+        try:
+            async with self.pool.connection() as connection:
+                if isinstance(connection, MultiplexedConnection):
+                    return await connection.request(payload)
+
+        except RuntimeError as e:
+            raise RuntimeError(f"Unable to call a batch of methods of service on {self.address}") from e
+
+        return await super().call_batch(payload)
+
+    async def stream_async_method(self, payload: MethodCallPayload) -> AsyncIterator[ResultPayload]:
+        """Streams the items of an async generator method on a version 1 connection. Version 0 servers respond with a
+        list of every item."""
+        try:
+            async with self.pool.connection() as connection:
+                if isinstance(connection, MultiplexedConnection):
+                    async with contextlib.aclosing(connection.stream(payload, self.config.stream_window)) as stream:
+                        async for result in stream:
+                            yield result
+
+                    return
+
+        except RuntimeError as e:
+            raise RuntimeError(f"Unable to stream async method {payload['method']} of service on {self.address}") from e
+
+        async for result in super().stream_async_method(payload):
+            yield result
+
+    async def upload_async_method(self, payload: MethodCallPayload) -> ResultPayload:
+        """Streams the streamed arguments of the method call on a version 1 connection. Version 0 servers are sent the
+        complete arguments."""
+        try:
+            async with self.pool.connection() as connection:
+                if isinstance(connection, MultiplexedConnection):
+                    return await connection.upload(payload, self.config.upload_chunk_size)
+
+        except RuntimeError as e:
+            raise RuntimeError(f"Unable to call async method {payload['method']} of service on {self.address}") from e
+
+        return await super().upload_async_method(payload)
+
+    async def close(self):
+        """Closes all pooled connections to the server."""
+        await self.pool.close()
 
     async def wait_for_server(self, *, timeout: float = 5.0):
         start = time.monotonic()
         while True:
             try:
-                reader, writer = await connect(self.host, self.port)
+                reader, writer = await self._connect()
                 try:
                     await send("ping", writer)
                     response = await read(reader)
@@ -161,16 +914,65 @@ class SimpleTCPClient(BridgeClient):
 
             except RuntimeError:
                 if time.monotonic() - start > timeout:
-                    raise TimeoutError(f"Timed out waiting for server to be ready at {self.host}:{self.port}")
+                    raise TimeoutError(f"Timed out waiting for server to be ready at {self.address}")
+
+                await asyncio.sleep(0.01)  # Connecting to a missing Unix socket fails without yielding to the loop
 
             else:
                 if response == "ping":
                     return
 
+    async def _connect(self) -> tuple[StreamReader, StreamWriter]:
+        """Connects using the Unix socket when the client prefers it, falling back to TCP if the Unix socket can't be
+        connected to and the server has a TCP address."""
+        if self.prefers_unix_socket:
+            try:
+                return await asyncio.open_unix_connection(self.config.unix_socket)
+            except OSError as e:
+                if not self.config.client:
+                    raise RuntimeError(f"Unable to connect to service on {self.address}") from e
+
+        return await connect(self.host, self.port)
+
+    async def _open_connection(self) -> Connection:
+        """Opens a connection using the newest protocol version the server supports. The first connection that is
+        opened determines the version, if the server rejects the hello every later connection uses version 0."""
+        reader, writer = await self._connect()
+        if self.protocol_version == SIMPLE_TCP_VERSION_SUPPORTED:
+            return Connection(reader, writer)
+
+        try:
+            connection = await MultiplexedConnection.negotiate(
+                reader,
+                writer,
+                self.config.pool.max_requests_per_connection,
+                self.codec,
+                self.config.serializer,
+                self.config.compression and self.config.compression.codec,
+            )
+
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            if self.protocol_version is not None:
+                raise
+
+            self.protocol_version = SIMPLE_TCP_VERSION_SUPPORTED
+            return Connection(*await self._connect())
+
+        self.protocol_version = SIMPLE_TCP_VERSION_MULTIPLEXED
+        return connection
+
 
 class SimpleTCPServer(BridgeServer):
     config: SimpleTCPConfig
 
+    def __init__(self, config: SimpleTCPConfig, service_facade: BridgeServiceFacade):
+        super().__init__(config, service_facade)
+        self._listeners: tuple[asyncio.Server, ...] = ()
+        self._connections: "dict[asyncio.Task, _ServerConnection]" = {}
+        self._draining = False
+        self._drained = asyncio.Event()
+
     @property
     @lru_cache
     def host(self) -> str:
@@ -181,25 +983,472 @@ class SimpleTCPServer(BridgeServer):
     def port(self) -> int:
         return int(self.config.serve_on.split(":")[1])
 
+    @property
+    @lru_cache
+    def codec(self) -> FrameCodec:
+        return create_codec(self.config)
+
+    @property
+    def compression_stats(self) -> CompressionStats:
+        """The frames and bytes compressed and decompressed across every connection."""
+        return self.codec.stats
+
+    @property
+    @lru_cache
+    def methods(self) -> tuple[str, ...]:
+        """The method table sent to clients in the hello, clients send the position of a method in place of the service
+        type and method name."""
+        service_type = self.service_facade.service_type
+        return service_methods(service_type) if service_type else ()
+
     async def launch(self):
-        server = await asyncio.start_server(self._handle_request, self.host, self.port)
+        """Serves on the TCP address and on the Unix socket, when each is configured."""
+        if self.config.reuse_port and self.config.unix_socket:
+            raise ValueError("A Unix socket cannot be shared by several servers, reuse_port only works with TCP")
+
+        servers = []
+        if self.config.serve_on:
+            servers.append(
+                await asyncio.start_server(
+                    self._handle_connection,
+                    self.host,
+                    self.port,
+                    backlog=self.config.backlog,
+                    reuse_port=self.config.reuse_port or None,
+                )
+            )
+
+        if self.config.unix_socket:
+            servers.append(
+                await asyncio.start_unix_server(
+                    self._handle_connection, self.config.unix_socket, backlog=self.config.backlog
+                )
+            )
+
+        try:
+            await self._serve(*servers)
+
+        finally:
+            if self.config.unix_socket:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(self.config.unix_socket)
+
+    async def drain(self, timeout: float):
+        """Stops accepting connections and tells clients to stop sending requests. Version 1 clients close their
+        connections once their in-flight requests have completed, idle version 0 connections are closed. Connections
+        that are still open when the timeout elapses are closed, cancelling their requests."""
+        self._draining = True
+        for listener in self._listeners:
+            listener.close()
+
+        for connection in self._connections.values():
+            connection.go_away()
+
+        try:
+            if self._connections:
+                await asyncio.wait(list(self._connections), timeout=timeout)
+
+            for handler in self._connections:
+                handler.cancel()
+
+            if self._connections:
+                await asyncio.wait(list(self._connections))
+
+        finally:
+            self._drained.set()
+
+    async def _serve(self, *listeners: asyncio.Server):
+        """Serves connections on the listeners until the server has been drained."""
+        self._listeners = listeners
+        async with contextlib.AsyncExitStack() as stack:
+            for listener in listeners:
+                await stack.enter_async_context(listener)
+
+            await self._drained.wait()
+
+    async def _handle_connection(self, reader: StreamReader, writer: StreamWriter):
+        """Serves requests from a client connection until the client closes the connection. Version 0 requests are
+        handled one after another, version 1 requests are handled concurrently and responded to as they complete."""
+        codec = self.codec
+        requests: dict[int, asyncio.Task] = {}
+        credits: dict[int, _StreamCredit] = {}
+        uploads: "dict[int, list[_UploadStream]]" = {}
+        connection = self._connections[asyncio.current_task()] = _ServerConnection(writer)
+
+        def track(request_id: int, request: asyncio.Task):
+            """Tracks the request so it can be cancelled, until it completes."""
+            def untrack(_):
+                if requests.get(request_id) is request:
+                    del requests[request_id]
+                    credits.pop(request_id, None)
+                    uploads.pop(request_id, None)
 
-        async with server:
-            await server.serve_forever()
+            requests[request_id] = request
+            request.add_done_callback(untrack)
 
-    async def _handle_request(self, reader, writer):
         with contextlib.closing(writer):
-            match await read(reader):
-                case "ping":
-                    await send("ping", writer)
+            try:
+                while True:
+                    try:
+                        frame = await codec.read_frame(reader)
+                    except (asyncio.IncompleteReadError, ConnectionError):
+                        return
+
+                    match frame:
+                        case Frame(version=0, payload=payload):
+                            connection.busy = True
+                            await send(await self._handle_request(payload), writer)
+                            connection.busy = False
+                            if self._draining:
+                                return
+
+                        case Frame(kind=FrameKind.HELLO, payload=dict() as hello):
+                            serializer = self._negotiate_serializer(hello.get("serializer", PickleSerializer.name))
+                            compression = self._negotiate_compression(hello.get("compression"))
+                            await codec.send_frame(
+                                Frame(
+                                    SIMPLE_TCP_VERSION_MULTIPLEXED,
+                                    FrameKind.HELLO,
+                                    0,
+                                    {
+                                        "version": 1,
+                                        "serializer": serializer,
+                                        "compression": compression,
+                                    } | self._method_table(),
+                                ),
+                                writer,
+                            )
+                            codec = connection.codec = self.codec.using(get_serializer(serializer), compression)
+                            if self._draining:
+                                connection.go_away()
+
+                        case Frame(kind=FrameKind.REQUEST, request_id=request_id):
+                            request = asyncio.create_task(
+                                self._handle_multiplexed_request(self._resolve(frame), writer, codec)
+                            )
+                            track(request_id, request)
+
+                        case Frame(kind=FrameKind.STREAM, request_id=request_id):
+                            credit = credits[request_id] = _StreamCredit()
+                            request = asyncio.create_task(
+                                self._handle_stream(self._resolve(frame), writer, codec, credit)
+                            )
+                            track(request_id, request)
+
+                        case Frame(kind=FrameKind.UPLOAD, request_id=request_id):
+                            payload, uploads[request_id] = self._open_uploads(self._resolve(frame), writer, codec)
+                            for upload in uploads[request_id]:
+                                await upload.open()
+
+                            request = asyncio.create_task(
+                                self._handle_multiplexed_request(frame._replace(payload=payload), writer, codec)
+                            )
+                            track(request_id, request)
+
+                        case Frame(
+                            kind=FrameKind.UPLOAD_CHUNK,
+                            request_id=request_id,
+                            payload={"argument": int() as argument, "items": list() as items},
+                        ):
+                            if request_id in uploads:
+                                uploads[request_id][argument].feed(items)
+
+                        case Frame(
+                            kind=FrameKind.UPLOAD_END, request_id=request_id, payload={"argument": int() as argument}
+                        ):
+                            if request_id in uploads:
+                                uploads[request_id][argument].end()
+
+                        case Frame(kind=FrameKind.CREDIT, request_id=request_id, payload=int() as amount):
+                            if credit := credits.get(request_id):
+                                credit.grant(amount)
+
+                        case Frame(kind=FrameKind.CANCEL, request_id=request_id):
+                            if request := requests.get(request_id):
+                                request.cancel()
+
+                        case _:
+                            raise RuntimeError(f"Invalid frame: {frame!r}")
+
+            finally:
+                del self._connections[asyncio.current_task()]
+                for request in list(requests.values()):
+                    request.cancel()
+
+    async def _handle_multiplexed_request(self, frame: Frame, writer: StreamWriter, codec: FrameCodec):
+        """Handles the request and sends its response. When the response can't be encoded, an unpicklable return value
+        for example, an exception payload is sent in its place so the client isn't left waiting."""
+        response = await self._handle_request(frame.payload)
+        try:
+            await codec.send_frame(
+                Frame(SIMPLE_TCP_VERSION_MULTIPLEXED, FrameKind.RESPONSE, frame.request_id, response), writer
+            )
+
+        except ConnectionError:
+            raise
+
+        except Exception as e:
+            await codec.send_frame(
+                Frame(
+                    SIMPLE_TCP_VERSION_MULTIPLEXED,
+                    FrameKind.RESPONSE,
+                    frame.request_id,
+                    _unsendable_response(response, e),
+                ),
+                writer,
+            )
+
+    async def _handle_stream(self, frame: Frame, writer: StreamWriter, codec: FrameCodec, credit: "_StreamCredit"):
+        """Sends the items generated by an async generator method as they're produced, followed by the exception payload
+        that ended the stream, if any."""
+        error = None
+
+        async def items():
+            nonlocal error
+            async with contextlib.aclosing(self.stream_async_method(frame.payload)) as results:
+                async for result in results:
+                    match result:
+                        case {"result": item}:
+                            yield item
+
+                        case _:
+                            error = result
+                            return
+
+        async def send_chunk(chunk: list):
+            await codec.send_frame(
+                Frame(SIMPLE_TCP_VERSION_MULTIPLEXED, FrameKind.STREAM, frame.request_id, chunk), writer
+            )
+
+        await _pump(items(), credit, send_chunk)
+        await codec.send_frame(
+            Frame(SIMPLE_TCP_VERSION_MULTIPLEXED, FrameKind.STREAM_END, frame.request_id, error), writer
+        )
+
+    def _open_uploads(
+        self, frame: Frame, writer: StreamWriter, codec: FrameCodec
+    ) -> tuple[MethodCallPayload, "list[_UploadStream]"]:
+        """Replaces the placeholders for the streamed arguments of the method call with upload streams that are fed by
+        the upload chunk frames the client sends."""
+        uploads = []
+
+        def replace(value):
+            if type(value) is _UploadPlaceholder:
+                async def grant(amount: int, argument: int = value.argument):
+                    await codec.send_frame(
+                        Frame(
+                            SIMPLE_TCP_VERSION_MULTIPLEXED,
+                            FrameKind.CREDIT,
+                            frame.request_id,
+                            {"argument": argument, "credit": amount},
+                        ),
+                        writer,
+                    )
+
+                uploads.append(_UploadStream(grant, self.config.upload_window))
+                return uploads[-1]
+
+            return value
+
+        payload = frame.payload | MethodCallPayload(
+            args=tuple(map(replace, frame.payload["args"])),
+            kwargs={name: replace(value) for name, value in frame.payload["kwargs"].items()},
+        )
+        return payload, uploads
+
+    def _method_table(self) -> dict[str, Any]:
+        if not self.methods:
+            return {}
+
+        return {"service": type_path(self.service_facade.service_type), "methods": self.methods}
+
+    def _resolve(self, frame: Frame) -> Frame:
+        """Replaces (method ID, args, kwargs, timeout) method calls with the method call payload they stand in for, the
+        timeout is optional."""
+        return frame._replace(payload=self._resolve_call(frame.payload))
+
+    def _resolve_call(self, payload: Any) -> Any:
+        match payload:
+            case [int() as method_id, args, dict() as kwargs, *timeout] if (
+                0 <= method_id < len(self.methods) and len(timeout) <= 1
+            ):
+                call_payload = MethodCallPayload(
+                    service=self.service_facade.service_type,
+                    method=self.methods[method_id],
+                    args=tuple(args),
+                    kwargs=kwargs,
+                )
+                if timeout:
+                    call_payload["timeout"] = timeout[0]
+
+                return call_payload
+
+            case {"calls": list() as calls}:
+                return payload | {"calls": list(map(self._resolve_call, calls))}
+
+            case _:
+                return payload
+
+    def _negotiate_serializer(self, requested: str) -> str:
+        """Accepts any registered serializer and the serializer configured for this service, custom serializers
+        requested by a client are otherwise refused so that clients cannot cause arbitrary imports."""
+        if requested == self.config.serializer or is_registered(requested):
+            return requested
+
+        return PickleSerializer.name
+
+    def _negotiate_compression(self, requested: str | None) -> str | None:
+        """Accepts any compression codec that is available in this Python build."""
+        return requested if requested in COMPRESSION_CODECS else None
+
+    async def _handle_request(
+        self, payload: MethodCallPayload | BatchCallPayload | PingPayload
+    ) -> ResultPayload | BatchResultPayload | PingPayload:
+        match payload:
+            case "ping":
+                return "ping"
+
+            case dict() as call_payload if MethodCallPayload.__required_keys__.issubset(call_payload.keys()):
+                return await self.call_async_method(call_payload)
+
+            case {"calls": list()} as batch_payload:
+                return await self.call_batch(batch_payload)
+
+            case payload:
+                raise RuntimeError(f"Invalid payload: {payload}")
+
+
+def _unsendable_response(
+    response: ResultPayload | BatchResultPayload, error: Exception
+) -> ExceptionPayload | BatchResultPayload:
+    """Creates the exception payload sent in place of a response that couldn't be encoded, batches get the exception
+    payload for each of their calls."""
+    error = SerializationError(f"Unable to send the response to the client: {error}")
+    payload = ExceptionPayload(error=error, traceback=traceback.format_exception_only(error))
+    match response:
+        case {"results": list() as results}:
+            return BatchResultPayload(results=[payload] * len(results))
+
+        case _:
+            return payload
+
+
+class _ServerConnection:
+    """A connection a server is handling, tracked so that its client can be told to go away when the server drains."""
+    def __init__(self, writer: StreamWriter):
+        self.writer = writer
+        self.codec: FrameCodec | None = None  # The codec negotiated by a version 1 hello
+        self.busy = False  # Handling a version 0 request
+
+    def go_away(self):
+        if self.codec:
+            self.codec.write_frame(Frame(SIMPLE_TCP_VERSION_MULTIPLEXED, FrameKind.GOAWAY, 0, None), self.writer)
+
+        elif not self.busy:
+            self.writer.close()
+
+
+class _UploadPlaceholder:
+    """Sent in place of a streamed argument, the server replaces it with an upload stream."""
+    def __init__(self, argument: int):
+        self.argument = argument
+
+
+class _UploadStream:
+    """An async iterator of the items of a streamed argument as they're received by the server. The client is granted
+    credit for the window of items up front and more each time half the window has been consumed, so no more than the
+    window of items are ever buffered."""
+    def __init__(self, grant: Callable[[int], Awaitable[None]], window: int):
+        self._grant = grant
+        self._window = window
+        self._items = collections.deque()
+        self._ended = False
+        self._received = asyncio.Event()
+        self._consumed = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self._items:
+            if self._ended:
+                raise StopAsyncIteration
+
+            self._received.clear()
+            await self._received.wait()
+
+        self._consumed += 1
+        if self._consumed >= self._window // 2:
+            await self._grant(self._consumed)
+            self._consumed = 0
+
+        return self._items.popleft()
+
+    async def open(self):
+        await self._grant(self._window)
+
+    def feed(self, items: list):
+        self._items.extend(items)
+        self._received.set()
+
+    def end(self):
+        self._ended = True
+        self._received.set()
+
+
+class _StreamCredit:
+    """The number of items a server is allowed to send on a stream before the client grants it more."""
+    def __init__(self):
+        self.available = 0
+        self._granted = asyncio.Event()
+
+    def grant(self, amount: int):
+        self.available += amount
+        self._granted.set()
+
+    async def acquire(self):
+        while self.available <= 0:
+            self._granted.clear()
+            await self._granted.wait()
+
+        self.available -= 1
+
+
+async def _pump(items: AsyncIterator, credit: _StreamCredit, send_chunk: Callable[[list], Awaitable[None]]):
+    """Sends the items from the iterator in chunks, never taking more items than the peer has granted credit for. Items
+    are taken in a separate task so that the items taken while a chunk is being sent are sent together in the next
+    chunk. Exceptions raised by the iterator are raised once the items taken before it have been sent."""
+    buffered = []
+    taken = asyncio.Event()
+
+    async def take():
+        async with contextlib.aclosing(items):
+            while True:
+                await credit.acquire()
+                try:
+                    buffered.append(await anext(items))
+                except StopAsyncIteration:
                     return
 
-                case dict() as call_payload if MethodCallPayload.__required_keys__.issubset(call_payload.keys()):
-                    result = await self.call_async_method(call_payload)
-                    await send(result, writer)
+                taken.set()
+
+    taker = asyncio.create_task(take())
+    taker.add_done_callback(lambda _: taken.set())
+    try:
+        while True:
+            if buffered:
+                chunk, buffered[:] = buffered[:], []
+                await send_chunk(chunk)
+
+            elif taker.done():
+                return taker.result()
+
+            else:
+                taken.clear()
+                await taken.wait()
 
-                case payload:
-                    raise RuntimeError(f"Invalid payload: {payload}")
+    finally:
+        taker.cancel()
 
 
 class SimpleTCP(BaseBridge):
@@ -221,11 +1470,8 @@ class SimpleTCP(BaseBridge):
             case str() as serve_on:
                 return SimpleTCPConfig(serve_on=serve_on, client=serve_on)
 
-            case {"serve_on": str() as serve_on, "client": str() as client}:
-                return SimpleTCPConfig(serve_on=serve_on, client=client)
-
-            case {"serve_on": str() as serve_on}:
-                return SimpleTCPConfig(serve_on=serve_on, client=serve_on)
+            case {"serve_on": str() as serve_on, **settings}:
+                return SimpleTCPConfig(**{"client": serve_on} | settings | {"serve_on": serve_on})
 
             case _:
                 raise ValueError(f"Invalid bridge configuration for {cls.__name__}: {bridge_config}")
@@ -0,0 +1,47 @@
+"""The Unix Socket Bridge serves a service on a Unix domain socket, for services that only need to be called from the
+same host. It uses the Simple TCP Bridge's protocol, so frames are signed in the same way, clients keep a pool of
+persistent multiplexed connections, and every Simple TCP setting other than "serve_on" and "client" is supported, see
+the schism.ext.bridges.simple_tcp module.
+
+Here's an example yaml config:
+
+    services:
+      - name: example
+        service: example:Example
+        bridge:
+          type: schism.ext.bridges.unix_socket:UnixSocket
+          path: /run/example.sock
+
+Other Simple TCP settings are set alongside the path:
+
+    services:
+      - name: example
+        service: example:Example
+        bridge:
+          type: schism.ext.bridges.unix_socket:UnixSocket
+          path: /run/example.sock
+          serializer: marshal-fast
+          pool:
+            max_size: 4
+"""
+from schism.ext.bridges.simple_tcp import SimpleTCP, SimpleTCPConfig
+
+
+class UnixSocketConfig(SimpleTCPConfig, lax=True):
+    serve_on: str = ""
+    client: str = ""
+    unix_socket: str
+
+
+class UnixSocket(SimpleTCP):
+    @classmethod
+    def config_factory(cls, bridge_config: str | dict[str, str | int]) -> UnixSocketConfig:
+        match bridge_config:
+            case str() as path:
+                return UnixSocketConfig(unix_socket=path)
+
+            case {"path": str() as path, **settings}:
+                return UnixSocketConfig(**settings | {"unix_socket": path, "serve_on": "", "client": ""})
+
+            case _:
+                raise ValueError(f"Invalid bridge configuration for {cls.__name__}: {bridge_config}")
@@ -1,6 +1,5 @@
 from abc import ABC, abstractmethod
 from enum import Enum
-from functools import cache
 from typing import Awaitable, Callable
 
 from schism.bridges import MethodCallPayload, ResultPayload
@@ -54,14 +53,17 @@ class MiddlewareStack:
         payload: MethodCallPayload,
         action: NextCallable,
     ) -> Awaitable[ResultPayload]:
-        return self._get_stack(context, action)(payload)
-
-    @cache
-    def _get_stack(self, context: MiddlewareContext, action: NextCallable) -> NextCallable:
-        stack = action
-        for middleware in self.middleware[::-1]:
-            stack = middleware(context, stack).run
-
-        return stack
+        """Runs a single payload through the middleware. This builds the middleware on every call, anything that runs
+        many payloads through the same action should compile a pipeline once and reuse it."""
+        return self.compile(context, action)(payload)
+
+    def compile(self, context: MiddlewareContext, action: NextCallable) -> NextCallable:
+        """Builds the middleware for the context around the action, returning a callable that runs a payload through
+        every middleware and then the action. When there is no middleware the action is returned unchanged."""
+        pipeline = action
+        for middleware in reversed(self.middleware):
+            pipeline = middleware(context, pipeline).run
+
+        return pipeline
 
 
@@ -5,12 +5,23 @@ from typing import Any
 
 from bevy import inject, dependency
 
+from schism.bench import start_bench
 from schism.configs import ApplicationConfig
+from schism.runtime import override_runtime_config, parse_runtime_options
 from schism.controllers import SchismController, DistributedController
+from schism.supervisor import WorkerSupervisor
 
 
-def start_services(service: str):
-    controller = setup_controller(service)
+def start_services(service: str, workers: int | None = None):
+    """Runs the service, when it has more than one worker this process supervises the worker processes instead."""
+    controller = DistributedController.activate(service)
+    workers = workers or controller.worker_count
+    if workers > 1 and controller.worker_id is None:
+        # Workers are given time to run their shutdown hooks once they've drained
+        WorkerSupervisor(service, workers, shutdown_timeout=controller.drain_timeout + 5).run()
+        return
+
+    controller.bootstrap()
     setup_entry_points(controller)
     controller.launch()
 
@@ -51,16 +62,26 @@ def start_application_using_config(config: ApplicationConfig = dependency()):
     start_application(*config.launch.app.split(":"), settings=config.launch.settings)
 
 def main(argv: list[str]):
+    argv, runtime_settings = parse_runtime_options(argv)
+    if runtime_settings:
+        override_runtime_config(runtime_settings)
+
     match argv:
         case ["run", "service", str() as service]:
             start_services(service)
 
+        case ["run", "service", str() as service, "--workers", str() as workers] if workers.isdigit():
+            start_services(service, int(workers))
+
         case ["run", str() as application_import] if ":" in application_import:
             start_application(*application_import.split(":"))
 
         case ["run"]:
             start_application_using_config()
 
+        case ["bench", *bench_args]:
+            start_bench(bench_args)
+
         case _ if "SCHISM_ACTIVE_SERVICE" in os.environ:
             start_services(os.environ["SCHISM_ACTIVE_SERVICE"].strip())
 
@@ -72,7 +93,16 @@ can also be easily be run as monoliths.
 
 Usage:
     schism run service <service>        - Run the given service
-    schism run <module>:<entry_point>   - Run the given application""")
+    schism run service <service> --workers <count>
+                                        - Run the given service in several worker processes
+    schism run <module>:<entry_point>   - Run the given application
+    schism bench <service> <method>     - Load test a method of a running service (see --help)
+
+Runtime options, these override the runtime section of the schism.config file:
+    --loop <asyncio|auto|uvloop|module:factory>
+    --default-executor-size <threads>
+    --slow-callback-duration <seconds>
+    --debug""")
 
 
 if __name__ == "__main__":
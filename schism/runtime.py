@@ -0,0 +1,146 @@
+"""The runtime settings select the event loop that services and applications run on and tune it. They're set in the
+"runtime" section of the schism.config file:
+
+    runtime:
+      loop: uvloop
+      default_executor_size: 32
+      debug: false
+      slow_callback_duration: 0.05
+
+    services:
+      ...
+
+"loop" is "auto" by default, which uses uvloop when it's installed and the default asyncio loop when it isn't. It can be
+"asyncio", "uvloop", or the import path of any callable that creates an event loop ("module.path:new_event_loop"). When
+the selected loop isn't installed a RuntimeWarning is issued and the default asyncio loop is used.
+
+"default_executor_size" sets the number of threads in the loop's default executor, which is used by run_in_executor
+and asyncio.to_thread. "debug" enables asyncio's debug mode, which logs callbacks that take longer than the
+"slow_callback_duration" in seconds. When "debug" isn't set asyncio decides, so PYTHONASYNCIODEBUG and "-X dev" still
+enable debug mode.
+
+Each setting can be overridden when using the schism CLI:
+
+    schism run service example --loop uvloop --default-executor-size 32 --debug --slow-callback-duration 0.05
+"""
+import asyncio
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from typing import Any, Awaitable, Callable
+
+from bevy import get_repository
+
+from schism.configs import ApplicationConfig, RuntimeConfig
+
+
+type LoopFactory = Callable[[], asyncio.AbstractEventLoop]
+
+ALTERNATIVE_LOOPS = {
+    "uvloop": "uvloop:new_event_loop",
+    "winloop": "winloop:new_event_loop",
+}
+RUNTIME_OPTIONS = {
+    "--loop": "loop",
+    "--default-executor-size": "default_executor_size",
+    "--slow-callback-duration": "slow_callback_duration",
+}
+RUNTIME_FLAGS = {
+    "--debug": "debug",
+}
+
+
+def get_loop_factory(loop: str) -> LoopFactory | None:
+    """Gets the factory for the event loop, None is returned when the default asyncio loop should be used."""
+    match loop:
+        case "asyncio":
+            return None
+
+        case "auto":
+            for locator in ALTERNATIVE_LOOPS.values():
+                try:
+                    return _load_loop_factory(locator)
+                except ModuleNotFoundError:
+                    continue
+
+            return None
+
+        case name:
+            try:
+                return _load_loop_factory(ALTERNATIVE_LOOPS.get(name, name))
+            except ModuleNotFoundError:
+                warnings.warn(
+                    f"The {name!r} event loop is not installed, using the default asyncio loop", RuntimeWarning
+                )
+                return None
+
+
+def configure_loop(loop: asyncio.AbstractEventLoop, config: RuntimeConfig):
+    if config.default_executor_size is not None:
+        loop.set_default_executor(
+            ThreadPoolExecutor(config.default_executor_size, thread_name_prefix="schism-default")
+        )
+
+    if config.slow_callback_duration is not None:
+        loop.slow_callback_duration = config.slow_callback_duration
+
+
+def run[R](main: Awaitable[R], config: RuntimeConfig) -> R:
+    """Runs the awaitable to completion on a new event loop that is created and configured using the runtime config."""
+    with asyncio.Runner(debug=config.debug, loop_factory=get_loop_factory(config.loop)) as runner:
+        configure_loop(runner.get_loop(), config)
+        return runner.run(main)
+
+
+def parse_runtime_options(argv: list[str]) -> tuple[list[str], dict[str, Any]]:
+    """Removes the runtime options from the CLI arguments, returning the remaining arguments and the runtime settings
+    the options set."""
+    remaining, settings = [], {}
+    arguments = iter(argv)
+    for argument in arguments:
+        if argument in RUNTIME_OPTIONS:
+            try:
+                settings[RUNTIME_OPTIONS[argument]] = next(arguments)
+            except StopIteration:
+                raise RuntimeError(f"The {argument} option requires a value") from None
+
+        elif argument in RUNTIME_FLAGS:
+            settings[RUNTIME_FLAGS[argument]] = True
+
+        else:
+            remaining.append(argument)
+
+    return remaining, settings
+
+
+def runtime_options(config: RuntimeConfig) -> list[str]:
+    """Creates the CLI options that set the runtime config, settings that are the default are left out."""
+    options = []
+    defaults = RuntimeConfig()
+    for option, name in RUNTIME_OPTIONS.items():
+        if (value := getattr(config, name)) != getattr(defaults, name):
+            options.extend((option, str(value)))
+
+    for flag, name in RUNTIME_FLAGS.items():
+        if getattr(config, name):
+            options.append(flag)
+
+    return options
+
+
+def override_runtime_config(settings: dict[str, Any]):
+    """Replaces the application config in the repository with a copy that has the runtime settings overridden."""
+    repository = get_repository()
+    config = repository.get(ApplicationConfig)
+    repository.set(
+        ApplicationConfig,
+        config.model_copy(update={"runtime": RuntimeConfig(**config.runtime.model_dump() | settings)}),
+    )
+
+
+def _load_loop_factory(locator: str) -> LoopFactory:
+    module_path, _, attr = locator.rpartition(":")
+    if not module_path:
+        raise ValueError(f"Unknown event loop, expected a loop name or an import path: {locator!r} (invalid)")
+
+    return getattr(import_module(module_path), attr)
@@ -0,0 +1,234 @@
+"""Serializers convert the payloads that bridges pass between clients and servers to and from bytes. Bridges that support
+serializers let each service select one in the schism.config file, the default is pickle:
+
+    services:
+      - name: example
+        service: example:Example
+        bridge:
+          type: schism.ext.bridges.simple_tcp:SimpleTCP
+          serve_on: 0.0.0.0:1234
+          serializer: marshal-fast
+
+The included serializers are:
+- pickle: Handles any picklable payload, including exceptions and custom types
+- marshal-fast: The cheapest encoding for payloads that are made only of primitive types (None, bools, ints, floats,
+complex numbers, strings, bytes, tuples, lists, sets, frozensets, and dicts)
+- json: Handles method calls and results made only of types that JSON decodes unchanged (None, bools, ints, finite
+floats, strings, lists, and dicts with string keys), arguments or results that contain tuples or other dict keys are
+pickled so they keep their types
+
+Custom serializers can be used by giving their import path, "custom:module.path:ClassName". The class is instantiated
+with no arguments.
+
+Serializers other than pickle only have to support the payloads they're good at. When a payload cannot be serialized
+the serializer raises a SerializationError and the bridge falls back to pickle for that payload. So hot methods with
+simple scalar arguments use the cheapest encoding and pickle is only used where it is needed. Method call and batch
+payloads reference the service type, which is not a primitive type, so it is converted to and from its import path.
+"""
+import json
+import marshal
+import pickle
+import sys
+from abc import ABC, abstractmethod
+from importlib import import_module
+from typing import Any, Type
+
+
+_registry: "dict[str, Type[Serializer]]" = {}
+_JSON_SCALARS = {str, int, float, bool, type(None)}
+
+
+class SerializationError(Exception):
+    """Raised by a serializer when it is unable to serialize a payload."""
+
+
+class Serializer(ABC):
+    name: str
+
+    @abstractmethod
+    def dumps(self, payload: Any) -> bytes:
+        """Should serialize the payload, raising a SerializationError if the payload is not supported."""
+        ...
+
+    @abstractmethod
+    def loads(self, data: bytes | bytearray | memoryview) -> Any:
+        """Should deserialize a payload that was serialized by the dumps method."""
+        ...
+
+
+def register_serializer[S: Type[Serializer]](serializer: S) -> S:
+    """Registers a serializer type using its name so that it can be selected in the schism.config file."""
+    _registry[serializer.name] = serializer
+    return serializer
+
+
+def is_registered(name: str) -> bool:
+    return name in _registry
+
+
+def get_serializer(spec: str) -> Serializer:
+    """Creates a serializer from the name of a registered serializer or from a "custom:module.path:ClassName"
+    import path."""
+    match spec.split(":", 1):
+        case ["custom", str() as import_path] if ":" in import_path:
+            module_path, attr = import_path.rsplit(":", 1)
+            return getattr(import_module(module_path), attr)()
+
+        case [str() as name] if name in _registry:
+            return _registry[name]()
+
+        case _:
+            raise ValueError(
+                f"Unknown serializer {spec!r}, expected one of {', '.join(map(repr, _registry))} or a "
+                f"'custom:module.path:ClassName' import path."
+            )
+
+
+@register_serializer
+class PickleSerializer(Serializer):
+    name = "pickle"
+
+    def dumps(self, payload: Any) -> bytes:
+        return pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data: bytes | bytearray | memoryview) -> Any:
+        return pickle.loads(data)
+
+
+class PrimitiveSerializer(Serializer, ABC):
+    """Base for serializers that only support primitive types. The service type of method call and batch payloads is
+    swapped for its import path before the payload is serialized and is swapped back after it is deserialized."""
+    def dumps(self, payload: Any) -> bytes:
+        match payload:
+            case {"service": type() as service, "calls": list() as calls}:
+                payload = payload | {"service": type_path(service), "calls": list(map(self._dump_service, calls))}
+
+            case {"service": type()}:
+                payload = self._dump_service(payload)
+
+        try:
+            return self.dumps_primitive(payload)
+        except (TypeError, ValueError) as e:
+            raise SerializationError(f"{self.name} cannot serialize the payload: {e}") from e
+
+    def loads(self, data: bytes | bytearray | memoryview) -> Any:
+        match payload := self.loads_primitive(data):
+            case {"service": str() as service, "calls": list() as calls}:
+                payload["service"] = load_type(service)
+                for call in calls:
+                    self._load_service(call)
+
+            case {"service": str(), "method": str()}:
+                self._load_service(payload)
+
+        return payload
+
+    def _dump_service(self, call: Any) -> Any:
+        match call:
+            case {"service": type() as service, **fields}:
+                return {"service": type_path(service)} | fields
+
+            case _:
+                return call
+
+    def _load_service(self, call: Any):
+        match call:
+            case {"service": str() as service, "method": str()}:
+                call["service"] = load_type(service)
+
+    @abstractmethod
+    def dumps_primitive(self, payload: Any) -> bytes:
+        """Should serialize the payload, raising a TypeError or ValueError if the payload is not supported."""
+        ...
+
+    @abstractmethod
+    def loads_primitive(self, data: bytes | bytearray | memoryview) -> Any:
+        ...
+
+
+@register_serializer
+class MarshalSerializer(PrimitiveSerializer):
+    name = "marshal-fast"
+
+    def dumps_primitive(self, payload: Any) -> bytes:
+        return marshal.dumps(payload, marshal.version)
+
+    def loads_primitive(self, data: bytes | bytearray | memoryview) -> Any:
+        return marshal.loads(data)
+
+
+@register_serializer
+class JSONSerializer(PrimitiveSerializer):
+    name = "json"
+
+    def dumps_primitive(self, payload: Any) -> bytes:
+        self._check_call(payload)
+        return json.dumps(payload, separators=(",", ":"), allow_nan=False).encode()
+
+    def loads_primitive(self, data: bytes | bytearray | memoryview) -> Any:
+        return self._restore_call(json.loads(bytes(data) if isinstance(data, memoryview) else data))
+
+    def _check_call(self, payload: Any):
+        """The args of a method call and the (method ID, args, kwargs, timeout) calls that the Simple TCP Bridge sends
+        are tuples that json encodes as lists, they're turned back into tuples when they're loaded. Every other value
+        must be a type that json decodes unchanged."""
+        match payload:
+            case (int(), tuple() as args, dict() as kwargs, *timeout) if type(payload) is tuple:
+                self._check_types([*args, kwargs, *timeout])
+
+            case {"calls": list() as calls, **fields}:
+                for call in calls:
+                    self._check_call(call)
+
+                self._check_types(fields)
+
+            case {"method": str(), "args": tuple() as args, **fields}:
+                self._check_types([*args, fields])
+
+            case _:
+                self._check_types(payload)
+
+    def _restore_call(self, payload: Any) -> Any:
+        match payload:
+            case [int() as method_id, list() as args, dict() as kwargs, *timeout] if len(timeout) <= 1:
+                return method_id, tuple(args), kwargs, *timeout
+
+            case {"calls": list() as calls}:
+                payload["calls"] = list(map(self._restore_call, calls))
+
+            case {"method": str(), "args": list() as args}:
+                payload["args"] = tuple(args)
+
+        return payload
+
+    def _check_types(self, payload: Any):
+        """Raises a TypeError for anything json would decode as a different type, such as tuples, which it encodes as
+        lists, and dicts with keys other than strings, which it encodes as strings."""
+        match payload:
+            case list() if type(payload) is list:
+                for item in payload:
+                    self._check_types(item)
+
+            case dict() if type(payload) is dict:
+                for key, value in payload.items():
+                    if type(key) is not str:
+                        raise TypeError(f"Dict keys must be strings, got {type(key).__name__}")
+
+                    self._check_types(value)
+
+            case _ if type(payload) not in _JSON_SCALARS:
+                raise TypeError(f"{type(payload).__name__} cannot be round tripped through JSON")
+
+
+def type_path(cls: type) -> str:
+    """The import path of a type, in the "module.path:QualName" form that load_type accepts."""
+    return f"{cls.__module__}:{cls.__qualname__}"
+
+
+def load_type(import_path: str) -> type:
+    module_path, qualname = import_path.split(":", 1)
+    obj = sys.modules[module_path] if module_path in sys.modules else import_module(module_path)
+    for name in qualname.split("."):
+        obj = getattr(obj, name)
+
+    return obj
@@ -3,6 +3,7 @@ from typing import Type
 from bevy import Repository
 
 import schism.controllers
+from schism.batches import Batch, RemoteBatch
 from schism.bridges import BridgeClientFacade
 from schism.middleware import MiddlewareContext
 
@@ -20,11 +21,14 @@ class Service:
         else:
             service_config = controller.get_service_config(cls)
             bridge = service_config.get_bridge_type()
-            return BridgeClientFacade(
+            return BridgeClientFacade.for_service(cls)(
                 bridge_type=bridge,
                 service_type=cls,
                 config=bridge.config_factory(service_config.bridge),
                 middleware_stack=service_config.get_bridge_middleware(),
+                coalesce=service_config.get_bridge_coalescing(),
+                adaptive_limit=service_config.get_bridge_adaptive_limit(),
+                timeouts=service_config.get_bridge_timeouts(),
             )
 
 
@@ -36,3 +40,18 @@ async def wait_for(service: Type[Service], *, timeout: float = 5.0):
 
         case _:
             pass
+
+
+def batch(service: Service | Type[Service]) -> Batch:
+    """Creates a batch context for calling many methods on a service in a single request, see the schism.batches module.
+    The service can be an injected service or a service type. Calls to services in the running process are made
+    directly."""
+    if isinstance(service, type):
+        service = Repository.get_repository().get(service)
+
+    match service:
+        case BridgeClientFacade() as client:
+            return RemoteBatch(client)
+
+        case _:
+            return Batch(service)
@@ -0,0 +1,112 @@
+"""The supervisor runs a service in several worker processes so that a CPU bound service can make use of more than one
+core. Each worker is a separate "schism run service" process with its own event loop, the workers all serve on the
+service's bridge address using SO_REUSEPORT so the operating system spreads new connections across them.
+
+The number of workers is set using the "workers" key in a service's config:
+
+    services:
+      - name: example
+        service: example:Example
+        workers: 4
+        bridge:
+          type: schism.ext.bridges.simple_tcp:SimpleTCP
+          serve_on: 0.0.0.0:1234
+
+It can also be set when running the service, this takes precedence over the config:
+
+    schism run service example --workers 4
+
+The supervisor restarts any worker that exits while the service is running. SIGINT and SIGTERM are forwarded to every
+worker, the supervisor then waits for the workers to exit, killing any that are still running after the shutdown
+timeout. Each worker has its index in the SCHISM_WORKER_ID environment variable.
+
+Sharing the address requires a bridge that supports SO_REUSEPORT (SimpleTCP does through its "reuse_port" setting, which
+workers enable automatically), services with other bridges fail to start in several workers."""
+import asyncio
+import contextlib
+import os
+import signal
+import sys
+
+from bevy import dependency, inject
+
+from schism.configs import ApplicationConfig
+from schism.controllers import WORKER_ID_ENVIRONMENT_VARIABLE
+from schism.runtime import runtime_options
+
+
+class WorkerSupervisor:
+    def __init__(self, service: str, workers: int, *, restart_delay: float = 1.0, shutdown_timeout: float = 10.0):
+        self.service = service
+        self.workers = workers
+        self.restart_delay = restart_delay
+        self.shutdown_timeout = shutdown_timeout
+
+        self._processes: dict[int, asyncio.subprocess.Process] = {}
+        self._stopping: asyncio.Event | None = None
+        self._stop_signal = signal.SIGTERM
+
+    def run(self):
+        asyncio.run(self.supervise())
+
+    async def supervise(self):
+        """Starts the workers and keeps them running until the supervisor is stopped."""
+        self._stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signal_number, self.stop, signal_number)
+
+        try:
+            await asyncio.gather(*(self._supervise_worker(worker_id) for worker_id in range(self.workers)))
+
+        finally:
+            for signal_number in (signal.SIGINT, signal.SIGTERM):
+                loop.remove_signal_handler(signal_number)
+
+    def stop(self, signal_number: int = signal.SIGTERM):
+        """Forwards the signal to every worker and stops restarting them. Workers that haven't exited when the shutdown
+        timeout elapses are killed."""
+        if self._stopping.is_set():
+            return
+
+        self._stopping.set()
+        self._stop_signal = signal_number
+        for process in self._processes.values():
+            if process.returncode is None:
+                process.send_signal(signal_number)
+
+        asyncio.get_running_loop().call_later(self.shutdown_timeout, self._kill)
+
+    def _kill(self):
+        for process in self._processes.values():
+            if process.returncode is None:
+                process.kill()
+
+    async def _supervise_worker(self, worker_id: int):
+        while not self._stopping.is_set():
+            process = await self._start_worker(worker_id)
+            self._processes[worker_id] = process
+            if self._stopping.is_set():  # Stopped while the worker was starting
+                process.send_signal(self._stop_signal)
+
+            return_code = await process.wait()
+            if self._stopping.is_set():
+                return
+
+            print(
+                f"Worker {worker_id} of {self.service} exited with code {return_code}, restarting it",
+                file=sys.stderr,
+            )
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(self._stopping.wait(), self.restart_delay)
+
+    async def _start_worker(self, worker_id: int) -> asyncio.subprocess.Process:
+        return await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "schism.run", "service", self.service, *self._runtime_options(),
+            env=os.environ | {WORKER_ID_ENVIRONMENT_VARIABLE: str(worker_id)},
+        )
+
+    @inject
+    def _runtime_options(self, config: ApplicationConfig = dependency()) -> list[str]:
+        """Passes on the runtime settings, which may have been overridden on the command line, to the workers."""
+        return runtime_options(config.runtime)
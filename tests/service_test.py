@@ -1,3 +1,5 @@
+import os
+
 from bevy import dependency, inject
 
 from schism.bridges import BridgeClientFacade
@@ -51,3 +53,8 @@ class ServiceC(Service):
     @inject
     def b_is_remote(self, b: ServiceB = dependency()):
         return isinstance(b, BridgeClientFacade) and isinstance(b.client, SimpleTCPClient)
+
+
+class WorkerService(Service):
+    async def get_pid(self):
+        return os.getpid()
@@ -0,0 +1,66 @@
+import asyncio
+import subprocess
+import sys
+
+import pytest
+from bevy import Repository
+
+import schism.run
+from schism.bench import parse_bench_args, run_closed_loop, run_open_loop
+
+
+@pytest.mark.asyncio
+async def test_closed_loop_counts_calls_and_errors():
+    calls = 0
+
+    async def call():
+        nonlocal calls
+        calls += 1
+        if calls % 4 == 0:
+            raise ValueError()
+
+    report = await run_closed_loop(call, concurrency=4, duration=0.05)
+    assert report.calls == calls
+    assert report.errors == {"ValueError": calls // 4}
+    assert report.error_rate == pytest.approx(0.25, abs=0.05)
+    assert report.percentile(50) <= report.percentile(99) <= max(report.latencies)
+
+
+@pytest.mark.asyncio
+async def test_open_loop_starts_calls_at_a_fixed_rate():
+    in_flight = 0
+    most_in_flight = 0
+
+    async def call():
+        nonlocal in_flight, most_in_flight
+        in_flight += 1
+        most_in_flight = max(in_flight, most_in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+
+    report = await run_open_loop(call, rate=200, duration=0.1)
+    assert report.calls == 20
+    assert most_in_flight > 1
+    assert min(report.latencies) >= 0.05
+
+
+def test_bench_arguments_are_parsed_as_json():
+    options = parse_bench_args(["service-a", "greet", "--args", '"Bob"', "3", "Alice", "--kwargs", "times=2"])
+    assert options.args == ["Bob", 3, "Alice"]
+    assert dict(options.kwargs) == {"times": 2}
+    assert options.rate is None
+
+
+def test_bench_calls_a_running_service(capsys):
+    Repository.set_repository(Repository.factory())
+    service = subprocess.Popen([sys.executable, "-m", "schism.run", "service", "service-a"])
+    try:
+        schism.run.main(["bench", "service-a", "increment", "--concurrency", "4", "--duration", "0.2"])
+    finally:
+        service.terminate()
+        service.wait()
+
+    output = capsys.readouterr().out
+    assert "Errors:     0 (0.00%)" in output
+    assert "p99" in output
+
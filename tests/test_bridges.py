@@ -1,10 +1,24 @@
+import asyncio
+import contextlib
+import time
+import tracemalloc
 from typing import Awaitable
 
 import pytest
-from bevy import inject, dependency
+from bevy import Repository, inject, dependency
 
+import schism
 from conftest import ServiceA, Bridge
-from schism.bridges import BridgeClientFacade, MethodCallPayload, ResultPayload
+from schism.admission import AdaptiveLimiter, Admission, OverloadedError
+from schism.bridges import (
+    BridgeClient,
+    BridgeClientFacade,
+    BridgeServiceFacade,
+    MethodCallPayload,
+    ResultPayload,
+    ServiceMethodKind,
+)
+from schism.configs import AdaptiveLimitConfig, CoalesceConfig, ServiceConfig
 from schism.controllers import get_controller
 from schism.middleware import ContextualMiddleware, Middleware, MiddlewareContext, MiddlewareStack
 
@@ -61,3 +75,335 @@ async def test_middleware():
     result = await stack.run(MiddlewareContext.SERVER, "EULAV", dummy_action)
     assert result == "---value---"
     assert visited == {"server_a", "server_b", "server_c"}
+
+
+@pytest.mark.asyncio
+async def test_middleware_is_built_once_per_facade(batch_service):
+    created = []
+    class CountingMiddleware(Middleware):
+        def __init__(self, context, next_call):
+            super().__init__(context, next_call)
+            created.append(self)
+
+        def run(self, payload):
+            return self.next(payload)
+
+    batch_service.middleware = MiddlewareStack(CountingMiddleware)
+    batch_service.client.config.middleware = MiddlewareStack(CountingMiddleware)
+    created.clear()
+    tracemalloc.start()
+    try:
+        for i in range(100):
+            assert await batch_service.double(i) == i * 2
+
+        baseline, _ = tracemalloc.get_traced_memory()
+        for i in range(10_000):
+            await batch_service.double(i)
+
+        current, _ = tracemalloc.get_traced_memory()
+
+    finally:
+        tracemalloc.stop()
+
+    assert created == []
+    assert current - baseline < 64 * 1024
+
+
+def test_empty_middleware_stack_returns_the_action():
+    async def action(payload):
+        return payload
+
+    assert MiddlewareStack().compile(MiddlewareContext.CLIENT, action) is action
+
+
+class BatchService(ServiceA):
+    async def double(self, value):
+        return value * 2
+
+    def quadruple(self, value):  # A sync method that returns a coroutine, like a decorated async method can
+        return self.double(value * 2)
+
+    async def fail(self):
+        raise ValueError("Failed")
+
+    async def sleep(self, seconds):
+        await asyncio.sleep(seconds)
+        return seconds
+
+    async def total(self, values):
+        return sum([value async for value in values])
+
+    async def count(self, stop, fail=False):
+        for i in range(stop):
+            yield i
+
+        if fail:
+            raise ValueError("Failed")
+
+
+class LocalBridge:
+    """Bridge that passes payloads straight to a service facade, counting the requests it sends."""
+    class Client(BridgeClient):
+        requests = 0
+
+        async def call_async_method(self, payload):
+            self.requests += 1
+            return await self.config.call_async_method(payload)
+
+        async def call_batch(self, payload):
+            self.requests += 1
+            return await self.config.call_batch(payload)
+
+        async def wait_for_server(self, *, timeout: float = 5.0):
+            pass
+
+    @classmethod
+    def create_client(cls, config):
+        return cls.Client(config)
+
+
+@pytest.fixture
+def batch_service():
+    repo = Repository.factory()
+    repo.set(BatchService, BatchService())
+    Repository.set_repository(repo)
+    return BridgeClientFacade(
+        LocalBridge, BatchService, BridgeServiceFacade(BatchService, MiddlewareStack()), MiddlewareStack()
+    )
+
+
+@pytest.mark.asyncio
+async def test_batch_sends_calls_in_one_request(batch_service):
+    async with schism.batch(batch_service) as batch:
+        results = [batch.double(i) for i in range(10)]
+        failure = batch.fail()
+
+    assert [result.result() for result in results] == [i * 2 for i in range(10)]
+    with pytest.raises(ValueError, match="Failed"):
+        failure.result()
+
+    assert batch_service.client.requests == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_runs_client_middleware_for_each_call(batch_service):
+    class ShortCircuitMiddleware(Middleware):
+        async def run(self, payload):
+            if payload["args"] == (0,):
+                return {"result": "skipped"}
+
+            return await self.next(payload)
+
+    batch_service.middleware = MiddlewareStack(ShortCircuitMiddleware)
+    async with schism.batch(batch_service) as batch:
+        results = [batch.double(i) for i in range(3)]
+
+    assert [result.result() for result in results] == ["skipped", 2, 4]
+    assert batch_service.client.requests == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_calls_local_services_directly():
+    async with schism.batch(BatchService()) as batch:
+        result = batch.double(21)
+
+    assert result.result() == 42
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_are_coalesced(batch_service):
+    batch_service.coalescer = schism.batches.Coalescer(batch_service.client, BatchService, window=0.001, max_calls=4)
+    results = await asyncio.gather(*(batch_service.double(i) for i in range(10)), return_exceptions=True)
+    assert results == [i * 2 for i in range(10)]
+    assert batch_service.client.requests == 3
+
+    with pytest.raises(ValueError, match="Failed"):
+        await asyncio.gather(batch_service.double(1), batch_service.fail())
+
+
+@pytest.mark.asyncio
+async def test_coalesced_calls_run_concurrently(batch_service):
+    batch_service.coalescer = schism.batches.Coalescer(batch_service.client, BatchService, window=0, max_calls=64)
+    start = asyncio.get_running_loop().time()
+    assert await asyncio.gather(*(batch_service.sleep(0.05) for _ in range(10))) == [0.05] * 10
+    assert asyncio.get_running_loop().time() - start < 0.25
+    assert batch_service.client.requests == 1
+
+
+def test_coalescing_config():
+    def service_config(bridge):
+        return ServiceConfig(name="a", service="conftest:ServiceA", bridge=bridge)
+
+    assert service_config("conftest:Bridge").get_bridge_coalescing() is None
+    assert service_config({"type": "conftest:Bridge", "coalesce": True}).get_bridge_coalescing() == CoalesceConfig()
+    assert service_config(
+        {"type": "conftest:Bridge", "coalesce": {"window": 0.001, "max_calls": 8}}
+    ).get_bridge_coalescing() == CoalesceConfig(window=0.001, max_calls=8)
+
+
+class StreamingBridge(LocalBridge):
+    class Client(LocalBridge.Client):
+        def stream_async_method(self, payload):
+            self.requests += 1
+            return self.config.stream_async_method(payload)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("bridge, items_before_error", [(LocalBridge, []), (StreamingBridge, [0, 1, 2])])
+async def test_async_generator_methods_are_streamed(batch_service, bridge, items_before_error):
+    service = BridgeClientFacade(bridge, BatchService, batch_service.client.config, MiddlewareStack())
+    assert [item async for item in service.count(5)] == [0, 1, 2, 3, 4]
+
+    items = []
+    with pytest.raises(ValueError, match="Failed"):
+        async for item in service.count(3, fail=True):
+            items.append(item)
+
+    assert items == items_before_error
+    assert service.client.requests == 2
+
+
+@pytest.mark.asyncio
+async def test_streamed_arguments_are_buffered_by_default(batch_service):
+    async def values():
+        for i in range(5):
+            yield i
+
+    assert await batch_service.total(values()) == 10
+
+
+@pytest.mark.asyncio
+async def test_client_stubs_are_generated_for_services(batch_service):
+    client_type = BridgeClientFacade.for_service(BatchService)
+    assert client_type is BridgeClientFacade.for_service(BatchService)
+    assert client_type.__name__ == "BatchServiceClient"
+    assert issubclass(client_type, BridgeClientFacade)
+
+    service = client_type(LocalBridge, BatchService, batch_service.client.config, MiddlewareStack())
+    assert await service.double(21) == 42
+    assert [item async for item in service.count(3)] == [0, 1, 2]
+    with pytest.raises(AttributeError, match="doubel"):
+        service.doubel(21)
+
+    assert service.client.requests == 2
+
+
+@pytest.mark.asyncio
+async def test_service_facade_dispatches_public_methods(batch_service):
+    facade = batch_service.client.config
+    assert facade.dispatch_table["double"].kind is ServiceMethodKind.COROUTINE
+    assert facade.dispatch_table["count"].kind is ServiceMethodKind.ASYNC_GENERATOR
+    assert not any(name.startswith("_") for name in facade.dispatch_table)
+
+    result = await facade.call_async_method(MethodCallPayload(service=BatchService, method="double", args=(2,), kwargs={}))
+    assert result == {"result": 4}
+
+    assert facade.dispatch_table["quadruple"].kind is ServiceMethodKind.FUNCTION
+    result = await facade.call_async_method(
+        MethodCallPayload(service=BatchService, method="quadruple", args=(2,), kwargs={})
+    )
+    assert result == {"result": 8}
+
+    result = await facade.call_async_method(
+        MethodCallPayload(service=BatchService, method="__init__", args=(), kwargs={})
+    )
+    assert isinstance(result["error"], AttributeError)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "admission, double_overloaded",
+    [(Admission(max_in_flight=1), True), (Admission(method_limits={"sleep": 1}), False)],
+)
+async def test_requests_over_the_admission_limits_are_rejected(batch_service, admission, double_overloaded):
+    batch_service.client.config.admission = admission
+    first, second, double = await asyncio.gather(
+        batch_service.sleep(0.05), batch_service.sleep(0.05), batch_service.double(1), return_exceptions=True
+    )
+    assert first == 0.05
+    assert isinstance(second, OverloadedError)
+    assert isinstance(double, OverloadedError) if double_overloaded else double == 2
+
+    assert await batch_service.sleep(0) == 0
+    assert admission.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_calls_over_the_adaptive_limit_are_queued_or_rejected(batch_service):
+    batch_service.limiter = AdaptiveLimiter(initial_limit=2, max_queue=1)
+    calls = asyncio.gather(*(batch_service.sleep(0.05) for _ in range(4)), return_exceptions=True)
+    await asyncio.sleep(0.01)
+    assert (batch_service.limiter.in_flight, batch_service.limiter.queue_depth) == (2, 1)
+
+    *results, rejected = await calls
+    assert results == [0.05] * 3
+    assert isinstance(rejected, OverloadedError)
+    assert (batch_service.limiter.in_flight, batch_service.limiter.rejected) == (0, 1)
+
+    batch_service.limiter = AdaptiveLimiter(initial_limit=1, queue_timeout=0.01)
+    with pytest.raises(OverloadedError, match="waited"):
+        await asyncio.gather(batch_service.sleep(0.05), batch_service.sleep(0.05))
+
+
+@pytest.mark.asyncio
+async def test_adaptive_limit_grows_with_use_and_shrinks_on_overload_and_latency():
+    limiter = AdaptiveLimiter(initial_limit=4, max_limit=5)
+
+    async def complete(count, *, latency=None, dropped=False):
+        for _ in range(count):
+            await limiter.acquire()
+
+        started = time.perf_counter()
+        for _ in range(count):
+            limiter.release(started, "method", dropped, latency=latency)
+
+    for _ in range(10):
+        await complete(4, latency=0.0001)
+        await complete(4, latency=0.0004)  # Jitter that's a lot slower, but by less than the minimum delta
+
+    assert limiter.limit == 5
+
+    await complete(5, dropped=True)
+    assert limiter.limit == 4  # Requests that were in flight together only cut the limit once
+
+    await complete(1, latency=0.05)
+    assert limiter._limit == pytest.approx(5 * 0.9 * 0.9)
+
+    assert ServiceConfig(
+        name="a", service="conftest:ServiceA", bridge={"type": "conftest:Bridge", "adaptive_limit": {"max_limit": 5}}
+    ).get_bridge_adaptive_limit() == AdaptiveLimitConfig(max_limit=5)
+
+
+@pytest.mark.asyncio
+async def test_slots_handed_to_requests_that_time_out_are_passed_on():
+    limiter = AdaptiveLimiter(initial_limit=1, queue_timeout=0.01)
+    await limiter.acquire()
+    waiting = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+
+    time.sleep(0.02)  # The queue timeout is due, the slot is handed over in the same loop iteration it fires
+    asyncio.get_running_loop().call_soon(limiter.release, time.perf_counter(), "method", False)
+    with pytest.raises(OverloadedError):
+        await waiting
+
+    assert limiter.in_flight == 0
+    await asyncio.wait_for(limiter.acquire(), 1)
+
+
+@pytest.mark.asyncio
+async def test_limited_streams_are_closed_when_the_consumer_stops_early():
+    limiter, closed = AdaptiveLimiter(), asyncio.Event()
+
+    async def open_stream(payload):
+        try:
+            for i in range(10):
+                yield {"result": i}
+        finally:
+            closed.set()
+
+    async with contextlib.aclosing(limiter.stream(open_stream, {"method": "count"})) as stream:
+        async for _ in stream:
+            break
+
+    assert closed.is_set()
+    assert limiter.in_flight == 0
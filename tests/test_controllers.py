@@ -0,0 +1,100 @@
+import asyncio
+import os
+import signal
+
+import pytest
+from bevy import Repository
+
+from schism.bridges import BridgeServer
+from schism.configs import ApplicationConfig
+from schism.controllers import WORKER_ID_ENVIRONMENT_VARIABLE, DistributedController, get_controller, set_controller
+from schism.ext.bridges.simple_tcp import SimpleTCP
+
+
+events = []
+
+
+class RecordingServer(BridgeServer):
+    async def launch(self):
+        await asyncio.Event().wait()
+
+    async def drain(self, timeout: float):
+        events.append(("drain", timeout))
+
+
+class RecordingBridge:
+    @classmethod
+    def create_server(cls, config, service_facade):
+        server = RecordingServer(config, service_facade)
+        get_controller().add_launch_task(server.launch())
+        return server
+
+    @classmethod
+    def config_factory(cls, bridge_config):
+        return bridge_config
+
+
+@pytest.fixture(autouse=True)
+def service_runtime():
+    repo = Repository.factory()
+    repo.set(
+        ApplicationConfig,
+        ApplicationConfig(
+            services=[
+                {
+                    "name": "service-a",
+                    "service": "conftest:ServiceA",
+                    "bridge": {"type": "test_controllers:RecordingBridge"},
+                    "drain_timeout": 3,
+                },
+            ],
+        ),
+    )
+    Repository.set_repository(repo)
+    events.clear()
+    yield
+    set_controller(None)
+
+
+def test_launch_tasks_run_concurrently():
+    controller = DistributedController.activate("service-a")
+    first, second = asyncio.Event(), asyncio.Event()
+
+    async def task(wait_for: asyncio.Event, then_set: asyncio.Event):
+        then_set.set()
+        await asyncio.wait_for(wait_for.wait(), 1)
+
+    controller.add_launch_task(task(first, second))
+    controller.add_launch_task(task(second, first))
+    controller.launch()
+
+
+def test_sigterm_drains_servers_then_runs_shutdown_hooks():
+    controller = DistributedController.activate("service-a")
+    controller.bootstrap()
+
+    async def send_sigterm():
+        await asyncio.sleep(0.01)
+        os.kill(os.getpid(), signal.SIGTERM)
+        await asyncio.sleep(10)
+
+    async def async_hook():
+        events.append("async hook")
+
+    controller.add_launch_task(send_sigterm())
+    controller.add_shutdown_hook(lambda: events.append("sync hook"))
+    controller.add_shutdown_hook(async_hook)
+    controller.launch()
+
+    assert events == [("drain", 3.0), "async hook", "sync hook"]
+
+
+def test_workers_share_the_bridge_address(monkeypatch):
+    monkeypatch.setenv(WORKER_ID_ENVIRONMENT_VARIABLE, "1")
+    controller = DistributedController.activate("service-a")
+    service_config, = controller.active_services.values()
+    bridge_config = controller._share_address(service_config, SimpleTCP.config_factory("localhost:1236"))
+    assert bridge_config.reuse_port
+
+    with pytest.raises(ValueError, match="reuse_port"):
+        controller.bootstrap()
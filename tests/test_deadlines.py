@@ -0,0 +1,145 @@
+import asyncio
+import itertools
+
+import pytest
+from bevy import Repository
+
+import schism
+import schism.deadlines as deadlines
+from schism.bridges import BridgeClientFacade, BridgeServiceFacade
+from schism.configs import AdaptiveLimitConfig, CoalesceConfig, ServiceConfig, TimeoutsConfig
+from schism.ext.bridges.simple_tcp import SimpleTCP
+from schism.middleware import MiddlewareStack
+from schism.services import Service
+
+from test_bridges import LocalBridge, StreamingBridge
+from test_simple_tcp import running_server
+
+
+class DeadlineService(Service):
+    def __init__(self):
+        self.cancelled = asyncio.Event()
+
+    async def wait(self, seconds):
+        try:
+            await asyncio.sleep(seconds)
+        except asyncio.CancelledError:
+            self.cancelled.set()
+            raise
+
+        return seconds
+
+    async def remaining(self):
+        return deadlines.get_timeout()
+
+    async def count(self, delay):
+        for i in itertools.count():
+            yield i
+            await asyncio.sleep(delay)
+
+
+@pytest.fixture
+def service():
+    repo = Repository.factory()
+    repo.set(DeadlineService, DeadlineService())
+    Repository.set_repository(repo)
+    return repo.get(DeadlineService)
+
+
+def client(service, bridge=LocalBridge, **options):
+    return BridgeClientFacade(
+        bridge, DeadlineService, BridgeServiceFacade(DeadlineService, MiddlewareStack()), MiddlewareStack(), **options
+    )
+
+
+@pytest.mark.asyncio
+async def test_nested_deadlines_can_only_shorten_the_deadline():
+    async with schism.deadline(0.5):
+        async with schism.deadline(5):
+            assert 0.4 < deadlines.get_timeout() <= 0.5
+            assert deadlines.get_timeout(0.1) == 0.1
+
+    assert deadlines.get_timeout() is None
+    with pytest.raises(TimeoutError):
+        async with schism.deadline(0.01):
+            await asyncio.sleep(1)
+
+
+@pytest.mark.asyncio
+async def test_deadlines_are_sent_to_the_service_and_cancel_the_call(service):
+    remote = client(service)
+    assert await remote.remaining() is None
+    async with schism.deadline(1):
+        assert 0.9 < await remote.remaining() <= 1
+
+    with pytest.raises(TimeoutError):
+        async with schism.deadline(0.05):
+            await remote.wait(1)
+
+    assert service.cancelled.is_set()
+
+    with pytest.raises(TimeoutError, match="has passed"):
+        async with schism.deadline(0):
+            await remote.wait(0)
+
+    assert remote.client.requests == 3
+
+
+def record_timeouts(remote) -> list[float]:
+    """Records the timeouts of the calls the facade hands to its bridge client."""
+    timeouts, call = [], remote.client.call_async_method
+    remote.client.call_async_method = lambda payload: timeouts.append(payload["timeout"]) or call(payload)
+    return timeouts
+
+
+@pytest.mark.asyncio
+async def test_the_time_left_is_sent_after_waiting_to_be_sent(service):
+    remote = client(service, adaptive_limit=AdaptiveLimitConfig(initial_limit=1))
+    limited = record_timeouts(remote)
+    await remote.limiter.acquire()
+    async with schism.deadline(1):
+        remaining = asyncio.create_task(remote.remaining())
+        await asyncio.sleep(0.3)
+        remote.limiter.release(0, "remaining", False)
+        await remaining
+
+    remote = client(service, coalesce=CoalesceConfig(window=0.3))
+    coalesced = record_timeouts(remote)
+    async with schism.deadline(1):
+        await remote.remaining()
+
+    assert limited[0] < 0.75 and coalesced[0] < 0.75
+
+
+@pytest.mark.asyncio
+async def test_timeouts_are_set_for_each_method(service):
+    remote = client(service, StreamingBridge, timeouts=TimeoutsConfig(default=1, methods={"count": 0.05}))
+    assert 0.9 < await remote.remaining() <= 1
+
+    items = []
+    with pytest.raises(TimeoutError):
+        async for item in remote.count(0.01):
+            items.append(item)
+
+    assert 2 < len(items) < 10
+
+    assert ServiceConfig(
+        name="a", service="conftest:ServiceA", bridge={"type": "conftest:Bridge", "timeouts": 5}
+    ).get_bridge_timeouts() == TimeoutsConfig(default=5)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_requests_are_cancelled_on_the_server(service):
+    config = SimpleTCP.config_factory({"serve_on": "127.0.0.1:18423"})
+    async with running_server(config, BridgeServiceFacade(DeadlineService, MiddlewareStack())) as (client, _):
+        payload = {"service": DeadlineService, "method": "wait", "args": (10,), "kwargs": {}}
+        call = asyncio.create_task(client.call_async_method(payload))
+        await asyncio.sleep(0.05)
+        call.cancel()
+
+        await asyncio.wait_for(service.cancelled.wait(), 1)
+        service.cancelled.clear()
+
+        result = await client.call_async_method(payload | {"args": (10,), "timeout": 0.05})
+        assert isinstance(result["error"], TimeoutError)
+        assert service.cancelled.is_set()
@@ -0,0 +1,126 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+from bevy import Repository, get_repository
+
+from schism.bridges import BridgeClientFacade, BridgeServiceFacade
+from schism.configs import ApplicationConfig
+from schism.controllers import MonolithicController, get_controller
+from schism.executors import ExecutionPolicy, run_in
+from schism.middleware import MiddlewareStack
+from schism.services import Service
+
+from test_bridges import LocalBridge
+
+
+class OffloadingService(Service):
+    def __init__(self):
+        self.calls = 0
+
+    def add(self, a, b):
+        return a + b
+
+    def numbers(self, stop):
+        yield from range(stop)
+
+    @run_in("inline")
+    def thread_id(self):
+        return threading.get_ident()
+
+    @run_in("thread")
+    def block(self, seconds):
+        time.sleep(seconds)
+        return threading.get_ident()
+
+    @run_in(ExecutionPolicy.PROCESS)
+    def count_in_process(self):
+        self.calls += 1
+        return os.getpid(), self.calls
+
+
+@pytest.fixture(autouse=True)
+def monolithic_runtime():
+    repo = Repository.factory()
+    repo.set(
+        ApplicationConfig,
+        ApplicationConfig(
+            services=[
+                {
+                    "name": "offloading",
+                    "service": "test_executors:OffloadingService",
+                    "bridge": "conftest:Bridge",
+                    "executors": {"thread_pool_size": 2, "process_pool_size": 1},
+                },
+            ],
+        ),
+    )
+    Repository.set_repository(repo)
+    controller = MonolithicController.activate()
+    yield
+    controller.shutdown_executors()
+
+
+@pytest.fixture
+def remote_service():
+    return BridgeClientFacade.for_service(OffloadingService)(
+        bridge_type=LocalBridge,
+        service_type=OffloadingService,
+        config=BridgeServiceFacade(OffloadingService, MiddlewareStack()),
+        middleware_stack=MiddlewareStack(),
+    )
+
+
+async def ticks_while(call) -> tuple[int, object]:
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticker = asyncio.create_task(tick())
+    try:
+        result = await call
+        return ticks, result
+    finally:
+        ticker.cancel()
+
+
+@pytest.mark.asyncio
+async def test_sync_methods_are_called_through_the_service_facade(remote_service):
+    assert await remote_service.add(1, 2) == 3
+    assert await remote_service.numbers(3) == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("use_bridge", [False, True])
+async def test_offloaded_methods_run_the_same_locally_and_remotely(use_bridge, remote_service):
+    service = remote_service if use_bridge else get_repository().get(OffloadingService)
+    assert await service.thread_id() == threading.get_ident()
+
+    ticks, thread_id = await ticks_while(service.block(0.2))
+    assert thread_id != threading.get_ident()
+    assert ticks > 5
+
+    pid, calls = await service.count_in_process()
+    assert pid != os.getpid()
+    assert calls == 1
+    assert get_repository().get(OffloadingService).calls == 0
+
+
+def test_pool_sizes_are_set_by_the_service_config():
+    executors = get_controller().get_executors(OffloadingService)
+    assert executors.thread_pool_size == 2
+    assert executors.process_pool_size == 1
+    assert get_controller().get_executors(OffloadingService) is executors
+
+
+def test_only_sync_methods_can_be_offloaded():
+    with pytest.raises(TypeError):
+        @run_in("thread")
+        async def method(self):
+            pass
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+from bevy import Repository, get_repository
+
+from schism.configs import ApplicationConfig, RuntimeConfig
+from schism.controllers import DistributedController, set_controller
+from schism.runtime import (
+    get_loop_factory,
+    override_runtime_config,
+    parse_runtime_options,
+    run,
+    runtime_options,
+)
+
+
+class CustomLoop(asyncio.SelectorEventLoop):
+    pass
+
+
+@pytest.fixture
+def application_config():
+    repo = Repository.factory()
+    repo.set(ApplicationConfig, ApplicationConfig(services=[], runtime={"loop": "test_runtime:CustomLoop"}))
+    Repository.set_repository(repo)
+    yield
+    set_controller(None)
+
+
+async def get_loop_settings():
+    loop = asyncio.get_running_loop()
+    return type(loop), loop._default_executor._max_workers, loop.get_debug(), loop.slow_callback_duration
+
+
+def test_loops_that_are_not_installed_fall_back_to_asyncio():
+    with pytest.warns(RuntimeWarning, match="not installed"):
+        assert get_loop_factory("not_an_installed_loop:new_event_loop") is None
+
+    assert get_loop_factory("asyncio") is None
+    assert get_loop_factory("test_runtime:CustomLoop") is CustomLoop
+
+
+def test_loop_is_created_and_configured_by_the_runtime_config():
+    config = RuntimeConfig(loop="test_runtime:CustomLoop", default_executor_size=3, debug=True, slow_callback_duration=2)
+    assert run(get_loop_settings(), config) == (CustomLoop, 3, True, 2)
+
+
+def test_asyncio_decides_debug_mode_unless_it_is_set(monkeypatch):
+    monkeypatch.setenv("PYTHONASYNCIODEBUG", "1")
+    assert run(get_loop_settings(), RuntimeConfig(default_executor_size=1))[2] is True
+    assert run(get_loop_settings(), RuntimeConfig(default_executor_size=1, debug=False))[2] is False
+
+
+def test_controllers_launch_using_the_runtime_config(application_config):
+    loops = []
+
+    async def record_loop():
+        loops.append(type(asyncio.get_running_loop()))
+
+    controller = DistributedController.activate("")
+    controller.add_launch_task(record_loop())
+    controller.launch()
+    assert loops == [CustomLoop]
+
+
+def test_cli_options_override_the_runtime_config(application_config):
+    argv, settings = parse_runtime_options(["run", "service", "example", "--default-executor-size", "8", "--debug"])
+    assert argv == ["run", "service", "example"]
+    assert settings == {"default_executor_size": "8", "debug": True}
+
+    override_runtime_config(settings)
+    config = get_repository().get(ApplicationConfig).runtime
+    assert config == RuntimeConfig(loop="test_runtime:CustomLoop", default_executor_size=8, debug=True)
+    assert runtime_options(config) == ["--loop", "test_runtime:CustomLoop", "--default-executor-size", "8", "--debug"]
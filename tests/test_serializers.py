@@ -0,0 +1,52 @@
+import pytest
+
+from conftest import ServiceA
+from schism.serializers import (
+    JSONSerializer,
+    MarshalSerializer,
+    PickleSerializer,
+    SerializationError,
+    get_serializer,
+)
+
+
+@pytest.mark.parametrize("serializer", [MarshalSerializer(), JSONSerializer()])
+def test_primitive_serializers_round_trip_method_calls(serializer):
+    payload = {"service": ServiceA, "method": "greet", "args": ("World",), "kwargs": {"punctuation": "!"}}
+    assert serializer.loads(serializer.dumps(payload)) == payload
+
+
+@pytest.mark.parametrize("serializer", [MarshalSerializer(), JSONSerializer()])
+def test_primitive_serializers_round_trip_batches(serializer):
+    calls = [{"service": ServiceA, "method": "greet", "args": (name,), "kwargs": {}} for name in ("a", "b")]
+    payload = {"service": ServiceA, "calls": calls}
+    assert serializer.loads(serializer.dumps(payload)) == payload
+
+
+@pytest.mark.parametrize("serializer", [MarshalSerializer(), JSONSerializer()])
+def test_primitive_serializers_reject_other_types(serializer):
+    with pytest.raises(SerializationError):
+        serializer.dumps({"error": ValueError("Not a primitive")})
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"result": ("a", "tuple")},
+        {"result": {1: "int key"}},
+        {"result": float("nan")},
+        {"result": [b"bytes"]},
+        {"service": "a:A", "method": "greet", "args": (("a", "tuple"),), "kwargs": {}},
+    ],
+)
+def test_json_rejects_payloads_it_cannot_round_trip(payload):
+    with pytest.raises(SerializationError):
+        JSONSerializer().dumps(payload)
+
+
+def test_get_serializer():
+    assert isinstance(get_serializer("pickle"), PickleSerializer)
+    assert isinstance(get_serializer("marshal-fast"), MarshalSerializer)
+    assert isinstance(get_serializer("custom:schism.serializers:JSONSerializer"), JSONSerializer)
+    with pytest.raises(ValueError):
+        get_serializer("unknown")
@@ -0,0 +1,567 @@
+import asyncio
+import contextlib
+import io
+import os
+import struct
+from contextlib import asynccontextmanager
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from bevy import Repository
+
+from schism.admission import Admission, OverloadedError
+from schism.bridges import BridgeServiceFacade
+from schism.ext.bridges.framing import Frame, FrameCodec, FrameFlag, FrameKind, FramePayloadError
+from schism.ext.bridges.simple_tcp import SimpleTCP, SimpleTCPServer, read, send
+from schism.middleware import MiddlewareStack
+from schism.serializers import JSONSerializer, MarshalSerializer, SerializationError
+
+from test_bridges import BatchService
+
+
+class EchoFacade:
+    service_type = None
+
+    async def call_async_method(self, payload):
+        return {"result": (payload["method"], payload["args"], payload["kwargs"])}
+
+    async def call_batch(self, payload):
+        return {"results": [await self.call_async_method(call) for call in payload["calls"]]}
+
+
+class SlowFacade(EchoFacade):
+    async def call_async_method(self, payload):
+        await asyncio.sleep(payload["args"][0])
+        return {"result": payload["args"][0]}
+
+
+def call_payload(method, *args, **kwargs):
+    return {"service": None, "method": method, "args": args, "kwargs": kwargs}
+
+
+@asynccontextmanager
+async def running_server(config, facade=None):
+    server = SimpleTCPServer(config, facade or EchoFacade())
+    connections = []
+    handle_connection = server._handle_connection
+
+    async def track_connection(reader, writer):
+        connections.append(writer)
+        await handle_connection(reader, writer)
+
+    server._handle_connection = track_connection
+    task = asyncio.create_task(server.launch())
+    client = SimpleTCP.create_client(config)
+    try:
+        await client.wait_for_server()
+        connections.clear()
+        yield client, connections
+    finally:
+        await client.close()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+@pytest.mark.asyncio
+async def test_sequential_calls_reuse_one_connection():
+    config = SimpleTCP.config_factory({"serve_on": "127.0.0.1:18401"})
+    async with running_server(config) as (client, connections):
+        for i in range(5):
+            assert await client.call_async_method(call_payload("echo", i)) == {"result": ("echo", (i,), {})}
+
+        assert len(connections) == 1
+        assert client.pool.size == 1
+
+
+@pytest.mark.asyncio
+async def test_pool_respects_max_size():
+    config = SimpleTCP.config_factory({"serve_on": "127.0.0.1:18402", "pool": {"max_size": 2}})
+    async with running_server(config) as (client, connections):
+        results = await asyncio.gather(*(client.call_async_method(call_payload("echo", i)) for i in range(10)))
+
+        assert [result["result"][1] for result in results] == [(i,) for i in range(10)]
+        assert len(connections) <= 2
+        assert client.pool.size <= 2
+
+
+@pytest.mark.asyncio
+async def test_pool_replaces_connections_closed_by_server():
+    config = SimpleTCP.config_factory({"serve_on": "127.0.0.1:18403"})
+    async with running_server(config) as (client, connections):
+        await client.call_async_method(call_payload("echo"))
+        connections[0].close()
+        await asyncio.sleep(0.01)
+
+        assert await client.call_async_method(call_payload("echo")) == {"result": ("echo", (), {})}
+        assert len(connections) == 2
+        assert client.pool.size == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_a_multiplexed_connection():
+    config = SimpleTCP.config_factory({"serve_on": "127.0.0.1:18404"})
+    async with running_server(config, SlowFacade()) as (client, connections):
+        delays = [0.05, 0.01, 0.03, 0.0] * 25
+        results = await asyncio.gather(*(client.call_async_method(call_payload("sleep", d)) for d in delays))
+
+        assert [result["result"] for result in results] == delays
+        assert client.protocol_version == 1
+        assert len(connections) == 2
+
+
+@pytest.mark.asyncio
+async def test_client_falls_back_to_version_0_servers():
+    async def handle_v0_only(reader, writer):
+        with contextlib.closing(writer):
+            while True:
+                payload = await read(reader)
+                await send({"result": payload["args"]}, writer)
+
+    config = SimpleTCP.config_factory("127.0.0.1:18405")
+    server = await asyncio.start_server(handle_v0_only, "127.0.0.1", 18405)
+    async with server:
+        client = SimpleTCP.create_client(config)
+        assert await client.call_async_method(call_payload("echo", 1)) == {"result": (1,)}
+        assert await client.call_async_method(call_payload("echo", 2)) == {"result": (2,)}
+        assert client.protocol_version == 0
+        assert client.pool.size == 1
+        await client.close()
+
+
+@pytest.mark.asyncio
+async def test_large_payloads_are_read_completely():
+    config = SimpleTCP.config_factory({"serve_on": "127.0.0.1:18406"})
+    async with running_server(config) as (client, connections):
+        data = bytes(range(256)) * 20_000
+        assert await client.call_async_method(call_payload("echo", data)) == {"result": ("echo", (data,), {})}
+
+
+@pytest.mark.asyncio
+async def test_frames_with_invalid_signatures_are_rejected():
+    codec = FrameCodec(b"secret")
+    reader = asyncio.StreamReader()
+    writer = Mock()
+    codec.write_frame(Frame(1, FrameKind.REQUEST, 7, "payload"), writer)
+    (frame,) = writer.write.call_args.args
+    reader.feed_data(frame)
+    assert await codec.read_frame(reader) == Frame(1, FrameKind.REQUEST, 7, "payload")
+
+    reader.feed_data(frame[:20] + bytes([frame[20] ^ 1]) + frame[21:])
+    with pytest.raises(ValueError):
+        await codec.read_frame(reader)
+
+
+@pytest.mark.asyncio
+async def test_large_buffers_are_sent_out_of_band():
+    codec = FrameCodec(b"secret", out_of_band_threshold=1024)
+    large_bytes, large_bytearray = b"a" * 20_000, bytearray(b"b" * 40_000)
+    payload = {"args": (large_bytes, large_bytearray, large_bytearray, b"small")}
+    writer = Mock()
+    codec.write_frame(Frame(1, FrameKind.REQUEST, 1, payload), writer)
+    parts = writer.writelines.call_args.args[0]
+    assert [part.obj for part in parts if isinstance(part, memoryview) and part.nbytes >= 1024] == [
+        large_bytes, large_bytearray
+    ]
+
+    reader = asyncio.StreamReader()
+    reader.feed_data(b"".join(parts))
+    frame = await codec.read_frame(reader)
+    assert frame.flags & FrameFlag.OUT_OF_BAND
+    assert frame.payload == payload
+    assert frame.payload["args"][1] is frame.payload["args"][2]
+
+
+@pytest.mark.asyncio
+async def test_out_of_band_round_trip():
+    config = SimpleTCP.config_factory({"serve_on": "127.0.0.1:18407", "out_of_band_threshold": 1024})
+    async with running_server(config) as (client, connections):
+        data = bytearray(range(256)) * 1000
+        response = await client.call_async_method(call_payload("echo", data, b"small"))
+        assert response == {"result": ("echo", (data, b"small"), {})}
+        assert isinstance(response["result"][1][0], bytearray)
+
+
+@pytest.mark.asyncio
+async def test_serializer_is_negotiated():
+    config = SimpleTCP.config_factory({"serve_on": "127.0.0.1:18408", "serializer": "marshal-fast"})
+    async with running_server(config) as (client, connections):
+        assert await client.call_async_method(call_payload("echo", 1, "a")) == {"result": ("echo", (1, "a"), {})}
+        async with client.pool.connection() as connection:
+            assert isinstance(connection.codec.serializer, MarshalSerializer)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "frame",
+    [
+        struct.pack("!HI", 0, 2 ** 32 - 1),
+        struct.pack("!HBBII", 1, FrameKind.REQUEST, 0, 1, 2 ** 32 - 1) + bytes(32),
+        struct.pack("!HBBII", 1, FrameKind.REQUEST, FrameFlag.OUT_OF_BAND, 1, 0) + bytes(32) + struct.pack("!I", 2000),
+        struct.pack("!HBBII", 1, FrameKind.REQUEST, FrameFlag.OUT_OF_BAND, 1, 0)
+        + bytes(32)
+        + struct.pack("!IQ", 1, 2 ** 63),
+    ],
+)
+async def test_frames_over_the_limits_are_refused_before_they_are_read(frame):
+    reader = asyncio.StreamReader()
+    reader.feed_data(frame)
+    reader.feed_eof()
+    with pytest.raises(ValueError, match="the limit is"):
+        await FrameCodec(b"secret", max_frame_size=1024 ** 2).read_frame(reader)
+
+
+@pytest.mark.asyncio
+async def test_serializer_falls_back_to_pickle():
+    codec = FrameCodec(b"secret", serializer=MarshalSerializer())
+    writer, reader = Mock(), asyncio.StreamReader()
+    codec.write_frame(Frame(1, FrameKind.RESPONSE, 1, {"result": 1}), writer)
+    codec.write_frame(Frame(1, FrameKind.RESPONSE, 2, {"result": ValueError("error")}), writer)
+    reader.feed_data(b"".join(call.args[0] for call in writer.write.call_args_list))
+
+    assert (await codec.read_frame(reader)).flags & FrameFlag.SERIALIZED
+    frame = await codec.read_frame(reader)
+    assert not frame.flags & FrameFlag.SERIALIZED
+    assert isinstance(frame.payload["result"], ValueError)
+
+
+@pytest.mark.asyncio
+async def test_json_serializes_method_calls():
+    codec = FrameCodec(b"secret", serializer=JSONSerializer())
+    writer, reader = Mock(), asyncio.StreamReader()
+    payload = call_payload("echo", 1, "a", key="value") | {"service": EchoService}
+    codec.write_frame(Frame(1, FrameKind.REQUEST, 1, payload), writer)
+    codec.write_frame(Frame(1, FrameKind.REQUEST, 2, (0, (1, "a"), {"key": "value"}, 1.5)), writer)
+    codec.write_frame(Frame(1, FrameKind.RESPONSE, 2, {"result": ("a", "tuple")}), writer)
+    reader.feed_data(b"".join(call.args[0] for call in writer.write.call_args_list))
+
+    frame = await codec.read_frame(reader)
+    assert frame.flags & FrameFlag.SERIALIZED
+    assert frame.payload == payload
+    frame = await codec.read_frame(reader)
+    assert frame.flags & FrameFlag.SERIALIZED
+    assert frame.payload == (0, (1, "a"), {"key": "value"}, 1.5)
+    assert not (await codec.read_frame(reader)).flags & FrameFlag.SERIALIZED
+
+
+@pytest.mark.asyncio
+async def test_compression_is_negotiated():
+    config = SimpleTCP.config_factory(
+        {"serve_on": "127.0.0.1:18409", "compression": {"codec": "zlib", "threshold": 1024}}
+    )
+    async with running_server(config) as (client, connections):
+        data = b"compressible" * 10_000
+        assert await client.call_async_method(call_payload("echo", data)) == {"result": ("echo", (data,), {})}
+        assert await client.call_async_method(call_payload("echo", 1)) == {"result": ("echo", (1,), {})}
+        assert client.compression_stats.frames_compressed == 1
+        assert client.compression_stats.frames_decompressed == 1
+        assert client.compression_stats.bytes_saved > 2 * len(data) * 0.9
+
+
+@pytest.mark.asyncio
+async def test_compression_skips_small_and_incompressible_frames():
+    codec = FrameCodec(b"secret", compression="zlib", compression_threshold=1024)
+    writer, reader = Mock(), asyncio.StreamReader()
+    codec.write_frame(Frame(1, FrameKind.RESPONSE, 1, b"a" * 100), writer)
+    codec.write_frame(Frame(1, FrameKind.RESPONSE, 2, os.urandom(4096)), writer)
+    reader.feed_data(b"".join(call.args[0] for call in writer.write.call_args_list))
+
+    assert not (await codec.read_frame(reader)).flags & FrameFlag.COMPRESSED
+    assert not (await codec.read_frame(reader)).flags & FrameFlag.COMPRESSED
+    assert codec.stats.frames_compressed == 0
+
+
+@pytest.mark.asyncio
+async def test_compressed_out_of_band_frames_are_offloaded():
+    codec = FrameCodec(
+        b"secret", out_of_band_threshold=1024, compression="zlib", compression_threshold=1024, offload_threshold=4096
+    )
+    payload = {"args": (bytearray(50_000), b"b" * 50_000)}
+    writer = AsyncMock()
+    writer.write, writer.writelines = Mock(), Mock()
+    await codec.send_frame(Frame(1, FrameKind.REQUEST, 1, payload), writer)
+    parts = writer.writelines.call_args.args[0] if writer.writelines.called else writer.write.call_args.args
+    reader = asyncio.StreamReader()
+    reader.feed_data(b"".join(parts))
+
+    frame = await codec.read_frame(reader)
+    assert frame.flags & FrameFlag.COMPRESSED and frame.flags & FrameFlag.OUT_OF_BAND
+    assert frame.payload == payload
+    assert isinstance(frame.payload["args"][0], bytearray)
+    assert codec.stats.bytes_before_compression == codec.stats.bytes_after_decompression
+
+
+@pytest.mark.asyncio
+async def test_batches_are_sent_as_one_request():
+    class CountingFacade(EchoFacade):
+        requests = 0
+
+        async def call_batch(self, payload):
+            self.requests += 1
+            return await super().call_batch(payload)
+
+    facade = CountingFacade()
+    config = SimpleTCP.config_factory({"serve_on": "127.0.0.1:18410"})
+    async with running_server(config, facade) as (client, connections):
+        response = await client.call_batch({"service": None, "calls": [call_payload("echo", i) for i in range(20)]})
+        assert response == {"results": [{"result": ("echo", (i,), {})} for i in range(20)]}
+        assert facade.requests == 1
+
+
+class StreamFacade(EchoFacade):
+    def __init__(self):
+        self.produced = 0
+        self.closed = asyncio.Event()
+
+    async def stream_async_method(self, payload):
+        try:
+            for item in range(*payload["args"]):
+                self.produced += 1
+                yield {"result": item}
+
+            if payload["kwargs"].get("fail"):
+                yield {"error": ValueError("Failed"), "traceback": []}
+
+        finally:
+            self.closed.set()
+
+
+@pytest.mark.asyncio
+async def test_async_generators_are_streamed():
+    facade = StreamFacade()
+    config = SimpleTCP.config_factory({"serve_on": "127.0.0.1:18411", "stream_window": 16})
+    async with running_server(config, facade) as (client, connections):
+        results = [result async for result in client.stream_async_method(call_payload("items", 1000))]
+        assert results == [{"result": i} for i in range(1000)]
+
+        results = [result async for result in client.stream_async_method(call_payload("items", 2, fail=True))]
+        assert results[:2] == [{"result": 0}, {"result": 1}]
+        assert isinstance(results[2]["error"], ValueError)
+
+
+@pytest.mark.asyncio
+async def test_streams_apply_backpressure_and_can_be_cancelled():
+    facade = StreamFacade()
+    config = SimpleTCP.config_factory({"serve_on": "127.0.0.1:18412", "stream_window": 8})
+    async with running_server(config, facade) as (client, connections):
+        async with contextlib.aclosing(client.stream_async_method(call_payload("items", 1000))) as stream:
+            assert await anext(stream) == {"result": 0}
+            await asyncio.sleep(0.05)
+            assert facade.produced == 8
+
+        await asyncio.wait_for(facade.closed.wait(), 1)
+        assert facade.produced == 8
+        assert await client.call_async_method(call_payload("echo")) == {"result": ("echo", (), {})}
+
+
+class UploadFacade(EchoFacade):
+    def __init__(self):
+        self.received_first = asyncio.Event()
+        self.resume = asyncio.Event()
+
+    async def call_async_method(self, payload):
+        if payload["method"] != "upload":
+            return await super().call_async_method(payload)
+
+        items = []
+        async for item in payload["args"][0]:
+            items.append(item)
+            if len(items) == 1:
+                self.received_first.set()
+                await self.resume.wait()
+
+        return {"result": items}
+
+
+@pytest.mark.asyncio
+async def test_arguments_are_streamed_with_bounded_buffering():
+    produced = 0
+
+    async def records():
+        nonlocal produced
+        for i in range(100):
+            produced += 1
+            yield i
+
+    facade = UploadFacade()
+    config = SimpleTCP.config_factory({"serve_on": "127.0.0.1:18413", "upload_window": 8})
+    async with running_server(config, facade) as (client, connections):
+        response = asyncio.create_task(client.upload_async_method(call_payload("upload", records())))
+        await asyncio.wait_for(facade.received_first.wait(), 1)
+        await asyncio.sleep(0.05)
+        assert produced == 8
+
+        facade.resume.set()
+        assert await asyncio.wait_for(response, 1) == {"result": list(range(100))}
+
+
+@pytest.mark.asyncio
+async def test_files_are_streamed_in_chunks():
+    facade = UploadFacade()
+    facade.resume.set()
+    config = SimpleTCP.config_factory({"serve_on": "127.0.0.1:18414", "upload_chunk_size": 1024})
+    async with running_server(config, facade) as (client, connections):
+        data = os.urandom(10_000)
+        response = await client.upload_async_method(call_payload("upload", io.BytesIO(data)))
+        assert [len(chunk) for chunk in response["result"]] == [1024] * 9 + [784]
+        assert b"".join(response["result"]) == data
+
+
+@pytest.mark.asyncio
+async def test_failed_uploads_are_raised_on_the_client():
+    async def records():
+        yield 1
+        raise ValueError("Failed")
+
+    facade = UploadFacade()
+    facade.resume.set()
+    config = SimpleTCP.config_factory({"serve_on": "127.0.0.1:18415"})
+    async with running_server(config, facade) as (client, connections):
+        with pytest.raises(ValueError, match="Failed"):
+            await asyncio.wait_for(client.upload_async_method(call_payload("upload", records())), 1)
+
+        assert await client.call_async_method(call_payload("echo")) == {"result": ("echo", (), {})}
+
+
+class EchoService:
+    async def echo(self, *args, **kwargs):
+        ...
+
+    async def other(self):
+        ...
+
+
+class TypedEchoFacade(EchoFacade):
+    service_type = EchoService
+
+    async def call_async_method(self, payload):
+        assert payload["service"] is EchoService
+        return await super().call_async_method(payload)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("serializer, port", [("pickle", 18416), ("json", 18417)])
+async def test_method_calls_are_sent_using_method_ids(serializer, port):
+    config = SimpleTCP.config_factory({"serve_on": f"127.0.0.1:{port}", "serializer": serializer})
+    async with running_server(config, TypedEchoFacade()) as (client, connections):
+        payload = call_payload("echo", 1, key="value") | {"service": EchoService}
+        assert await client.call_async_method(payload) == {"result": ("echo", (1,), {"key": "value"})}
+
+        connection, = client.pool._connections
+        assert connection.method_ids == {"echo": 0, "other": 1}
+        assert connection._intern(payload) == (0, (1,), {"key": "value"})
+        assert connection._intern(call_payload("echo")) == call_payload("echo")
+
+        batch = await client.call_batch({"service": EchoService, "calls": [payload, call_payload("other") | payload]})
+        assert len(batch["results"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_draining_completes_in_flight_requests():
+    config = SimpleTCP.config_factory({"serve_on": "127.0.0.1:18419"})
+    server = SimpleTCPServer(config, SlowFacade())
+    launch = asyncio.create_task(server.launch())
+    client = SimpleTCP.create_client(config)
+    try:
+        await client.wait_for_server()
+        calls = asyncio.gather(*(client.call_async_method(call_payload("sleep", 0.2)) for _ in range(3)))
+        await asyncio.sleep(0.05)
+        drain = asyncio.create_task(server.drain(5))
+
+        assert [result["result"] for result in await calls] == [0.2] * 3
+        await asyncio.wait_for(drain, 1)  # The client closes its connection once its requests have completed
+        await asyncio.wait_for(launch, 1)
+        assert client.pool.size == 0
+
+        with pytest.raises(RuntimeError):
+            await client.call_async_method(call_payload("sleep", 0))
+
+    finally:
+        await client.close()
+        launch.cancel()
+
+
+@pytest.mark.asyncio
+async def test_draining_closes_connections_after_the_timeout():
+    config = SimpleTCP.config_factory({"serve_on": "127.0.0.1:18420"})
+    server = SimpleTCPServer(config, SlowFacade())
+    launch = asyncio.create_task(server.launch())
+    client = SimpleTCP.create_client(config)
+    try:
+        await client.wait_for_server()
+        call = asyncio.create_task(client.call_async_method(call_payload("sleep", 10)))
+        await asyncio.sleep(0.05)
+        await asyncio.wait_for(server.drain(0.1), 1)
+
+        with pytest.raises(ConnectionError):
+            await call
+
+    finally:
+        await client.close()
+        launch.cancel()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("protocol, port", [(0, 18421), (1, 18422)])
+async def test_requests_over_the_limit_are_rejected_with_an_overloaded_error(protocol, port):
+    repo = Repository.factory()
+    repo.set(BatchService, BatchService())
+    Repository.set_repository(repo)
+
+    config = SimpleTCP.config_factory({"serve_on": f"127.0.0.1:{port}", "protocol": protocol, "backlog": 8})
+    facade = BridgeServiceFacade(BatchService, MiddlewareStack(), Admission(max_in_flight=1))
+    async with running_server(config, facade) as (client, _):
+        def sleep(seconds):
+            return client.call_async_method(
+                {"service": BatchService, "method": "sleep", "args": (seconds,), "kwargs": {}}
+            )
+
+        first, second = await asyncio.gather(sleep(0.1), sleep(0.1))
+        assert first == {"result": 0.1}
+        assert isinstance(second["error"], OverloadedError)
+        assert await sleep(0) == {"result": 0}
+
+
+@pytest.mark.asyncio
+async def test_responses_that_cannot_be_sent_are_replaced_with_an_error():
+    class UnpicklableFacade(EchoFacade):
+        async def call_async_method(self, payload):
+            if payload["method"] == "unpicklable":
+                return {"result": lambda: None}
+
+            return await super().call_async_method(payload)
+
+    config = SimpleTCP.config_factory({"serve_on": "127.0.0.1:18424"})
+    async with running_server(config, UnpicklableFacade()) as (client, _):
+        result = await asyncio.wait_for(client.call_async_method(call_payload("unpicklable")), 1)
+        assert isinstance(result["error"], SerializationError)
+        assert await client.call_async_method(call_payload("echo", 1)) == {"result": ("echo", (1,), {})}
+
+
+def fail_to_load():
+    raise ImportError("The client cannot import this type")
+
+
+class Unloadable:
+    def __reduce__(self):
+        return fail_to_load, ()
+
+
+@pytest.mark.asyncio
+async def test_responses_that_cannot_be_loaded_only_fail_their_request():
+    class UnloadableFacade(SlowFacade):
+        async def call_async_method(self, payload):
+            if payload["method"] == "unloadable":
+                return {"result": Unloadable()}
+
+            return await super().call_async_method(payload)
+
+    config = SimpleTCP.config_factory({"serve_on": "127.0.0.1:18425"})
+    async with running_server(config, UnloadableFacade()) as (client, connections):
+        slow = asyncio.create_task(client.call_async_method(call_payload("sleep", 0.1)))
+        await asyncio.sleep(0.01)
+        with pytest.raises(FramePayloadError, match="cannot import"):
+            await client.call_async_method(call_payload("unloadable"))
+
+        assert await slow == {"result": 0.1}
+        assert await client.call_async_method(call_payload("sleep", 0)) == {"result": 0}
+        assert len(connections) == 1
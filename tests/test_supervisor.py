@@ -0,0 +1,69 @@
+import asyncio
+import os
+import signal
+
+import pytest
+from bevy import Repository
+
+from schism.bridges import BridgeClientFacade
+from schism.controllers import DistributedController
+from schism.ext.bridges.simple_tcp import SimpleTCP
+from schism.middleware import MiddlewareStack
+
+from service_test import WorkerService
+
+
+@pytest.fixture(autouse=True)
+def setup_service_runtime():
+    Repository.set_repository(Repository.factory())
+    DistributedController.activate()
+
+
+async def get_pid() -> int:
+    """Calls the service on a new connection so that each call can be served by a different worker."""
+    facade = BridgeClientFacade.for_service(WorkerService)(
+        bridge_type=SimpleTCP,
+        service_type=WorkerService,
+        config=SimpleTCP.config_factory({"serve_on": "localhost:1235"}),
+        middleware_stack=MiddlewareStack(),
+    )
+    try:
+        await facade.wait_for_server()
+        return await facade.get_pid()
+    finally:
+        await facade.client.close()
+
+
+async def find_workers(count: int, timeout: float = 10) -> set[int]:
+    pids = set()
+    deadline = asyncio.get_running_loop().time() + timeout
+    while len(pids) < count and asyncio.get_running_loop().time() < deadline:
+        try:
+            pids.add(await get_pid())
+        except ConnectionError:  # The connection reached a worker that was just killed or is still starting
+            await asyncio.sleep(0.05)
+
+    return pids
+
+
+@pytest.mark.asyncio
+async def test_supervisor_restarts_workers_sharing_a_port():
+    supervisor = await asyncio.create_subprocess_exec("python", "-m", "schism.run", "service", "service-workers")
+    try:
+        workers = await find_workers(2)
+        assert len(workers) == 2
+        assert supervisor.pid not in workers
+
+        crashed = workers.pop()
+        os.kill(crashed, signal.SIGKILL)
+        restarted = await find_workers(2)
+        assert workers < restarted
+        assert crashed not in restarted
+
+    finally:
+        supervisor.send_signal(signal.SIGTERM)
+        assert await asyncio.wait_for(supervisor.wait(), 15) == 0
+
+    for pid in restarted:
+        with pytest.raises(ProcessLookupError):
+            os.kill(pid, 0)
@@ -0,0 +1,33 @@
+import pytest
+
+from schism.ext.bridges.simple_tcp import SimpleTCP
+from schism.ext.bridges.unix_socket import UnixSocket
+from test_simple_tcp import call_payload, running_server
+
+
+@pytest.mark.asyncio
+async def test_calls_are_made_over_a_unix_socket(tmp_path):
+    config = UnixSocket.config_factory({"path": str(tmp_path / "s"), "serializer": "marshal-fast"})
+    async with running_server(config) as (client, connections):
+        for i in range(5):
+            assert await client.call_async_method(call_payload("echo", i)) == {"result": ("echo", (i,), {})}
+
+        assert len(connections) == 1
+        assert client.address == f"unix:{tmp_path / 's'}"
+        assert connections[0].get_extra_info("sockname") == str(tmp_path / "s")
+
+    assert not (tmp_path / "s").exists()
+
+
+@pytest.mark.asyncio
+async def test_simple_tcp_prefers_a_unix_socket_on_the_same_host(tmp_path):
+    config = SimpleTCP.config_factory({"serve_on": "127.0.0.1:18418", "unix_socket": str(tmp_path / "s")})
+    async with running_server(config) as (client, connections):
+        assert await client.call_async_method(call_payload("echo")) == {"result": ("echo", (), {})}
+        assert connections[0].get_extra_info("sockname") == str(tmp_path / "s")
+
+    remote = SimpleTCP.create_client(
+        SimpleTCP.config_factory({"serve_on": "example.com:1234", "unix_socket": str(tmp_path / "s")})
+    )
+    assert not remote.prefers_unix_socket
+    assert remote.address == "example.com:1234"